@@ -0,0 +1,6 @@
+import sys
+
+from movie.utils import job_spec
+
+if __name__ == '__main__':
+    sys.exit(job_spec.main())
@@ -0,0 +1,123 @@
+import argparse
+import json
+import os
+import tempfile
+from typing import List
+from unittest import mock
+
+from movie.utils import command
+from movie.utils import files
+from movie.utils import stream
+from movie.utils.movie import Movie
+
+from benchmarks import state
+
+
+VIDEO_MIB = 64
+
+
+def _ffprobe_output(subtitle_tracks: int) -> str:
+    streams = [{'index': 0, 'codec_name': 'h264', 'codec_type': 'video'},
+               {'index': 1, 'codec_name': 'aac', 'codec_type': 'audio'}]
+    for i in range(subtitle_tracks):
+        streams.append({'index': i + 2, 'codec_name': 'ass', 'codec_type': 'subtitle'})
+    return json.dumps({'streams': streams})
+
+
+def _get_recorder(stats: dict):
+    # stands in for ffmpeg: counts the bytes each invocation has to read and creates the outputs
+    def execute(cmd_exec: List[str]) -> None:
+        input_path = cmd_exec[cmd_exec.index('-i') + 1]
+        input_size = os.path.getsize(input_path)
+        stats['invocations'] += 1
+        stats['bytes_read'] += input_size
+
+        output_paths = [arg for prev, arg in zip(cmd_exec, cmd_exec[1:])
+                        if prev not in ('-i', '-map', '-c', '-c:s') and not arg.startswith('-')]
+        for output_path in output_paths:
+            with open(output_path, 'wb') as output_file:
+                output_file.truncate(input_size if output_path.endswith('.mkv') else 0)
+    return execute
+
+
+def _legacy_extract_subtitle(movie_obj: Movie, keep_subtitles: bool, streams_index: List[int]) -> None:
+    # the previous implementation: one ffmpeg per subtitle track, then one remux per file without them
+    subtitle_streams = [movie_obj.__find_subtitle_stream_by_index__(i) for i in streams_index]
+    for f in movie_obj.__get_video_files__():
+        vid_path_source = os.path.join(movie_obj.movies_folder, f)
+        for subtitle_stream in subtitle_streams:
+            command.execute([
+                movie_obj.ffmpeg_path,
+                '-i', vid_path_source,
+                '-map', f'0:{subtitle_stream.stream_index}',
+                '-c:s', subtitle_stream.codec_name,
+                movie_obj.__get_subtitle_target__(f, subtitle_stream)
+            ])
+
+        if not keep_subtitles:
+            vid_path_target = movie_obj.__get_temp_path__(f, '.no_subs')
+            exclude_subtitle_streams = []
+            for subtitle_stream in subtitle_streams:
+                exclude_subtitle_streams.extend(['-map', f'-0:{subtitle_stream.stream_index}'])
+            command.execute([
+                movie_obj.ffmpeg_path,
+                '-i', vid_path_source,
+                '-map', '0',
+                *exclude_subtitle_streams,
+                '-c', 'copy',
+                vid_path_target
+            ])
+            files.restoring_target_filename_to_source(vid_path_target, vid_path_source)
+
+
+def _measure(extract, subtitle_tracks: int, episodes: int, video_size: int) -> dict:
+    # the same videos and the same stand-in ffmpeg for both implementations
+    with tempfile.TemporaryDirectory() as work_folder:
+        movies_folder = os.path.join(work_folder, 'movies')
+        os.mkdir(movies_folder)
+        for episode in range(1, episodes + 1):
+            with open(os.path.join(movies_folder, f'episode {episode:02d}.mkv'), 'wb') as video_file:
+                video_file.truncate(video_size)
+
+        stats = {'invocations': 0, 'bytes_read': 0}
+        with state.isolated(work_folder), mock.patch.object(command, 'execute', _get_recorder(stats)):
+            movie_obj = Movie('ffmpeg', 'ffprobe', movies_folder, 'bench')
+            movie_obj.streams = stream.parse_ffprobe_json(_ffprobe_output(subtitle_tracks))
+            extract(movie_obj)
+    return stats
+
+
+def run(subtitle_tracks: int, episodes: int, keep_subtitles: bool, video_size: int) -> dict:
+    streams_index = list(range(2, subtitle_tracks + 2))
+    legacy = _measure(lambda movie_obj: _legacy_extract_subtitle(movie_obj, keep_subtitles, streams_index),
+                      subtitle_tracks, episodes, video_size)
+    fused = _measure(lambda movie_obj: movie_obj.extract_subtitle(keep_subtitles, streams_index),
+                     subtitle_tracks, episodes, video_size)
+    return {
+        'tracks': subtitle_tracks,
+        'legacy_invocations': legacy['invocations'],
+        'legacy_bytes_read': legacy['bytes_read'],
+        **fused,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='bytes read by extract_subtitle per number of subtitle tracks')
+    parser.add_argument('--episodes', type=int, default=12)
+    parser.add_argument('--max-tracks', type=int, default=8)
+    parser.add_argument('--keep-subtitles', action='store_true')
+    # the videos are sparse where the file system allows it: on NTFS every byte is written
+    parser.add_argument('--video-mib', type=int, default=VIDEO_MIB, help='size of each synthetic video')
+    args = parser.parse_args()
+
+    print(f'{"tracks":>6} {"legacy runs":>12} {"fused runs":>12} {"legacy MiB":>12} {"fused MiB":>12} {"saved":>8}')
+    for tracks in range(1, args.max_tracks + 1):
+        result = run(tracks, args.episodes, args.keep_subtitles, args.video_mib * 1024 ** 2)
+        legacy = result['legacy_bytes_read'] / 1024 ** 2
+        fused = result['bytes_read'] / 1024 ** 2
+        print(f'{tracks:>6} {result["legacy_invocations"]:>12} {result["invocations"]:>12} '
+              f'{legacy:>12.0f} {fused:>12.0f} {1 - fused / legacy:>8.0%}')
+
+
+if __name__ == '__main__':
+    main()
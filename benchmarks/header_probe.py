@@ -0,0 +1,98 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+from typing import Optional
+
+from benchmarks import suite
+from movie.utils import constants
+from movie.utils import header_probe
+from movie.utils import stream
+
+
+def _get_fields(output: str) -> List[tuple]:
+    # what the menus and the remuxes use from a probe
+    return [(s.stream_index, s.codec_type, s.codec_name, s.get_tag('language'), s.get_tag('title'),
+             s.is_default, s.is_forced)
+            for s in stream.parse_ffprobe_json(output)]
+
+
+def _ffprobe(ffprobe_path: str, path: str) -> str:
+    return subprocess.run(
+        stream.get_probe_command(ffprobe_path, path), check=True, capture_output=True, text=True).stdout
+
+
+def _run_header_probe(ffprobe_path: str, paths: List[str]) -> tuple:
+    # as Movie probes: files the header probe does not read go to ffprobe, and count in its time
+    outputs = {}
+    fallbacks = 0
+    start = time.perf_counter()
+    for path in paths:
+        try:
+            outputs[path] = header_probe.probe(path)
+        except (OSError, ValueError):
+            outputs[path] = _ffprobe(ffprobe_path, path)
+            fallbacks += 1
+    return time.perf_counter() - start, outputs, fallbacks
+
+
+def _run_ffprobe(ffprobe_path: str, paths: List[str]) -> tuple:
+    start = time.perf_counter()
+    outputs = {path: _ffprobe(ffprobe_path, path) for path in paths}
+    return time.perf_counter() - start, outputs
+
+
+def _get_paths(folder: str) -> List[str]:
+    extensions = constants.MATROSKA + constants.ISO_MEDIA
+    return sorted(os.path.join(folder, f) for f in os.listdir(folder) if os.path.splitext(f)[1].lower() in extensions)
+
+
+def _make_library(args: argparse.Namespace, folder: str) -> Optional[str]:
+    # the reason there is no synthetic library, None when it was made
+    tools = {'ffmpeg': args.ffmpeg, 'ffprobe': args.ffprobe, 'ffmpeg_version': suite.get_ffmpeg_version(args.ffmpeg)}
+    reason = suite.prepare_video(tools, folder)
+    if reason is None:
+        suite.copy_videos(tools['video'], folder, args.files)
+        os.remove(tools['video'])
+    return reason
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='files per second: header probe vs ffprobe')
+    parser.add_argument('--folder', help='a library to probe, synthetic Matroska files by default')
+    parser.add_argument('--files', type=int, default=200, help='synthetic files')
+    parser.add_argument('--ffmpeg', default='ffmpeg')
+    parser.add_argument('--ffprobe', default='ffprobe')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        folder = args.folder or tmp_dir
+        if args.folder is None:
+            reason = _make_library(args, tmp_dir)
+            if reason is not None:
+                print(f'no synthetic library: {reason}')
+                return 1
+        paths = _get_paths(folder)
+        if not paths:
+            print(f'no Matroska or MP4 files in {folder}')
+            return 1
+
+        header_time, header_outputs, fallbacks = _run_header_probe(args.ffprobe, paths)
+        ffprobe_time, ffprobe_outputs = _run_ffprobe(args.ffprobe, paths)
+
+    mismatches = [p for p, output in header_outputs.items() if _get_fields(output) != _get_fields(ffprobe_outputs[p])]
+    print(f'{"":<14} {"total s":>9} {"files/s":>10}')
+    print(f'{"header probe":<14} {header_time:>9.3f} {len(paths) / header_time:>10.1f}')
+    print(f'{"ffprobe":<14} {ffprobe_time:>9.3f} {len(paths) / ffprobe_time:>10.1f}')
+    print(f'{len(paths) - fallbacks}/{len(paths)} files read from the headers, {fallbacks} left to ffprobe, '
+          f'{len(mismatches)} differ from ffprobe')
+    for path in mismatches:
+        print(f'    {path}')
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+
+from movie.utils import logging_config
+
+
+def _get_probe_output(streams: int) -> str:
+    # indented like ffprobe -of json prints it
+    return json.dumps({'streams': [
+        {'index': i, 'codec_type': 'audio' if i else 'video', 'codec_name': 'aac' if i else 'h264',
+         'tags': {'language': 'jpn', 'title': f'Track {i}'}, 'disposition': {'default': int(i < 2)}}
+        for i in range(streams)]}, indent=4)
+
+
+def _legacy_file(logger: logging.Logger, logs_folder: str, file_idx: int, probe_output: str, streams: int) -> None:
+    # what one remuxed file logged before: eager f-strings to a synchronous FileHandler, one dump per probe
+    command_str = f'ffprobe -v error -of json -show_entries stream episode {file_idx:03d}.mkv'
+    logger.debug(f'{command_str = }')
+    logger.debug(f'{probe_output = }')
+    with open(os.path.join(logs_folder, f'episode {file_idx:03d}.log'), 'w', encoding='utf-8') as log_file:
+        log_file.write(probe_output)
+
+    streams_metadata = []
+    for i in range(streams):
+        logger.debug(f'{i = }')
+        stream_metadata = ['-map', f'0:{i}', f'-disposition:{i}', 'default' if i < 2 else '0']
+        logger.debug(f'{stream_metadata = }')
+        streams_metadata.extend(stream_metadata)
+    logger.debug(f'{streams_metadata = }')
+
+
+def _queued_file(logger: logging.Logger, journal: logging.Logger, file_idx: int, probe_output: str,
+                 streams: int) -> None:
+    # what it logs now: lazy arguments through the queue, the probe only in the journal and the command's
+    # stderr as a bounded tail
+    command_str = f'ffprobe -v error -of json -show_entries stream episode {file_idx:03d}.mkv'
+    logger.debug('command_str = %r', command_str)
+    logger.debug('returncode = %r, stderr tail = %r', 0, '')
+    journal.info({'video': f'episode {file_idx:03d}.mkv', 'stderr': '', 'stdout': probe_output})
+
+    streams_metadata = []
+    for i in range(streams):
+        logger.debug('i = %r', i)
+        stream_metadata = ['-map', f'0:{i}', f'-disposition:{i}', 'default' if i < 2 else '0']
+        logger.debug('stream_metadata = %r', stream_metadata)
+        streams_metadata.extend(stream_metadata)
+    logger.debug('streams_metadata = %r', streams_metadata)
+
+
+def _get_logger(name: str, level: int = logging.DEBUG) -> logging.Logger:
+    logger = logging.getLogger(f'benchmark.{name}')
+    logger.setLevel(level)
+    logger.propagate = False
+    return logger
+
+
+def _legacy(tmp_dir: str, files: int, probe_output: str, streams: int) -> float:
+    # both paths run with the record flags logging_config sets for the whole process
+    logger = _get_logger('legacy')
+    handler = logging.FileHandler(os.path.join(tmp_dir, 'legacy.log'), encoding='utf-8')
+    handler.setFormatter(logging.Formatter(logging_config.FILE_FORMAT))
+    logger.addHandler(handler)
+    logs_folder = os.path.join(tmp_dir, 'logs')
+    os.makedirs(logs_folder)
+
+    start = time.perf_counter()
+    for file_idx in range(files):
+        _legacy_file(logger, logs_folder, file_idx, probe_output, streams)
+    elapsed = time.perf_counter() - start
+    handler.close()
+    return elapsed
+
+
+def _queued(tmp_dir: str, files: int, probe_output: str, streams: int, level: int):
+    # time spent by the logging thread and time until the listeners have written everything
+    logger = _get_logger(f'queued.{logging.getLevelName(level)}', level)
+    journal = _get_logger(f'queued.{logging.getLevelName(level)}.probes', logging.INFO)
+    listeners = [
+        logging_config.start_queue_logging(logger, logging_config.get_rotating_handler(
+            os.path.join(tmp_dir, 'queued.log'), logging.Formatter(logging_config.FILE_FORMAT))),
+        logging_config.start_queue_logging(journal, logging_config.get_rotating_handler(
+            os.path.join(tmp_dir, 'logs', 'ffprobe.jsonl'), logging_config.JsonLinesFormatter())),
+    ]
+
+    start = time.perf_counter()
+    for file_idx in range(files):
+        _queued_file(logger, journal, file_idx, probe_output, streams)
+    elapsed = time.perf_counter() - start
+    for listener in listeners:
+        listener.stop()
+    return elapsed, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='logging overhead per processed file: synchronous vs queued')
+    parser.add_argument('--files', type=int, default=2000)
+    parser.add_argument('--streams', type=int, default=12)
+    args = parser.parse_args()
+
+    probe_output = _get_probe_output(args.streams)
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        legacy = _legacy(tmp_dir, args.files, probe_output, args.streams)
+        rows.append(('synchronous DEBUG, file per probe', legacy))
+        for level in (logging.DEBUG, logging.INFO):
+            level_dir = os.path.join(tmp_dir, logging.getLevelName(level))
+            queued, drained = _queued(level_dir, args.files, probe_output, args.streams, level)
+            rows.append((f'queued {logging.getLevelName(level)}, logging thread', queued))
+            rows.append((f'queued {logging.getLevelName(level)}, until written', drained))
+
+    print(f'{"":<36} {"total s":>9} {"per file us":>12}')
+    for name, seconds in rows:
+        print(f'{name:<36} {seconds:>9.3f} {seconds / args.files * 1e6:>12.1f}')
+
+if __name__ == '__main__':
+    main()
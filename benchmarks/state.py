@@ -0,0 +1,40 @@
+import contextlib
+import logging
+import os
+from unittest import mock
+
+from movie.utils import jobs
+from movie.utils import job_queue
+from movie.utils import logging_config
+from movie.utils import probe_cache
+from movie.utils import translation
+
+
+@contextlib.contextmanager
+def isolated(folder: str):
+    # the job queue, probe cache, translation memory and logs of a benchmark run live in `folder`: the state
+    # of the working directory is neither read nor written
+    stores = [
+        (job_queue, 'JOB_QUEUE', job_queue.JobQueue(os.path.join(folder, 'jobs.sqlite'))),
+        (probe_cache, 'PROBE_CACHE', probe_cache.ProbeCache(os.path.join(folder, 'probes.sqlite'))),
+        (translation, 'MEMORY', translation.TranslationMemory(os.path.join(folder, 'memory.sqlite'))),
+    ]
+    handlers = [
+        (logging_config.LOG_LISTENER, logging_config.get_rotating_handler(
+            os.path.join(folder, 'movie.log'), logging.Formatter(logging_config.FILE_FORMAT))),
+        (logging_config.PROBE_JOURNAL_LISTENER, logging_config.get_rotating_handler(
+            os.path.join(folder, 'logs', 'ffprobe.jsonl'), logging_config.JsonLinesFormatter())),
+    ]
+    with contextlib.ExitStack() as stack:
+        for module, name, store in stores:
+            stack.callback(store.close)
+            stack.enter_context(mock.patch.object(module, name, store))
+        for listener, handler in handlers:
+            # stopping drains the queue: every record of the run is written to `folder`
+            stack.callback(listener.start)
+            stack.callback(handler.close)
+            stack.enter_context(mock.patch.object(listener, 'handlers', (handler,)))
+            stack.callback(listener.stop)
+        # workers forked during the run append to the files in `folder`
+        stack.callback(jobs.shutdown_process_pool)
+        yield
@@ -0,0 +1,66 @@
+import argparse
+import datetime
+import os
+import shutil
+import tempfile
+import time
+
+import ass
+
+from movie.utils import jobs
+from movie.utils.movie import Movie
+
+
+def _write_ass(path: str, events: int) -> None:
+    doc = ass.Document()
+    doc.info['PlayResX'] = '1920'
+    doc.info['PlayResY'] = '1080'
+    for i in range(events):
+        doc.events.append(ass.line.Dialogue(
+            start=datetime.timedelta(seconds=i), end=datetime.timedelta(seconds=i + 1),
+            style='Default' if i % 4 else 'Signs', text=f'{{\\fad(100,100)}}Line {i} of a synthetic episode'))
+    with open(path, 'w', encoding='utf_8_sig') as sub_file:
+        doc.dump_file(sub_file)
+
+
+def _write_srt(path: str, events: int) -> None:
+    with open(path, 'w', encoding='utf-8') as sub_file:
+        for i in range(events):
+            timestamp = f'{i // 3600:02d}:{i // 60 % 60:02d}:{i % 60:02d}'
+            sub_file.write(f'{i + 1}\n{timestamp},000 --> {timestamp},900\nLine {i} of a synthetic episode\n\n')
+
+
+def _measure(template_folder: str, method, processes: int) -> float:
+    with tempfile.TemporaryDirectory() as movies_folder:
+        for f in os.listdir(template_folder):
+            shutil.copy(os.path.join(template_folder, f), movies_folder)
+        jobs.configure(processes)
+        start = time.perf_counter()
+        method(Movie('ffmpeg', 'ffprobe', movies_folder, 'bench'))
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='per-file subtitle operations: serial vs process pool')
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--events', type=int, default=1000)
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as ass_folder, tempfile.TemporaryDirectory() as srt_folder:
+        for i in range(1, args.files + 1):
+            _write_ass(os.path.join(ass_folder, f'episode {i}.ass'), args.events)
+            _write_srt(os.path.join(srt_folder, f'episode {i}.srt'), args.events)
+
+        print(f'{"operation":<12} {"serial":>9} {f"{args.processes} procs":>9} {"speedup":>8}')
+        for name, folder, method in [
+            ('purify', ass_folder, Movie.ass_subtitle_purification),
+            ('srt -> ass', srt_folder, Movie.subs_convert_srt_to_ass),
+        ]:
+            serial = _measure(folder, method, 1)
+            pooled = _measure(folder, method, args.processes)
+            print(f'{name:<12} {serial:>8.2f}s {pooled:>8.2f}s {serial / pooled:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,314 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from PIL import Image
+
+from movie.utils import constants
+from movie.utils import jobs
+from movie.utils.movie import Movie
+
+from benchmarks import state
+
+
+SCALES = [1, 10, 100]
+EVENTS = [1000, 100000]
+THRESHOLD = 0.25
+# differences below this are timer and scheduler noise, never a regression
+MIN_DELTA = 0.05
+
+VIDEO_SECONDS = 5
+AUDIO_TRACKS = 4
+SUBTITLE_TRACKS = 6
+IMAGES = 4
+IMAGE_SIZE = (1920, 1080)
+
+ASS_HEADER = (
+    '[Script Info]\nScriptType: v4.00+\nPlayResX: 1920\nPlayResY: 1080\n\n'
+    '[V4+ Styles]\n'
+    'Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, '
+    'Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, '
+    'MarginL, MarginR, MarginV, Encoding\n'
+    'Style: Default,Arial,48,&H00FFFFFF,&H000000FF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,2,1,2,10,10,10,1\n'
+    'Style: Signs,Arial,40,&H00FFFFFF,&H000000FF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,2,1,8,10,10,10,1\n\n'
+    '[Events]\nFormat: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n'
+)
+
+
+def _get_timestamp(centiseconds: int, separator: str = '.', fraction_digits: int = 2) -> str:
+    seconds, fraction = divmod(centiseconds, 100)
+    fraction = f'{fraction:02d}' if fraction_digits == 2 else f'{fraction * 10:03d}'
+    return f'{seconds // 3600:d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}{separator}{fraction}'
+
+
+def write_ass(path: str, events: int) -> None:
+    # written as text: building 100k events through the ass library would dominate the setup
+    with open(path, 'w', encoding='utf_8_sig') as sub_file:
+        sub_file.write(ASS_HEADER)
+        for i in range(events):
+            style = 'Signs' if i % 5 == 0 else 'Default'
+            sub_file.write(f'Dialogue: 0,{_get_timestamp(i * 150)},{_get_timestamp(i * 150 + 140)},{style},,0,0,0,,'
+                           f'{{\\blur0.6}}Synthetic event {i}\\Nsecond line\n')
+
+
+def write_srt(path: str, events: int) -> None:
+    with open(path, 'w', encoding='utf-8') as sub_file:
+        for i in range(events):
+            start = _get_timestamp(i * 150, ',', 3).zfill(12)
+            end = _get_timestamp(i * 150 + 140, ',', 3).zfill(12)
+            sub_file.write(f'{i + 1}\n{start} --> {end}\n<i>Synthetic event {i}</i>\nsecond line\n\n')
+
+
+def write_images(folder: str, count: int) -> None:
+    for i in range(count):
+        image = Image.linear_gradient('L').resize(IMAGE_SIZE).convert('RGB')
+        image.save(os.path.join(folder, f'poster {i + 1:02d}{constants.JPG if i % 2 else constants.PNG}'))
+
+
+def write_placeholders(folder: str, count: int, f_ext: str) -> None:
+    for i in range(count):
+        with open(os.path.join(folder, f'episode {i + 1:03d}{f_ext}'), 'wb'):
+            pass
+
+
+def make_video(ffmpeg_path: str, folder: str) -> str:
+    # one lavfi source per track; subtitle tracks come from a short srt muxed as ass
+    srt_path = os.path.join(folder, 'track.srt')
+    write_srt(srt_path, VIDEO_SECONDS)
+    video_path = os.path.join(folder, f'master{constants.MKV}')
+
+    cmd_exec = [ffmpeg_path, '-v', 'error', '-y',
+                '-f', 'lavfi', '-i', f'testsrc=duration={VIDEO_SECONDS}:size=640x360:rate=25']
+    for i in range(AUDIO_TRACKS):
+        cmd_exec.extend(['-f', 'lavfi', '-i', f'sine=frequency={220 * (i + 1)}:duration={VIDEO_SECONDS}'])
+    for _ in range(SUBTITLE_TRACKS):
+        cmd_exec.extend(['-i', srt_path])
+    for i in range(1 + AUDIO_TRACKS + SUBTITLE_TRACKS):
+        cmd_exec.extend(['-map', str(i)])
+    for i in range(SUBTITLE_TRACKS):
+        cmd_exec.extend([f'-metadata:s:s:{i}', 'language=eng', f'-metadata:s:s:{i}', f'title=Track {i + 1}'])
+    cmd_exec.extend(['-c:v', 'mpeg4', '-c:a', 'aac', '-c:s', 'ass', video_path])
+    subprocess.run(cmd_exec, check=True, capture_output=True)
+    return video_path
+
+
+def copy_videos(video_path: str, folder: str, count: int) -> None:
+    for i in range(count):
+        shutil.copy(video_path, os.path.join(folder, f'episode {i + 1:03d}{constants.MKV}'))
+
+
+def _remux(movie_obj: Movie) -> List[jobs.JobResult]:
+    # first video, first audio and first subtitle track of every file
+    return movie_obj.process_streams_to_video_files(
+        {video: [0, 1, 1 + AUDIO_TRACKS] for video in movie_obj.__get_video_files__()})
+
+
+def _extract_subtitle(movie_obj: Movie) -> None:
+    movie_obj.analyze_first_video_file()
+    _, _, subtitle_streams = movie_obj.__separate_media_streams__()
+    movie_obj.extract_subtitle(False, [s.stream_index for s in subtitle_streams])
+
+
+# operation -> (fixture: 'video', 'images', 'ass', 'srt' or 'rename'; the Movie call that is timed)
+OPERATIONS: Dict[str, tuple] = {
+    'remux': ('video', _remux),
+    'extract_subtitle': ('video', _extract_subtitle),
+    'extract_audio': ('video', lambda movie_obj: movie_obj.extract_audio_from_video_files([constants.MKA])),
+    'preview': ('images', lambda movie_obj: movie_obj.preview_generate(True)),
+    'convert_srt': ('srt', lambda movie_obj: movie_obj.subs_convert_srt_to_ass()),
+    'purification': ('ass', lambda movie_obj: movie_obj.ass_subtitle_purification()),
+    'retime': ('ass', lambda movie_obj: movie_obj.subtitle_retiming('23.976>25 +0.5')),
+    'rename': ('rename', lambda movie_obj: movie_obj.rename_files()),
+}
+
+
+def get_cases(operations: List[str], scales: List[int], events: List[int]) -> List[dict]:
+    # subtitle operations grow in files at the smallest event count and in events for a single file
+    cases = []
+    for operation in operations:
+        fixture, _ = OPERATIONS[operation]
+        if fixture in ('ass', 'srt'):
+            sizes = [(files, min(events)) for files in scales]
+            sizes.extend((1, count) for count in events if (1, count) not in sizes)
+        else:
+            sizes = [(files, None) for files in scales]
+        cases.extend({'operation': operation, 'files': files, 'events': count} for files, count in sizes)
+    return cases
+
+
+def build_fixture(folder: str, case: dict, video_path: Optional[str]) -> None:
+    fixture, _ = OPERATIONS[case['operation']]
+    if fixture == 'video':
+        copy_videos(video_path, folder, case['files'])
+    elif fixture == 'images':
+        # the previews are per video: the videos only have to exist
+        write_placeholders(folder, case['files'], constants.MKV)
+        write_images(folder, IMAGES)
+    elif fixture == 'rename':
+        for f_ext in (constants.MKV, constants.ASS, constants.JPG):
+            write_placeholders(folder, case['files'], f_ext)
+    else:
+        writer = write_ass if fixture == 'ass' else write_srt
+        for i in range(case['files']):
+            writer(os.path.join(folder, f'episode {i + 1:03d}.{fixture}'), case['events'])
+
+
+def measure(case: dict, tools: dict, state_folder: str) -> float:
+    # a fresh folder each time: every operation rewrites or moves its inputs. RuntimeError when a job of
+    # the operation failed: its time is not the time of the work
+    _, function = OPERATIONS[case['operation']]
+    with tempfile.TemporaryDirectory() as movies_folder:
+        build_fixture(movies_folder, case, tools.get('video'))
+        movie_obj = Movie(tools['ffmpeg'], tools['ffprobe'], movies_folder, 'bench')
+        movie_obj.workers = tools['workers']
+        with state.isolated(state_folder):
+            start = time.perf_counter()
+            job_results = function(movie_obj) or []
+            seconds = time.perf_counter() - start
+    failed = [result for result in job_results if not result.succeeded]
+    if failed:
+        raise RuntimeError(f'{len(job_results) - len(failed)}/{len(job_results)} succeeded, {failed[0]!r}')
+    return seconds
+
+
+def get_ffmpeg_version(ffmpeg_path: str) -> Optional[str]:
+    try:
+        output = subprocess.run([ffmpeg_path, '-version'], check=True, capture_output=True, text=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.splitlines()[0] if output.stdout else None
+
+
+def prepare_video(tools: dict, fixtures_folder: str) -> Optional[str]:
+    # the reason the ffmpeg operations are skipped, None when the synthetic video was made
+    if tools['ffmpeg_version'] is None or shutil.which(tools['ffprobe']) is None:
+        return 'ffmpeg/ffprobe not found'
+    try:
+        tools['video'] = make_video(tools['ffmpeg'], fixtures_folder)
+    except subprocess.CalledProcessError as exc:
+        # lavfi sources or the mpeg4/aac encoders are missing from this build
+        error_lines = exc.stderr.decode(errors='replace').strip().splitlines()
+        error = error_lines[-1] if error_lines else f'exit status {exc.returncode}'
+        return f'synthetic video not created: {error}'
+    except OSError as exc:
+        return f'synthetic video not created: {exc}'
+    return None
+
+
+def run_cases(cases: List[dict], tools: dict, repeat: int) -> List[dict]:
+    with tempfile.TemporaryDirectory() as fixtures_folder:
+        skip_reason = prepare_video(tools, fixtures_folder) if any(
+            OPERATIONS[case['operation']][0] == 'video' for case in cases) else None
+        results = []
+        for case in cases:
+            if OPERATIONS[case['operation']][0] == 'video' and skip_reason:
+                results.append({**case, 'seconds': None, 'skipped': skip_reason})
+                continue
+            # the best of `repeat` runs: the others only add noise from the rest of the system
+            try:
+                seconds = min(measure(case, tools, tempfile.mkdtemp(dir=fixtures_folder)) for _ in range(repeat))
+            except Exception as exc:
+                results.append({**case, 'seconds': None, 'failed': str(exc)})
+                print(f'{_get_case_name(case):<36} {"failed":>11}  {exc}', file=sys.stderr)
+                continue
+            results.append({**case, 'seconds': round(seconds, 4)})
+            print(f'{_get_case_name(case):<36} {seconds:>10.3f}s', file=sys.stderr)
+        return results
+
+
+def _get_case_name(case: dict) -> str:
+    events = f' x {case["events"]} events' if case.get('events') else ''
+    return f'{case["operation"]} {case["files"]} files{events}'
+
+
+def compare(results: List[dict], baseline: dict, threshold: float) -> List[dict]:
+    # marks every result against the same case of the baseline run, returns the regressions
+    baseline_seconds = {_get_case_name(r): r.get('seconds') for r in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        previous = baseline_seconds.get(_get_case_name(result))
+        if result.get('seconds') is None or not previous:
+            continue
+        result['baseline'] = previous
+        result['change'] = round(result['seconds'] / previous - 1, 4)
+        result['regression'] = result['change'] > threshold and result['seconds'] - previous > MIN_DELTA
+        if result['regression']:
+            regressions.append(result)
+    return regressions
+
+
+def print_report(results: List[dict]) -> None:
+    print(f'{"case":<36} {"seconds":>10} {"baseline":>10} {"change":>8}')
+    for result in results:
+        if result.get('skipped') or result.get('failed'):
+            status = 'skipped' if result.get('skipped') else 'failed'
+            print(f'{_get_case_name(result):<36} {status:>10}  {result[status]}')
+            continue
+        baseline = f'{result["baseline"]:>10.3f}' if 'baseline' in result else f'{"-":>10}'
+        change = f'{result["change"]:>+8.0%}' if 'change' in result else f'{"-":>8}'
+        flag = f' {constants.CROSS} regression' if result.get('regression') else ''
+        print(f'{_get_case_name(result):<36} {result["seconds"]:>10.3f} {baseline} {change}{flag}')
+
+
+def _get_list(value: str, item: Callable = int) -> list:
+    return [item(v.strip()) for v in value.split(',') if v.strip()]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='time every Movie operation on synthetic media at several scales')
+    parser.add_argument('--operations', default=','.join(OPERATIONS), help='comma separated, all by default')
+    parser.add_argument('--scales', default=','.join(map(str, SCALES)), help='numbers of files')
+    parser.add_argument('--events', default=','.join(map(str, EVENTS)), help='subtitle events per file')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=constants.DEFAULT_WORKERS)
+    parser.add_argument('--ffmpeg', default='ffmpeg')
+    parser.add_argument('--ffprobe', default='ffprobe')
+    parser.add_argument('--output', default='benchmark_results.json', help='where the JSON results are written')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='slowdown flagged as a regression')
+    args = parser.parse_args()
+
+    operations = _get_list(args.operations, str)
+    unknown = [op for op in operations if op not in OPERATIONS]
+    if unknown:
+        parser.error(f'unknown operations {unknown}, must be from {list(OPERATIONS)}')
+
+    tools = {'ffmpeg': args.ffmpeg, 'ffprobe': args.ffprobe, 'workers': args.workers,
+             'ffmpeg_version': get_ffmpeg_version(args.ffmpeg)}
+    results = run_cases(get_cases(operations, _get_list(args.scales), _get_list(args.events)), tools, args.repeat)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.threshold)
+    print_report(results)
+
+    report = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'workers': args.workers,
+        'ffmpeg': tools['ffmpeg_version'],
+        'results': results,
+        'regressions': [_get_case_name(r) for r in regressions],
+        'failed': [_get_case_name(r) for r in results if r.get('failed')],
+    }
+    with open(args.output, 'w', encoding='utf-8') as output_file:
+        json.dump(report, output_file, indent=2)
+    return 1 if regressions or report['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
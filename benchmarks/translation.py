@@ -0,0 +1,69 @@
+import argparse
+import datetime
+import os
+import tempfile
+import time
+from unittest import mock
+
+import ass
+
+from movie.utils import constants
+from movie.utils import translation
+
+
+def _get_episode(episode: int, lines: int) -> ass.Document:
+    doc = ass.Document()
+    doc.info['PlayResX'] = '640'
+    doc.info['PlayResY'] = '360'
+    for i in range(lines):
+        # every third line repeats across episodes (openings, names, interjections)
+        text = f'Common line {i % 50}' if i % 3 == 0 else f'Episode {episode} line {i}'
+        doc.events.append(ass.line.Dialogue(start=datetime.timedelta(seconds=i), end=datetime.timedelta(seconds=i + 1),
+                                            style='Default', text='{\\i1}' + text))
+    return doc
+
+
+def _legacy(docs) -> float:
+    # one backend request per event, one after another
+    start = time.perf_counter()
+    for doc in docs:
+        for line in translation.get_event_lines(doc.events):
+            translation.local_backend([line], constants.TRANSLATION_TARGET_LANGUAGE, lambda: None)
+    return time.perf_counter() - start
+
+
+def _pipeline(docs) -> float:
+    start = time.perf_counter()
+    lines = []
+    for doc in docs:
+        lines.extend(translation.get_event_lines(doc.events))
+    translations = translation.translate_texts(lines)
+    for doc in docs:
+        translation.apply_translations(doc.events, translations)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='subtitle translation: per-event requests vs batched pipeline')
+    parser.add_argument('--episodes', type=int, default=4)
+    parser.add_argument('--lines', type=int, default=600)
+    args = parser.parse_args()
+
+    docs = [_get_episode(episode, args.lines) for episode in range(1, args.episodes + 1)]
+    translation.configure(backend=constants.TRANSLATION_BACKEND_LOCAL, requests_per_second=0)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        memory = translation.TranslationMemory(os.path.join(tmp_dir, 'memory.sqlite'))
+        with mock.patch.object(translation, 'MEMORY', memory):
+            legacy = _legacy(docs)
+            cold = _pipeline([_get_episode(episode, args.lines) for episode in range(1, args.episodes + 1)])
+            warm = _pipeline([_get_episode(episode, args.lines) for episode in range(1, args.episodes + 1)])
+        memory.close()
+
+    print(f'{"per-event requests":<24} {legacy:>8.2f}s')
+    print(f'{"pipeline, cold memory":<24} {cold:>8.2f}s')
+    print(f'{"pipeline, warm memory":<24} {warm:>8.2f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+from movie.utils import config
+from movie.utils import daemon
+
+if __name__ == '__main__':
+    daemon.serve(config.apply_config())
@@ -4,6 +4,7 @@ from movie.utils import config
 from movie.utils import constants
 from movie.utils.logging_config import LOG
 from movie.utils.movie import Movie
+from movie.utils import remux_plan
 from movie import scenarios
 
 
@@ -32,6 +33,9 @@ def get_extract_audio_submenu(movie_obj: Movie) -> consolemenu.items.SelectionIt
         item_extract_audio = consolemenu.items.FunctionItem(
             f'{audio_type}', scenarios.common_call, args=[movie_obj, Movie.extract_audio_from_video_files, audio_type])
         extract_audio_submenu.append_item(item_extract_audio)
+    item_extract_audio_formats = consolemenu.items.FunctionItem(
+        'Several formats at once', scenarios.extract_audio_formats, args=[movie_obj])
+    extract_audio_submenu.append_item(item_extract_audio_formats)
 
     extract_audio_menu = consolemenu.items.SubmenuItem('Extract audio from video', submenu=extract_audio_submenu)
     return extract_audio_menu
@@ -70,11 +74,14 @@ def get_subtitle_submenu(movie_obj: Movie) -> consolemenu.items.SelectionItem:
         'Convert SRT to ASS', scenarios.common_call, args=[movie_obj, Movie.subs_convert_srt_to_ass])
     item_subtitle_translation = consolemenu.items.FunctionItem(
         'Translation', scenarios.subtitle_ass_translation, args=[movie_obj])
+    item_subtitle_retiming = consolemenu.items.FunctionItem(
+        'Retiming', scenarios.subtitle_retiming, args=[movie_obj])
     subtitle_settings_submenu.append_item(item_subtitle_information)
     subtitle_settings_submenu.append_item(item_subtitle_extract_to_ass)
     subtitle_settings_submenu.append_item(item_subtitle_purification)
     subtitle_settings_submenu.append_item(item_subtitle_convert_srt_to_ass)
     subtitle_settings_submenu.append_item(item_subtitle_translation)
+    subtitle_settings_submenu.append_item(item_subtitle_retiming)
 
     subtitle_submenu = consolemenu.items.SubmenuItem(
         'Subtitle settings', submenu=subtitle_settings_submenu, menu_char='s')
@@ -82,6 +89,35 @@ def get_subtitle_submenu(movie_obj: Movie) -> consolemenu.items.SelectionItem:
     return subtitle_submenu
 
 
+def get_remux_plan_submenu(movie_obj: Movie) -> consolemenu.items.SelectionItem:
+    remux_plan_submenu = consolemenu.ConsoleMenu(
+        'Combined remux', prologue_text='queue edits, then rewrite every file once:', exit_menu_char='q')
+
+    items = [
+        consolemenu.items.FunctionItem(
+            'Queue: select streams', scenarios.select_and_process_streams, args=[movie_obj, True]),
+        consolemenu.items.FunctionItem(
+            'Queue: select streams with language',
+            scenarios.select_and_process_streams_with_language, args=[movie_obj, True]),
+        consolemenu.items.FunctionItem(
+            'Queue: extract subtitles, remove them from video', scenarios.subtitle_extract_to_ass,
+            args=[movie_obj, True]),
+        consolemenu.items.FunctionItem(
+            'Queue: remove default settings from external audio',
+            scenarios.common_call, args=[movie_obj, remux_plan.queue_external_audio_non_default]),
+        consolemenu.items.FunctionItem(
+            'Show planned commands (dry run)', scenarios.common_call, args=[movie_obj, remux_plan.dry_run]),
+        consolemenu.items.FunctionItem(
+            'Run plan (one remux per file)', scenarios.common_call, args=[movie_obj, remux_plan.run]),
+        consolemenu.items.FunctionItem(
+            'Discard plan', scenarios.common_call, args=[movie_obj, remux_plan.discard]),
+    ]
+    for item in items:
+        remux_plan_submenu.append_item(item)
+
+    return consolemenu.items.SubmenuItem('Combined remux', submenu=remux_plan_submenu, menu_char='p')
+
+
 def main_menu():
     LOG.debug('')
     LOG.debug('                      PROGRAM START')
@@ -105,8 +141,14 @@ def main_menu():
     item_subtitle = get_subtitle_submenu(movie_obj)
     item_subtitle.set_menu(menu)
 
+    item_remux_plan = get_remux_plan_submenu(movie_obj)
+    item_remux_plan.set_menu(menu)
+
     item_preview = consolemenu.items.FunctionItem(
         'Preview generation', scenarios.common_call, args=[movie_obj, Movie.preview_generate], menu_char='g')
+    item_preview_copies = consolemenu.items.FunctionItem(
+        'Preview generation (without numbers)',
+        scenarios.common_call, args=[movie_obj, Movie.preview_generate, False])
     item_renaming = consolemenu.items.FunctionItem(
         'Renaming files', scenarios.common_call, args=[movie_obj, Movie.rename_files], menu_char='r')
 
@@ -115,7 +157,9 @@ def main_menu():
     menu.append_item(item_streams_processing)
     menu.append_item(item_audio_processing)
     menu.append_item(item_subtitle)
+    menu.append_item(item_remux_plan)
     menu.append_item(item_preview)
+    menu.append_item(item_preview_copies)
     menu.append_item(item_renaming)
 
     menu.start()
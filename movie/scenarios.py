@@ -9,6 +9,8 @@ from movie.utils.logging_config import LOG
 from movie.utils import constants
 from movie.utils import movie
 from movie.utils import notation
+from movie.utils import remux_plan
+from movie.utils import retiming
 from movie.utils import stream
 
 def _function_end(pu: consolemenu.PromptUtils) -> None:
@@ -22,7 +24,7 @@ def common_call(movie_obj: movie.Movie, function, *args, **kwargs):
     try:
         function(movie_obj, *args, **kwargs)
     except Exception:
-        LOG.exception(f'Error while running function [{function.__name__}]')
+        LOG.exception('Error while running function [%s]', function.__name__)
 
     _function_end(pu)
 
@@ -56,13 +58,13 @@ def _display_streams(
     video_streams, audio_streams, subtitle_streams = movie_obj.__separate_media_streams__()
 
     if input_streams is not None:
-        video_streams = [s for s in video_streams if s.index in input_streams]
-        audio_streams = [s for s in audio_streams if s.index in input_streams]
-        subtitle_streams = [s for s in subtitle_streams if s.index in input_streams]
+        video_streams = [s for s in video_streams if s.stream_index in input_streams]
+        audio_streams = [s for s in audio_streams if s.stream_index in input_streams]
+        subtitle_streams = [s for s in subtitle_streams if s.stream_index in input_streams]
 
-    LOG.debug(f'{video_streams = }')
-    LOG.debug(f'{audio_streams = }')
-    LOG.debug(f'{subtitle_streams = }')
+    LOG.debug('video_streams = %r', video_streams)
+    LOG.debug('audio_streams = %r', audio_streams)
+    LOG.debug('subtitle_streams = %r', subtitle_streams)
 
     pu.println(f'{colors.color("#: (Language) Title", fg="#FFFFFF")}')
     if constants.STREAM_TYPE_VIDEO in stream_type:
@@ -169,7 +171,7 @@ def _get_streams_to_video_files_map(pu: consolemenu.PromptUtils, movie_obj: movi
         if not streams_for_all_videos:
             while True:
                 pu.clear()
-                LOG.info(f'=== {video_file} ===')
+                LOG.info('=== %s ===', video_file)
                 _display_streams(pu, movie_obj)
                 _print_information_streams_selection(pu)
                 input_streams = _get_input_streams(pu, movie_obj)
@@ -229,12 +231,16 @@ def _get_streams_language_to_video_files_map(
     return exec_map
 
 
-def select_and_process_streams(movie_obj: movie.Movie):
+def select_and_process_streams(movie_obj: movie.Movie, queue: bool = False):
     pu = consolemenu.PromptUtils(consolemenu.Screen())
 
     try:
         exec_map = _get_streams_to_video_files_map(pu, movie_obj)
-        if exec_map is not None:
+        if exec_map is not None and queue:
+            for video_file, input_streams in exec_map.items():
+                remux_plan.PLAN.get(movie_obj, video_file).select(input_streams)
+            pu.println(f'\nQueued, {len(remux_plan.PLAN)} files in the plan\n')
+        elif exec_map is not None:
             pu.println('\nStarting saving streams process\n')
             movie_obj.process_streams_to_video_files(exec_map)
     except Exception:
@@ -243,7 +249,7 @@ def select_and_process_streams(movie_obj: movie.Movie):
     _function_end(pu)
 
 
-def select_and_process_streams_with_language(movie_obj: movie.Movie):
+def select_and_process_streams_with_language(movie_obj: movie.Movie, queue: bool = False):
     pu = consolemenu.PromptUtils(consolemenu.Screen())
 
     try:
@@ -251,15 +257,20 @@ def select_and_process_streams_with_language(movie_obj: movie.Movie):
         if map_video_to_selected_streams is not None:
             exec_map = _get_streams_language_to_video_files_map(pu, movie_obj, map_video_to_selected_streams)
 
-            pu.println('\nStarting saving streams process\n')
-            movie_obj.process_streams_language_to_video_files(exec_map)
+            if queue:
+                for video_file, streams_language in exec_map.items():
+                    remux_plan.PLAN.get(movie_obj, video_file).set_languages(streams_language)
+                pu.println(f'\nQueued, {len(remux_plan.PLAN)} files in the plan\n')
+            else:
+                pu.println('\nStarting saving streams process\n')
+                movie_obj.process_streams_language_to_video_files(exec_map)
     except Exception:
         LOG.exception('Error while running program')
 
     _function_end(pu)
 
 
-def subtitle_extract_to_ass(movie_obj: movie.Movie):
+def subtitle_extract_to_ass(movie_obj: movie.Movie, queue: bool = False):
     pu = consolemenu.PromptUtils(consolemenu.Screen())
     pu.println(
         '''
@@ -277,11 +288,16 @@ Extracting subtitle stream to .ass file
     if input_streams is None:
         return
     try:
-        if pu.confirm_answer('aa', message='Save subtitle track in video file?'):
-            movie_obj.extract_subtitle(keep_subtitles=True, streams_index=input_streams)
+        keep_subtitles = pu.confirm_answer('aa', message='Save subtitle track in video file?')
+        if queue:
+            # the subtitle files and the video, with or without them, are written by the planned remux, .srt
+            # files are converted after it
+            for video_file in all_videos:
+                remux_plan.PLAN.get(movie_obj, video_file).extract_subtitles(input_streams, keep_subtitles)
+            pu.println(f'\nQueued, {len(remux_plan.PLAN)} files in the plan\n')
         else:
-            movie_obj.extract_subtitle(streams_index=input_streams)
-        movie_obj.subs_convert_srt_to_ass()
+            movie_obj.extract_subtitle(keep_subtitles=keep_subtitles, streams_index=input_streams)
+            movie_obj.subs_convert_srt_to_ass()
     except Exception:
         LOG.exception('Error while running program')
 
@@ -305,6 +321,89 @@ Translation subtitle
     _function_end(pu)
 
 
+def _get_input_retiming(pu: consolemenu.PromptUtils) -> Optional[str]:
+    while True:
+        raw_input = pu.input('\nEnter retiming')
+        user_input = raw_input.input_string.strip()
+
+        if re.match(r'^q', user_input.lower()):
+            pu.println('Quiting\n')
+            return None
+
+        if not user_input:
+            pu.println('Empty string\n')
+        elif not retiming.is_valid(user_input):
+            pu.println(f'Wrong retiming, for example: {", ".join(retiming.SPEC_EXAMPLES)}\n')
+        else:
+            return user_input
+
+
+def subtitle_retiming(movie_obj: movie.Movie):
+    pu = consolemenu.PromptUtils(consolemenu.Screen())
+    pu.println(
+        '''
+Retiming every .ass and .srt subtitle in the folder
+Operations separated by spaces, applied in order:
+    +1.5 or -0:00:02.300       shift by seconds or [h:]m:s
+    *1.001                     stretch
+    23.976>25                  from 23.976 fps to 25 fps
+    0:10=0:11,20:00=20:03      map source times to target times
+For example: 23.976>25 +0.5
+
+Enter: q or quit to exit
+        '''
+    )
+    spec = _get_input_retiming(pu)
+    if spec is None:
+        return
+    try:
+        movie_obj.subtitle_retiming(spec)
+    except Exception:
+        LOG.exception('Error while running program')
+
+    _function_end(pu)
+
+
+def _get_input_audio_types(pu: consolemenu.PromptUtils) -> Optional[List[str]]:
+    while True:
+        raw_input = pu.input('\nEnter audio formats separated by commas')
+        user_input = raw_input.input_string.strip().lower()
+
+        if re.match(r'^q', user_input):
+            pu.println('Quiting\n')
+            return None
+
+        audio_types = [f'.{t.strip().lstrip(".")}' for t in user_input.split(',') if t.strip()]
+        if not audio_types:
+            pu.println('Empty string\n')
+        elif not set(audio_types) <= set(constants.AUDIO):
+            pu.println(f'Unknown formats: {sorted(set(audio_types) - set(constants.AUDIO))}\n')
+        else:
+            return audio_types
+
+
+def extract_audio_formats(movie_obj: movie.Movie):
+    pu = consolemenu.PromptUtils(consolemenu.Screen())
+    pu.println(
+        f'''
+Extracting audio to several formats, every video file is decoded once
+Available formats: {', '.join(constants.AUDIO)}
+For example: flac,opus
+
+Enter: q or quit to exit
+        '''
+    )
+    audio_types = _get_input_audio_types(pu)
+    if audio_types is None:
+        return
+    try:
+        movie_obj.extract_audio_from_video_files(audio_types)
+    except Exception:
+        LOG.exception('Error while running program')
+
+    _function_end(pu)
+
+
 def subtitle_ass_purification(movie_obj: movie.Movie):
     pu = consolemenu.PromptUtils(consolemenu.Screen())
     pu.println(
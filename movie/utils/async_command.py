@@ -0,0 +1,141 @@
+import asyncio
+import collections
+import subprocess
+from typing import Callable
+from typing import Deque
+from typing import List
+from typing import Optional
+
+from movie.utils import constants
+from movie.utils.logging_config import LOG
+
+
+class ProgressEvent:
+    # one block of `-progress pipe:1` output, closed by a `progress=continue|end` line
+    def __init__(self, values: dict) -> None:
+        self.out_time = _to_float(values.get('out_time_us'), 1e-6)
+        self.speed = _to_float(values.get('speed', '').rstrip('x'))
+        self.fps = _to_float(values.get('fps'))
+        self.total_size = _to_int(values.get('total_size'))
+        self.finished = values.get('progress') == 'end'
+
+    def __repr__(self):
+        return (f'out_time={self.out_time} speed={self.speed} fps={self.fps} '
+                f'total_size={self.total_size} finished={self.finished}')
+
+    def percent(self, duration: Optional[float]) -> Optional[float]:
+        if self.finished:
+            return 100.0
+        if self.out_time is None or not duration:
+            return None
+        return min(100.0, self.out_time / duration * 100)
+
+
+def _to_float(value: Optional[str], scale: float = 1.0) -> Optional[float]:
+    try:
+        return float(value) * scale
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _with_progress(command: List[str]) -> List[str]:
+    if '-progress' in command:
+        return command
+    return [command[0], '-progress', 'pipe:1', '-nostats', *command[1:]]
+
+
+async def _read_stderr(reader: asyncio.StreamReader, stderr_tail: Deque[str]) -> None:
+    async for line in reader:
+        stderr_tail.append(line.decode('utf-8', errors='replace').rstrip())
+
+
+async def _read_progress(reader: asyncio.StreamReader, on_progress: Callable[[ProgressEvent], None]) -> None:
+    values = {}
+    async for line in reader:
+        key, _, value = line.decode('utf-8', errors='replace').strip().partition('=')
+        values[key] = value
+        if key == 'progress':
+            on_progress(ProgressEvent(values))
+            values = {}
+
+
+async def _read_stdout(reader: asyncio.StreamReader, stdout_chunks: List[bytes]) -> None:
+    stdout_chunks.append(await reader.read())
+
+
+async def _terminate(process) -> None:
+    LOG.debug('terminating process %d', process.pid)
+    try:
+        process.terminate()
+        await asyncio.wait_for(process.wait(), constants.COMMAND_TERMINATE_TIMEOUT)
+    except ProcessLookupError:
+        return
+    except asyncio.TimeoutError:
+        LOG.debug('killing process %d', process.pid)
+        process.kill()
+        await process.wait()
+
+
+async def execute_async(
+        command: List[str],
+        timeout: Optional[float] = None,
+        on_progress: Optional[Callable[[ProgressEvent], None]] = None,
+) -> subprocess.CompletedProcess:
+    LOG.debug(constants.LOG_FUNCTION_START.format(name = 'ASYNC COMMAND EXECUTION'))
+    if on_progress is not None:
+        command = _with_progress(command)
+    command_str = ' '.join(command)
+    LOG.debug('command_str = %r', command_str)
+
+    process = await asyncio.create_subprocess_exec(
+        *command, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+
+    # only the tail of stderr is kept, ffmpeg can print a line per frame
+    stderr_tail = collections.deque(maxlen=constants.COMMAND_STDERR_TAIL_LINES)
+    stdout_chunks = []
+    readers = [_read_stderr(process.stderr, stderr_tail)]
+    if on_progress is not None:
+        readers.append(_read_progress(process.stdout, on_progress))
+    else:
+        readers.append(_read_stdout(process.stdout, stdout_chunks))
+
+    try:
+        await asyncio.wait_for(asyncio.gather(*readers, process.wait()), timeout)
+    except asyncio.TimeoutError as exc:
+        LOG.error('%s\ntimed out after %ss, stderr tail:\n%s', command_str, timeout, '\n'.join(stderr_tail))
+        raise RuntimeError(f'''Command
+{command_str}
+timed out after {timeout} seconds.
+More information in movie.log''') from exc
+    finally:
+        if process.returncode is None:
+            await _terminate(process)
+
+    stderr = '\n'.join(stderr_tail)
+    if process.returncode != 0:
+        LOG.error('%s\nreturned %d, stderr tail:\n%s', command_str, process.returncode, stderr)
+        raise RuntimeError(f'''Command
+{command_str}
+returned non-zero exit status {process.returncode}.
+More information in movie.log''')
+
+    LOG.debug('returncode = %r, stderr tail = %r', process.returncode, stderr)
+    stdout = b''.join(stdout_chunks).decode('utf-8', errors='replace')
+    LOG.debug(constants.LOG_FUNCTION_END.format(name = 'ASYNC COMMAND EXECUTION'))
+    return subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+
+
+def execute(
+        command: List[str],
+        timeout: Optional[float] = None,
+        on_progress: Optional[Callable[[ProgressEvent], None]] = None,
+) -> subprocess.CompletedProcess:
+    # every caller (and every worker thread) gets its own event loop
+    return asyncio.run(execute_async(command, timeout, on_progress))
@@ -1,30 +1,80 @@
+import os
 import subprocess
 from typing import List
+from typing import Optional
+from typing import Tuple
 
+from movie.utils import async_command
 from movie.utils import constants
 from movie.utils.logging_config import LOG
+from movie.utils import tracing
+
+
+_SETTINGS = {'executor': constants.EXECUTOR_SYNC, 'timeout': None}
+
+
+def configure(executor: str = constants.EXECUTOR_SYNC, timeout: Optional[float] = None) -> None:
+    LOG.debug('executor = %r, timeout = %r', executor, timeout)
+    _SETTINGS['executor'] = executor
+    _SETTINGS['timeout'] = timeout
+
+
+def _log_progress(event: async_command.ProgressEvent) -> None:
+    LOG.debug('progress: %s', event)
+
+
+def _get_command_io(command: List[str]) -> Tuple[int, int]:
+    # ffmpeg reads every -i file and writes the paths among the other arguments, ffprobe only reads its arguments
+    inputs = {arg for prev, arg in zip(command, command[1:]) if prev == '-i'}
+    outputs = {arg for arg in command[1:] if arg not in inputs and not arg.startswith('-')}
+    if not inputs:
+        inputs, outputs = outputs, set()
+    return (sum(os.path.getsize(path) for path in inputs if os.path.isfile(path)),
+            sum(os.path.getsize(path) for path in outputs if os.path.isfile(path)))
 
 
 def execute(command: List[str]) -> subprocess.CompletedProcess:
+    with tracing.span(os.path.basename(command[0]), tracing.CATEGORY_COMMAND):
+        output = _execute(command)
+        if tracing.is_enabled():
+            tracing.add_io(*_get_command_io(command))
+    return output
+
+
+def _get_output_tail(output) -> str:
+    # ffmpeg prints its errors last; the output of a timed out process may be bytes or missing
+    if isinstance(output, bytes):
+        output = output.decode('utf-8', errors='replace')
+    output = output or ''
+    return output if len(output) <= constants.LOG_OUTPUT_CHARS else f'...{output[-constants.LOG_OUTPUT_CHARS:]}'
+
+
+def _execute(command: List[str]) -> subprocess.CompletedProcess:
+    if _SETTINGS['executor'] == constants.EXECUTOR_ASYNC:
+        is_ffmpeg = os.path.basename(command[0]).lower().startswith('ffmpeg')
+        return async_command.execute(command, _SETTINGS['timeout'], _log_progress if is_ffmpeg else None)
+
     LOG.debug(constants.LOG_FUNCTION_START.format(name = 'COMMAND EXECUTION'))
     command_str = ' '.join(command)
-    LOG.debug(f'{command_str = }')
+    LOG.debug('command_str = %r', command_str)
 
     try:
-        stdout = subprocess.run(command, capture_output=True, text=True, encoding='utf-8', check=True)
+        stdout = subprocess.run(
+            command, capture_output=True, text=True, encoding='utf-8', check=True, timeout=_SETTINGS['timeout'])
+    except subprocess.TimeoutExpired as exc:
+        LOG.error('%s\ntimed out, stderr tail:\n%s', command_str, _get_output_tail(exc.stderr))
+        raise RuntimeError(f'''Command
+{command_str}
+timed out after {exc.timeout} seconds.
+More information in movie.log''') from exc
     except subprocess.CalledProcessError as exc:
-        LOG.debug(f'{exc.returncode = }')
-        LOG.debug(f'{exc.stderr = }')
-        LOG.debug(f'{exc.output = }')
+        LOG.error('%s\nreturned %d, stderr tail:\n%s', command_str, exc.returncode, _get_output_tail(exc.stderr))
         raise RuntimeError(f'''Command
 {command_str}
 returned non-zero exit status {exc.returncode}.
 More information in movie.log''') from exc
 
-    LOG.debug(f'{stdout.args = }')
-    LOG.debug(f'{stdout.returncode = }')
-    LOG.debug(f'{stdout.stderr = }')
-    LOG.debug(f'{stdout.stdout = }')
+    LOG.debug('returncode = %r, stderr tail = %r', stdout.returncode, _get_output_tail(stdout.stderr))
     LOG.debug(constants.LOG_FUNCTION_END.format(name = 'COMMAND EXECUTION'))
 
     return stdout
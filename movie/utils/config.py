@@ -2,13 +2,24 @@ import configparser
 import os
 import re
 import sys
+from typing import Dict
 from typing import List
+from typing import Optional
 from typing import Tuple
 
 from movie.utils import command
 from movie.utils import constants
+from movie.utils import daemon
+from movie.utils import header_probe
+from movie.utils import jobs
+from movie.utils import logging_config
 from movie.utils.logging_config import LOG
 from movie.utils.movie import Movie
+from movie.utils import notation
+from movie.utils import preview
+from movie.utils import scheduler
+from movie.utils import tracing
+from movie.utils import translation
 
 
 def _config_load(config_path: str = constants.CONFIG_PATH) -> configparser.ConfigParser:
@@ -24,6 +35,56 @@ def _config_get_values(movie_config: configparser.ConfigParser) -> Tuple[List[st
             str(movie_config.get('Config', 'NAME_TEMPLATE', fallback=None)))
 
 
+def _config_get_workers(movie_config: configparser.ConfigParser) -> str:
+    return movie_config.get('Performance', 'WORKERS', fallback='') or str(constants.DEFAULT_WORKERS)
+
+
+def _config_get_processes(movie_config: configparser.ConfigParser) -> str:
+    return movie_config.get('Performance', 'PROCESSES', fallback='') or str(os.cpu_count() or 1)
+
+
+def _config_get_executor(movie_config: configparser.ConfigParser) -> Tuple[str, str]:
+    return (movie_config.get('Performance', 'EXECUTOR', fallback='') or constants.EXECUTOR_SYNC,
+            movie_config.get('Performance', 'COMMAND_TIMEOUT', fallback=''))
+
+
+def _config_get_devices(movie_config: configparser.ConfigParser) -> Tuple[str, str, str]:
+    return (movie_config.get('Devices', 'DEFAULT_LIMIT', fallback='') or str(constants.DEVICE_DEFAULT_LIMIT),
+            movie_config.get('Devices', 'CPU_LIMIT', fallback='') or str(os.cpu_count() or 1),
+            movie_config.get('Devices', 'LIMITS', fallback=''))
+
+
+def _get_device_limits(limits: str) -> dict:
+    # "path=limit" pairs separated by commas, the path is any folder on the device
+    device_limits = {}
+    for entry in filter(None, (entry.strip() for entry in limits.split(','))):
+        path, _, limit = entry.rpartition('=')
+        device_limits[path.strip()] = limit.strip()
+    return device_limits
+
+
+def _config_get_translation(movie_config: configparser.ConfigParser) -> Tuple[str, str, str, str, str]:
+    return (movie_config.get('Translation', 'BACKEND', fallback='') or constants.TRANSLATION_BACKEND_GOOGLE,
+            movie_config.get('Translation', 'TARGET_LANGUAGE', fallback='') or constants.TRANSLATION_TARGET_LANGUAGE,
+            movie_config.get('Translation', 'BATCH_CHARS', fallback='') or str(constants.TRANSLATION_BATCH_CHARS),
+            movie_config.get('Translation', 'WORKERS', fallback='') or str(constants.TRANSLATION_WORKERS),
+            movie_config.get('Translation', 'REQUESTS_PER_SECOND', fallback='')
+            or str(constants.TRANSLATION_REQUESTS_PER_SECOND))
+
+
+def _config_get_log_level(movie_config: configparser.ConfigParser) -> str:
+    return (movie_config.get('Logging', 'LEVEL', fallback='') or constants.LOG_LEVEL).upper()
+
+
+def _config_get_daemon(movie_config: configparser.ConfigParser) -> Tuple[str, str, str, str, str, str]:
+    return (movie_config.get('Daemon', 'WATCH_FOLDERS', fallback=''),
+            movie_config.get('Daemon', 'OPERATIONS', fallback='') or constants.DAEMON_OPERATIONS,
+            movie_config.get('Daemon', 'STREAMS', fallback=''),
+            movie_config.get('Daemon', 'SETTLE_SECONDS', fallback='') or str(constants.DAEMON_SETTLE_SECONDS),
+            movie_config.get('Daemon', 'POLL_INTERVAL', fallback='') or str(constants.DAEMON_POLL_INTERVAL),
+            movie_config.get('Daemon', 'WATCHER', fallback='') or constants.DAEMON_WATCHER_AUTO)
+
+
 def _config_validate(movie_config: configparser.ConfigParser) -> Tuple[dict, bool]:
     config_statuses = {}
     is_valid = True
@@ -46,6 +107,45 @@ def _config_validate(movie_config: configparser.ConfigParser) -> Tuple[dict, boo
     is_valid = is_valid and result
     config_statuses['NAME_TEMPLATE'] = f'"{name_template}" {constants.CHECK if result else constants.CROSS} {message}'
 
+    workers = _config_get_workers(movie_config)
+    result, message = _verification_workers(workers)
+    is_valid = is_valid and result
+    config_statuses['WORKERS'] = f'"{workers}" {constants.CHECK if result else constants.CROSS} {message}'
+
+    processes = _config_get_processes(movie_config)
+    result, message = _verification_workers(processes)
+    is_valid = is_valid and result
+    config_statuses['PROCESSES'] = f'"{processes}" {constants.CHECK if result else constants.CROSS} {message}'
+
+    executor_values = _config_get_executor(movie_config)
+    result, message = _verification_executor(*executor_values)
+    is_valid = is_valid and result
+    config_statuses['EXECUTOR'] = (
+        f'"{", ".join(executor_values)}" {constants.CHECK if result else constants.CROSS} {message}')
+
+    device_values = _config_get_devices(movie_config)
+    result, message = _verification_devices(*device_values)
+    is_valid = is_valid and result
+    config_statuses['DEVICES'] = (
+        f'"{", ".join(device_values)}" {constants.CHECK if result else constants.CROSS} {message}')
+
+    translation_values = _config_get_translation(movie_config)
+    result, message = _verification_translation(*translation_values)
+    is_valid = is_valid and result
+    config_statuses['TRANSLATION'] = (
+        f'"{", ".join(translation_values)}" {constants.CHECK if result else constants.CROSS} {message}')
+
+    daemon_values = _config_get_daemon(movie_config)
+    result, message = _verification_daemon(daemon_values)
+    is_valid = is_valid and result
+    config_statuses['DAEMON'] = (
+        f'"{", ".join(daemon_values)}" {constants.CHECK if result else constants.CROSS} {message}')
+
+    result, message = _verification_log_level(_config_get_log_level(movie_config))
+    is_valid = is_valid and result
+    config_statuses['LOG_LEVEL'] = (
+        f'"{_config_get_log_level(movie_config)}" {constants.CHECK if result else constants.CROSS} {message}')
+
     return config_statuses, is_valid
 
 
@@ -86,26 +186,172 @@ def _verification_name_template(name_template: str) -> Tuple[bool, str]:
     return True, ''
 
 
-def _load_and_validate_config(config_path: str = constants.CONFIG_PATH) -> configparser.ConfigParser:
+def _verification_workers(workers: str) -> Tuple[bool, str]:
+    if not workers.isdigit() or int(workers) < 1:
+        return False, 'must be a positive integer'
+
+    return True, ''
+
+
+def _verification_executor(executor: str, timeout: str) -> Tuple[bool, str]:
+    if executor not in constants.EXECUTORS:
+        return False, f'must be one of {constants.EXECUTORS}'
+
+    if timeout and not timeout.isdigit():
+        return False, 'timeout must be a number of seconds'
+
+    return True, ''
+
+
+def _verification_devices(default_limit: str, cpu_limit: str, limits: str) -> Tuple[bool, str]:
+    for value in [default_limit, cpu_limit, *_get_device_limits(limits).values()]:
+        result, message = _verification_workers(value)
+        if not result:
+            return False, f'limits {message}'
+
+    if any(not path for path in _get_device_limits(limits)):
+        return False, 'limits must be "path=limit" pairs separated by commas'
+
+    return True, ''
+
+
+def _verification_translation(
+        backend: str, target: str, batch_chars: str, workers: str, requests_per_second: str) -> Tuple[bool, str]:
+    if backend not in translation.BACKENDS:
+        return False, f'backend must be one of {list(translation.BACKENDS)}'
+
+    if not target:
+        return False, 'target language not set'
+
+    if not batch_chars.isdigit() or not workers.isdigit() or int(batch_chars) < 1 or int(workers) < 1:
+        return False, 'batch chars and workers must be positive integers'
+
+    try:
+        float(requests_per_second)
+    except ValueError:
+        return False, 'requests per second must be a number'
+
+    return True, ''
+
+
+def _verification_daemon(daemon_values: Tuple[str, str, str, str, str, str]) -> Tuple[bool, str]:
+    watch_folders, operations, streams, settle_seconds, poll_interval, watcher_kind = daemon_values
+    for folder in filter(None, watch_folders.split(os.pathsep)):
+        if not os.path.isdir(folder):
+            return False, f'watch folder not found: {folder}'
+
+    unknown_operations = [op for op in operations.split(',') if op.strip() not in daemon.OPERATIONS]
+    if unknown_operations:
+        return False, f'unknown operations {unknown_operations}, must be from {list(daemon.OPERATIONS)}'
+
+    if streams and not notation.validation(streams):
+        return False, 'streams must be in stream numbers notation, for example: 0-2,5'
+
+    try:
+        float(settle_seconds)
+        float(poll_interval)
+    except ValueError:
+        return False, 'settle seconds and poll interval must be numbers'
+
+    if watcher_kind not in constants.DAEMON_WATCHERS:
+        return False, f'watcher must be one of {constants.DAEMON_WATCHERS}'
+
+    return True, ''
+
+
+def _verification_log_level(log_level: str) -> Tuple[bool, str]:
+    if log_level not in constants.LOG_LEVELS:
+        return False, f'must be one of {constants.LOG_LEVELS}'
+
+    return True, ''
+
+
+def _apply_daemon(movie_config: configparser.ConfigParser) -> None:
+    watch_folders, operations, streams, settle_seconds, poll_interval, watcher_kind = _config_get_daemon(movie_config)
+    daemon.configure(
+        folders=list(filter(None, watch_folders.split(os.pathsep))),
+        operations=[op.strip() for op in operations.split(',')],
+        streams=streams,
+        settle_seconds=float(settle_seconds),
+        poll_interval=float(poll_interval),
+        watcher=watcher_kind,
+    )
+
+
+def _apply_translation(movie_config: configparser.ConfigParser) -> None:
+    backend, target, batch_chars, workers, requests_per_second = _config_get_translation(movie_config)
+    translation.configure(
+        backend=backend,
+        target=target,
+        batch_chars=int(batch_chars),
+        workers=int(workers),
+        requests_per_second=float(requests_per_second),
+    )
+
+
+def _apply_logging(movie_config: configparser.ConfigParser) -> None:
+    logging_config.configure(_config_get_log_level(movie_config))
+
+
+def _apply_executor(movie_config: configparser.ConfigParser) -> None:
+    executor, timeout = _config_get_executor(movie_config)
+    command.configure(executor, int(timeout) if timeout else None)
+    jobs.configure(int(_config_get_processes(movie_config)))
+    preview.configure(movie_config.getboolean('Performance', 'PREVIEW_HARDLINKS', fallback=False))
+    tracing.configure(movie_config.get('Performance', 'TRACE_FILE', fallback=''))
+    header_probe.configure(movie_config.getboolean('Performance', 'HEADER_PROBE', fallback=True))
+
+    default_limit, cpu_limit, limits = _config_get_devices(movie_config)
+    scheduler.configure(
+        int(default_limit), int(cpu_limit),
+        {path: int(limit) for path, limit in _get_device_limits(limits).items()})
+
+
+def validate_config(config_path: str = constants.CONFIG_PATH) -> Tuple[configparser.ConfigParser, Dict[str, str]]:
+    # the loaded config and its settings that are not valid, for callers that report instead of exiting
     config = _config_load(config_path)
     config_statuses, is_valid = _config_validate(config)
 
     for key, message in config_statuses.items():
-        LOG.debug(f'{key}: {message}')
+        LOG.debug('%s: %s', key, message)
 
-    if not is_valid:
-        LOG.info(f'logs in {constants.LOG_FILE}')
-        LOG.error(f'Config not valid. Program exit. {constants.CROSS}')
+    if is_valid:
+        return config, {}
+    return config, {key: message for key, message in config_statuses.items() if constants.CROSS in message}
+
+
+def _load_and_validate_config(config_path: str = constants.CONFIG_PATH) -> configparser.ConfigParser:
+    config, config_errors = validate_config(config_path)
+
+    if config_errors:
+        LOG.info('logs in %s', constants.LOG_FILE)
+        LOG.error('Config not valid. Program exit. %s', constants.CROSS)
         sys.exit(1)
 
     return config
 
 
-def apply_config(config_path: str = constants.CONFIG_PATH) -> Movie:
-    config = _load_and_validate_config(config_path)
-    return Movie(*_config_get_values(config))
+def apply_config(config_path: str = constants.CONFIG_PATH,
+                 config: Optional[configparser.ConfigParser] = None) -> Movie:
+    # `config` is one validate_config already checked
+    if config is None:
+        config = _load_and_validate_config(config_path)
+    movie_obj = Movie(*_config_get_values(config))
+    movie_obj.workers = int(_config_get_workers(config))
+    movie_obj.recover_interrupted_jobs()
+    _apply_logging(config)
+    _apply_executor(config)
+    _apply_translation(config)
+    _apply_daemon(config)
+    return movie_obj
 
 
 def update_config(obj: Movie, config_path: str = constants.CONFIG_PATH) -> None:
     config = _load_and_validate_config(config_path)
     obj.ffmpeg_path, obj.ffprobe_path, obj.movies_folder, obj.name_template = _config_get_values(config)
+    obj.workers = int(_config_get_workers(config))
+    obj.recover_interrupted_jobs()
+    _apply_logging(config)
+    _apply_executor(config)
+    _apply_translation(config)
+    _apply_daemon(config)
@@ -3,6 +3,61 @@ CROSS = '\u274c'  # ❌ cross mark
 CONFIG_PATH = 'config.ini'
 
 LOG_FILE = 'movie.log'
+LOG_MAX_BYTES = 10 * 1024 ** 2
+LOG_BACKUP_COUNT = 5
+PROBE_JOURNAL_FILE = 'logs/ffprobe.jsonl'
+LOG_LEVEL = 'INFO'
+LOG_LEVELS = ['DEBUG', 'INFO', 'WARNING', 'ERROR']
+# the end of a command's output kept in the log; ffprobe's whole output is in the probe journal
+LOG_OUTPUT_CHARS = 2000
+
+DEFAULT_WORKERS = 1
+
+EXECUTOR_SYNC = 'sync'
+EXECUTOR_ASYNC = 'async'
+EXECUTORS = [EXECUTOR_SYNC, EXECUTOR_ASYNC]
+COMMAND_STDERR_TAIL_LINES = 200
+COMMAND_TERMINATE_TIMEOUT = 5
+
+DEVICE_DEFAULT_LIMIT = 2
+
+PROBE_CACHE_FILE = 'probe_cache.sqlite'
+PROBE_CACHE_VERSION = 2
+
+JOB_QUEUE_FILE = 'job_queue.sqlite'
+JOB_QUEUE_VERSION = 2
+JOB_OPERATION_REMUX = 'remux'
+JOB_OPERATION_EXTRACT_SUBTITLE = 'extract_subtitle'
+
+SUBTITLE_CACHE_SIZE = 64
+ENCODING_DETECTION_CHUNK = 64 * 1024
+# the files that are not utf-8 and that chardet cannot name are most likely Cyrillic
+ENCODING_FALLBACK = 'cp1251'
+ENCODING_CACHE_SIZE = 1024
+
+TRANSLATION_MEMORY_FILE = 'translation_memory.sqlite'
+# the schema of the first translation memory files, their rows stay valid
+TRANSLATION_MEMORY_VERSION = 0
+TRANSLATION_BACKEND_GOOGLE = 'google'
+TRANSLATION_BACKEND_LOCAL = 'local'
+TRANSLATION_TARGET_LANGUAGE = 'ru'
+TRANSLATION_BATCH_CHARS = 4500
+TRANSLATION_WORKERS = 4
+TRANSLATION_REQUESTS_PER_SECOND = 5
+TRANSLATION_LOCAL_BACKEND_LATENCY = 0.05
+
+DAEMON_WATCHER_AUTO = 'auto'
+DAEMON_WATCHER_INOTIFY = 'inotify'
+DAEMON_WATCHER_POLLING = 'polling'
+DAEMON_WATCHERS = [DAEMON_WATCHER_AUTO, DAEMON_WATCHER_INOTIFY, DAEMON_WATCHER_POLLING]
+DAEMON_OPERATION_STREAMS = 'streams'
+DAEMON_OPERATION_EXTRACT_SUBTITLE = 'extract_subtitle'
+DAEMON_OPERATION_CONVERT_SRT = 'convert_srt'
+DAEMON_OPERATION_PURIFICATION = 'purification'
+DAEMON_OPERATION_RENAME = 'rename'
+DAEMON_OPERATIONS = 'extract_subtitle,convert_srt,purification'
+DAEMON_SETTLE_SECONDS = 5
+DAEMON_POLL_INTERVAL = 1
 
 LOG_FUNCTION_START = '╔==================== {name} ====================╗'
 LOG_FUNCTION_END =   '╚==================== {name} ====================╝'
@@ -31,11 +86,20 @@ OPUS = '.opus'
 WAV = '.wav'
 AUDIO = [AAC, FLAC, M4A, MKA, MP3, OPUS, WAV]
 
+# containers whose track headers can be edited in place
+MATROSKA = [MKV, MKA]
+# ISO base media files the header probe reads
+ISO_MEDIA = [MP4, M4V, M4A]
+
 NAME_TEMPLATE_VERIFICATION_REGEX = r'^[^\/\\\:\*\?\"\<\>\|]+$'
-STREAM = r'\[STREAM\](.*?)\[/STREAM\]'
 SUBTITLE_GRAPHIC_REGEX = r'\{\\an\d*\}m'
 SUBTITLE_TAGS_REGEX = r'{[^}]*}'
 
 STREAM_TYPE_VIDEO = 'video'
 STREAM_TYPE_AUDIO = 'audio'
 STREAM_TYPE_SUBTITLE = 'subtitle'
+STREAM_TYPES = [STREAM_TYPE_VIDEO, STREAM_TYPE_AUDIO, STREAM_TYPE_SUBTITLE]
+FFPROBE_STREAM_ENTRIES = (
+    'stream=index,codec_type,codec_name,duration,bit_rate,channels,avg_frame_rate,r_frame_rate'
+    ':stream_tags:stream_disposition'
+)
@@ -0,0 +1,171 @@
+import concurrent.futures
+import os
+import signal
+import threading
+from typing import Dict
+from typing import List
+
+from movie.utils import constants
+from movie.utils.logging_config import LOG
+from movie.utils.movie import Movie
+from movie.utils import notation
+from movie.utils import watcher
+
+
+_SETTINGS = {
+    'folders': [],
+    'operations': constants.DAEMON_OPERATIONS.split(','),
+    'streams': '',
+    'settle_seconds': float(constants.DAEMON_SETTLE_SECONDS),
+    'poll_interval': float(constants.DAEMON_POLL_INTERVAL),
+    'watcher': constants.DAEMON_WATCHER_AUTO,
+}
+
+
+def configure(**settings) -> None:
+    LOG.debug('settings = %r', settings)
+    _SETTINGS.update(settings)
+
+
+def _select_streams(movie_obj: Movie, file: str) -> None:
+    if not _SETTINGS['streams']:
+        LOG.warning('%s: STREAMS is not set, %s is left as is', constants.DAEMON_OPERATION_STREAMS, file)
+        return
+    movie_obj.process_streams_to_video_files({file: notation.recognition(_SETTINGS['streams'])})
+
+
+def _extract_subtitle(movie_obj: Movie, file: str) -> None:
+    movie_obj.analyze_video_file(file)
+    if movie_obj.streams.of_type(constants.STREAM_TYPE_SUBTITLE):
+        movie_obj.extract_subtitle(keep_subtitles=True, video_files=[file])
+
+
+def _convert_srt(movie_obj: Movie, file: str) -> None:
+    movie_obj.convert_srt_file(file)
+
+
+def _purify(movie_obj: Movie, file: str) -> None:
+    f_name, _ = os.path.splitext(file)
+    # the purified copy lands in the same folder and must not be purified again
+    if not f_name.endswith('.PURE'):
+        movie_obj.purify_subtitle_file(file)
+
+
+def _rename(movie_obj: Movie, _: str) -> None:
+    movie_obj.rename_files()
+
+
+# operation name -> (file extensions it applies to, function(movie_obj, file name))
+OPERATIONS = {
+    constants.DAEMON_OPERATION_STREAMS: (constants.VIDEO, _select_streams),
+    constants.DAEMON_OPERATION_EXTRACT_SUBTITLE: (constants.VIDEO, _extract_subtitle),
+    constants.DAEMON_OPERATION_CONVERT_SRT: ([constants.SRT], _convert_srt),
+    constants.DAEMON_OPERATION_PURIFICATION: ([constants.ASS], _purify),
+    constants.DAEMON_OPERATION_RENAME: (
+        constants.VIDEO + constants.AUDIO + constants.SUBTITLE + constants.IMAGE, _rename),
+}
+
+
+class Daemon:
+    # jobs of one folder run one after another (they share the folder's Movie), folders run in parallel
+    def __init__(self, movies: List[Movie], operations: List[str], file_watcher, tracker) -> None:
+        self._folders = {os.path.abspath(m.movies_folder): (m, threading.Lock()) for m in movies}
+        self._operations = operations
+        self._watcher = file_watcher
+        self._tracker = tracker
+        # path -> (size, mtime_ns) after the daemon itself touched it, so its own output is not picked up again
+        self._handled: Dict[str, tuple] = {}
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(movies)))
+        self._stop = threading.Event()
+
+    def __is_ignored__(self, path: str) -> bool:
+        movie_obj, _ = self._folders[os.path.dirname(path)]
+        _, f_ext = os.path.splitext(path)
+        if movie_obj.is_temp_file(path):
+            return True
+        return not any(f_ext in extensions for extensions, _ in (OPERATIONS[op] for op in self._operations))
+
+    def __get_state__(self, path: str):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def __process__(self, path: str) -> None:
+        movie_obj, lock = self._folders[os.path.dirname(path)]
+        file = os.path.basename(path)
+        with lock:
+            state = self.__get_state__(path)
+            if state is None or self._handled.get(path) == state:
+                return
+
+            LOG.info('processing: %s', path)
+            self.__run_operations__(movie_obj, file)
+
+            # a rename moves every file of the folder, otherwise only the processed file changed
+            folder_wide = constants.DAEMON_OPERATION_RENAME in self._operations
+            with os.scandir(movie_obj.movies_folder) as entries:
+                for entry in entries:
+                    if entry.is_file() and (folder_wide or entry.path == path):
+                        self._handled[entry.path] = self.__get_state__(entry.path)
+
+    def __run_operations__(self, movie_obj: Movie, file: str) -> None:
+        _, f_ext = os.path.splitext(file)
+        for operation in self._operations:
+            extensions, function = OPERATIONS[operation]
+            if f_ext not in extensions or not os.path.isfile(os.path.join(movie_obj.movies_folder, file)):
+                continue
+            try:
+                function(movie_obj, file)
+            except Exception:
+                LOG.exception('Error while running operation [%s] for %s', operation, file)
+                return
+
+    def step(self, timeout: float) -> List[concurrent.futures.Future]:
+        for path in self._watcher.poll(timeout):
+            path = os.path.join(os.path.abspath(os.path.dirname(path)), os.path.basename(path))
+            if not self.__is_ignored__(path):
+                self._tracker.track(path)
+        return [self._executor.submit(self.__process__, path) for path in self._tracker.pop_settled()]
+
+    def serve_forever(self) -> None:
+        LOG.info('watching: %s', ', '.join(self._folders))
+        try:
+            while not self._stop.is_set():
+                self.step(_SETTINGS['poll_interval'])
+        finally:
+            self._executor.shutdown(wait=True)
+            self._watcher.close()
+
+    def stop(self, *_) -> None:
+        LOG.info('stopping, waiting for running jobs')
+        self._stop.set()
+
+
+def _get_folder_movie(movie_obj: Movie, folder: str) -> Movie:
+    folder_movie = Movie(movie_obj.ffmpeg_path, movie_obj.ffprobe_path, folder, movie_obj.name_template)
+    folder_movie.workers = movie_obj.workers
+    folder_movie.recover_interrupted_jobs()
+    return folder_movie
+
+
+def create(movie_obj: Movie) -> Daemon:
+    folders = _SETTINGS['folders'] or [movie_obj.movies_folder]
+    return Daemon(
+        [_get_folder_movie(movie_obj, os.path.abspath(folder)) for folder in folders],
+        _SETTINGS['operations'],
+        watcher.create_watcher([os.path.abspath(folder) for folder in folders], _SETTINGS['watcher']),
+        watcher.SettleTracker(_SETTINGS['settle_seconds']),
+    )
+
+
+def serve(movie_obj: Movie) -> None:
+    LOG.debug(constants.LOG_FUNCTION_START.format(name = 'DAEMON'))
+    movie_daemon = create(movie_obj)
+    signal.signal(signal.SIGTERM, movie_daemon.stop)
+    try:
+        movie_daemon.serve_forever()
+    except KeyboardInterrupt:
+        LOG.info('interrupted, running jobs were finished')
+    LOG.debug(constants.LOG_FUNCTION_END.format(name = 'DAEMON'))
@@ -0,0 +1,112 @@
+import codecs
+import collections
+import os
+import threading
+from typing import Iterator
+from typing import Optional
+from typing import Tuple
+
+from chardet.universaldetector import UniversalDetector
+
+from movie.utils import constants
+from movie.utils.logging_config import LOG
+
+
+# utf-32 goes first: its little-endian BOM starts with the utf-16 one
+BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+# encodings keyed by (absolute path, size, mtime_ns), the least recently used leave first
+_CACHE = collections.OrderedDict()
+_CACHE_LOCK = threading.Lock()
+
+
+def _detect_by_bom(data: bytes):
+    for bom, encoding in BOMS:
+        if data.startswith(bom):
+            return encoding
+    return None
+
+
+def _iter_chunks(source_file) -> Iterator[bytes]:
+    return iter(lambda: source_file.read(constants.ENCODING_DETECTION_CHUNK), b'')
+
+
+def _decode_utf8(source_file) -> Optional[str]:
+    # chunk by chunk, the first invalid sequence ends the check; the text when the whole file is utf-8
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    pieces = []
+    try:
+        for chunk in _iter_chunks(source_file):
+            pieces.append(decoder.decode(chunk))
+        pieces.append(decoder.decode(b'', final=True))
+    except UnicodeDecodeError:
+        return None
+    return ''.join(pieces)
+
+
+def _detect_incremental(source_file) -> str:
+    # chardet reads only until it is sure; a name Python has no codec for, EUC-TW, falls back
+    detector = UniversalDetector()
+    for chunk in _iter_chunks(source_file):
+        detector.feed(chunk)
+        if detector.done:
+            break
+    detector.close()
+    encoding = detector.result['encoding']
+    if encoding is None:
+        return constants.ENCODING_FALLBACK
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        LOG.warning('no codec for the detected encoding %r, %s is used', encoding, constants.ENCODING_FALLBACK)
+        return constants.ENCODING_FALLBACK
+    return encoding
+
+
+def _decode(source_file, encoding: str) -> str:
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    pieces = [decoder.decode(chunk) for chunk in _iter_chunks(source_file)]
+    pieces.append(decoder.decode(b'', final=True))
+    return ''.join(pieces)
+
+
+def _detect_and_decode(source_file) -> Tuple[str, str]:
+    # cheap checks first, chardet only for the files that are neither BOM-marked nor valid utf-8
+    encoding = _detect_by_bom(source_file.read(len(codecs.BOM_UTF32_LE)))
+    source_file.seek(0)
+    if encoding is None:
+        text = _decode_utf8(source_file)
+        if text is not None:
+            return text, 'utf-8'
+        source_file.seek(0)
+        encoding = _detect_incremental(source_file)
+        source_file.seek(0)
+    return _decode(source_file, encoding), encoding
+
+
+def read_text(path: str) -> Tuple[str, str]:
+    # the file is read in chunks, the detected encoding is remembered per (path, size, mtime_ns)
+    stat = os.stat(path)
+    key = os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+    with _CACHE_LOCK:
+        encoding = _CACHE.get(key)
+        if encoding is not None:
+            _CACHE.move_to_end(key)
+
+    with open(path, 'rb') as source_file:
+        if encoding is not None:
+            return _decode(source_file, encoding), encoding
+        text, encoding = _detect_and_decode(source_file)
+
+    LOG.debug('%s: encoding = %r', path, encoding)
+    with _CACHE_LOCK:
+        _CACHE[key] = encoding
+        while len(_CACHE) > constants.ENCODING_CACHE_SIZE:
+            _CACHE.popitem(last=False)
+    return text, encoding
@@ -1,9 +1,19 @@
 import os
 import time
+from typing import List
 
 from movie.utils import constants
+from movie.utils import folder_index
 from movie.utils.logging_config import LOG
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+FICLONE = 0x40049409
+
 
 def _is_file_exists(file_path: str) -> bool:
     return os.path.isfile(file_path)
@@ -11,11 +21,12 @@ def _is_file_exists(file_path: str) -> bool:
 
 def remove(file_path: str) -> None:
     while True:
-        LOG.debug(f'trying to remove: {file_path}')
+        LOG.debug('trying to remove: %s', file_path)
         if not _is_file_exists(file_path):
             return
         try:
             os.remove(file_path)
+            folder_index.invalidate(os.path.dirname(file_path))
             break
         except OSError as exc:
             err_str = f'Error deleting file {file_path}: {exc}'
@@ -30,11 +41,13 @@ def remove(file_path: str) -> None:
 
 def rename(old_path, new_path):
     while True:
-        LOG.debug(f'trying to rename: {old_path}')
+        LOG.debug('trying to rename: %s', old_path)
         if not _is_file_exists(old_path):
             return
         try:
             os.rename(old_path, new_path)
+            folder_index.invalidate(os.path.dirname(old_path))
+            folder_index.invalidate(os.path.dirname(new_path))
             break
         except OSError as exc:
             err_str = f'Error renaming file {old_path}: {exc}'
@@ -47,6 +60,65 @@ def rename(old_path, new_path):
             break
 
 
+def _reflink(source_fd: int, target_fd: int) -> bool:
+    if fcntl is None:
+        return False
+    try:
+        fcntl.ioctl(target_fd, FICLONE, source_fd)
+    except OSError:
+        return False
+    return True
+
+
+def _copy_range(source_fd: int, target_fd: int, size: int) -> bool:
+    if not hasattr(os, 'copy_file_range'):
+        return False
+    copied = 0
+    try:
+        while copied < size:
+            chunk = os.copy_file_range(source_fd, target_fd, size - copied)
+            if chunk == 0:
+                break
+            copied += chunk
+    except OSError:
+        return False
+    return copied == size
+
+
+def _link(source_path: str, target_path: str) -> bool:
+    try:
+        if _is_file_exists(target_path):
+            os.remove(target_path)
+        os.link(source_path, target_path)
+    except OSError:
+        return False
+    return True
+
+
+def fan_out(data: bytes, target_paths: List[str], hardlink: bool = False) -> None:
+    # the bytes are written once, the other targets share them through the filesystem where it can
+    if not target_paths:
+        return
+    source_path, *other_paths = target_paths
+    for folder in {os.path.dirname(target_path) for target_path in target_paths}:
+        folder_index.invalidate(folder)
+    with open(source_path, 'wb') as source_file:
+        source_file.write(data)
+
+    for target_path in other_paths:
+        LOG.debug('fan out: %s -> %s', source_path, target_path)
+        if hardlink and _link(source_path, target_path):
+            continue
+        with open(source_path, 'rb') as source_file, open(target_path, 'wb') as target_file:
+            if _reflink(source_file.fileno(), target_file.fileno()):
+                continue
+            if _copy_range(source_file.fileno(), target_file.fileno(), len(data)):
+                continue
+            target_file.seek(0)
+            target_file.truncate()
+            target_file.write(data)
+
+
 def restoring_target_filename_to_source(path_target: str, path_source: str):
     LOG.debug(
         constants.LOG_FUNCTION_START.format(name='Restoring TARGET filename to SOURCE filename'))
@@ -0,0 +1,57 @@
+import os
+import re
+import threading
+from typing import Iterable
+from typing import List
+
+from movie.utils.logging_config import LOG
+
+
+def natural_sort_key(s: str) -> list:
+    def convert(text):
+        return int(text) if text.isdigit() else text.lower()
+    return [convert(c) for c in re.split('([0-9]+)', s)]
+
+
+class FolderIndex:
+    # one os.scandir pass: every entry classified by extension, sort keys computed once
+    def __init__(self, folder: str) -> None:
+        self.mtime_ns = os.stat(folder).st_mtime_ns
+        with os.scandir(folder) as entries:
+            names = [entry.name for entry in entries]
+        names.sort(key=natural_sort_key)
+        self._entries = [(name, os.path.splitext(name)[1]) for name in names]
+        self._by_type = {}
+
+    def get_files(self, files_type: Iterable[str]) -> List[str]:
+        key = tuple(files_type) if not isinstance(files_type, str) else (files_type,)
+        if key not in self._by_type:
+            self._by_type[key] = [name for name, extension in self._entries if extension in key]
+        return list(self._by_type[key])
+
+    def is_valid(self, folder: str) -> bool:
+        try:
+            return os.stat(folder).st_mtime_ns == self.mtime_ns
+        except OSError:
+            return False
+
+
+_INDEXES = {}
+_LOCK = threading.Lock()
+
+
+def get_files(folder: str, files_type: Iterable[str]) -> List[str]:
+    abs_folder = os.path.abspath(folder)
+    with _LOCK:
+        index = _INDEXES.get(abs_folder)
+        if index is None or not index.is_valid(abs_folder):
+            LOG.debug('indexing folder: %s', abs_folder)
+            index = FolderIndex(abs_folder)
+            _INDEXES[abs_folder] = index
+        return index.get_files(files_type)
+
+
+def invalidate(folder: str) -> None:
+    # for changes the directory mtime may not show (coarse timestamps on network shares)
+    with _LOCK:
+        _INDEXES.pop(os.path.abspath(folder), None)
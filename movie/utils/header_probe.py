@@ -0,0 +1,351 @@
+import json
+import math
+import mmap
+import os
+import struct
+from typing import Iterator
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+
+from movie.utils import constants
+from movie.utils.logging_config import LOG
+from movie.utils import matroska
+
+
+# the stream fields of `ffprobe -of json` that stream.Stream keeps, read from the container headers: no process
+# is started and only the pages of the header are read from disk
+PROBER_NAME = 'header probe'
+
+_SETTINGS = {'enabled': True}
+
+# codecs whose ffprobe name is known; any other codec is left to ffprobe
+MATROSKA_CODECS = {
+    'V_MPEG4/ISO/AVC': 'h264',
+    'V_MPEGH/ISO/HEVC': 'hevc',
+    'V_AV1': 'av1',
+    'V_VP8': 'vp8',
+    'V_VP9': 'vp9',
+    'V_MPEG4/ISO/ASP': 'mpeg4',
+    'V_MPEG2': 'mpeg2video',
+    'A_AAC': 'aac',
+    'A_AC3': 'ac3',
+    'A_EAC3': 'eac3',
+    'A_DTS': 'dts',
+    'A_FLAC': 'flac',
+    'A_OPUS': 'opus',
+    'A_VORBIS': 'vorbis',
+    'A_MPEG/L3': 'mp3',
+    'A_TRUEHD': 'truehd',
+    'S_TEXT/ASS': 'ass',
+    'S_TEXT/SSA': 'ass',
+    'S_TEXT/UTF8': 'subrip',
+    'S_TEXT/WEBVTT': 'webvtt',
+    'S_HDMV/PGS': 'hdmv_pgs_subtitle',
+    'S_VOBSUB': 'dvd_subtitle',
+}
+ISO_MEDIA_CODECS = {
+    b'avc1': 'h264',
+    b'avc3': 'h264',
+    b'hvc1': 'hevc',
+    b'hev1': 'hevc',
+    b'av01': 'av1',
+    b'vp09': 'vp9',
+    b'mp4v': 'mpeg4',
+    b'mp4a': 'aac',
+    b'ac-3': 'ac3',
+    b'ec-3': 'eac3',
+    b'Opus': 'opus',
+    b'fLaC': 'flac',
+    b'.mp3': 'mp3',
+    b'alac': 'alac',
+    b'tx3g': 'mov_text',
+    b'wvtt': 'webvtt',
+    b'c608': 'eia_608',
+}
+ISO_MEDIA_HANDLERS = {
+    b'vide': constants.STREAM_TYPE_VIDEO,
+    b'soun': constants.STREAM_TYPE_AUDIO,
+    b'sbtl': constants.STREAM_TYPE_SUBTITLE,
+    b'subt': constants.STREAM_TYPE_SUBTITLE,
+    b'subp': constants.STREAM_TYPE_SUBTITLE,
+    b'clcp': constants.STREAM_TYPE_SUBTITLE,
+}
+# MPEG-4 audio object types of mp4a sample entries that are mp3, not aac
+ISO_MEDIA_MP3_OBJECT_TYPES = [0x69, 0x6B]
+# QuickTime language code 0, older files use it instead of a packed ISO 639-2 code
+ISO_MEDIA_MAC_ENGLISH = 0
+ISO_MEDIA_UNDETERMINED = 0x7FFF
+# the limits ffmpeg's demuxers give av_reduce for the terms of a frame rate
+MATROSKA_FRAME_RATE_MAX = 30000
+ISO_MEDIA_FRAME_RATE_MAX = 2 ** 31 - 1
+
+
+class Box(NamedTuple):
+    type: bytes
+    data_start: int
+    end: int
+
+
+def configure(enabled: bool = True) -> None:
+    LOG.debug('header probe enabled = %r', enabled)
+    _SETTINGS['enabled'] = enabled
+
+
+def is_supported(path: str) -> bool:
+    extension = os.path.splitext(path)[1].lower()
+    return _SETTINGS['enabled'] and (extension in constants.MATROSKA or extension in constants.ISO_MEDIA)
+
+
+def _get_frame_rate(numerator: int, denominator: int, maximum: int) -> str:
+    # av_reduce: the last convergent with both terms within the limit, or the semiconvergent after it when
+    # that is closer; limit_denominator rounds differently and would not print what ffprobe prints
+    gcd = math.gcd(numerator, denominator)
+    numerator, denominator = numerator // gcd, denominator // gcd
+    if numerator <= maximum and denominator <= maximum:
+        return f'{numerator}/{denominator}'
+    previous, current = (0, 1), (1, 0)
+    while denominator:
+        quotient = numerator // denominator
+        following = (quotient * current[0] + previous[0], quotient * current[1] + previous[1])
+        if following[0] > maximum or following[1] > maximum:
+            if current[0]:
+                quotient = (maximum - previous[0]) // current[0]
+            if current[1]:
+                quotient = min(quotient, (maximum - previous[1]) // current[1])
+            if denominator * (2 * quotient * current[1] + previous[1]) > numerator * current[1]:
+                current = (quotient * current[0] + previous[0], quotient * current[1] + previous[1])
+            break
+        previous, current = current, following
+        numerator, denominator = denominator, numerator - denominator * quotient
+    return f'{current[0]}/{current[1]}'
+
+
+def _get_matroska_codec(codec_id: str) -> str:
+    # A_AAC/MPEG4/LC, A_DTS/EXPRESS: the profile does not change the codec
+    codec_name = MATROSKA_CODECS.get(codec_id, MATROSKA_CODECS.get(codec_id.split('/')[0]))
+    if codec_name is None:
+        raise ValueError(f'codec {codec_id} left to ffprobe')
+    return codec_name
+
+
+def _get_matroska_stream(buffer, entry: matroska.Element, index: int) -> dict:
+    children = {c.id: c for c in matroska.iter_elements(buffer, entry.data_start, entry.end)}
+    track_type = matroska.TRACK_TYPES.get(matroska.read_uint(buffer, children[matroska.ID_TRACK_TYPE]))
+    if track_type is None:
+        raise ValueError(f'track {index} is not audio, video or subtitles')
+
+    # the defaults of the Matroska specification: English, default track, not forced
+    language = 'eng'
+    if matroska.ID_LANGUAGE in children:
+        language = matroska.read_string(buffer, children[matroska.ID_LANGUAGE])
+    stream_data = {
+        'index': index,
+        'codec_type': track_type,
+        'codec_name': _get_matroska_codec(matroska.read_string(buffer, children[matroska.ID_CODEC_ID])),
+        'tags': {},
+        'disposition': {
+            'default': matroska.read_uint(buffer, children[matroska.ID_FLAG_DEFAULT])
+            if matroska.ID_FLAG_DEFAULT in children else 1,
+            'forced': matroska.read_uint(buffer, children[matroska.ID_FLAG_FORCED])
+            if matroska.ID_FLAG_FORCED in children else 0,
+        },
+    }
+    # like ffmpeg, undetermined is no language tag at all
+    if language != 'und':
+        stream_data['tags']['language'] = language
+    if matroska.ID_NAME in children:
+        stream_data['tags']['title'] = matroska.read_string(buffer, children[matroska.ID_NAME])
+
+    for child in matroska.iter_elements(buffer, entry.data_start, entry.end):
+        if child.id == matroska.ID_AUDIO:
+            channels = next((matroska.read_uint(buffer, c) for c in matroska.iter_elements(
+                buffer, child.data_start, child.end) if c.id == matroska.ID_CHANNELS), 1)
+            stream_data['channels'] = channels
+        elif child.id == matroska.ID_DEFAULT_DURATION and track_type == constants.STREAM_TYPE_VIDEO:
+            default_duration = matroska.read_uint(buffer, child)
+            if default_duration:
+                frame_rate = _get_frame_rate(10 ** 9, default_duration, MATROSKA_FRAME_RATE_MAX)
+                stream_data['avg_frame_rate'] = stream_data['r_frame_rate'] = frame_rate
+    return stream_data
+
+
+def _probe_matroska(buffer) -> List[dict]:
+    # ffprobe numbers the tracks in the order of Tracks, attachments come after them
+    tracks = matroska.find_tracks(buffer)
+    entries = [e for e in matroska.iter_elements(buffer, tracks.data_start, tracks.end)
+               if e.id == matroska.ID_TRACK_ENTRY]
+    return [_get_matroska_stream(buffer, entry, index) for index, entry in enumerate(entries)]
+
+
+def _iter_boxes(buffer, start: int, end: int) -> Iterator[Box]:
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', buffer, pos)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', buffer, pos + 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = end - pos
+        if size < header_size or pos + size > end:
+            raise ValueError(f'box {box_type!r} at {pos} is cut off')
+        yield Box(box_type, pos + header_size, pos + size)
+        pos += size
+
+
+def _find_box(buffer, parent: Box, *path: bytes) -> Optional[Box]:
+    for box_type in path:
+        parent = next((b for b in _iter_boxes(buffer, parent.data_start, parent.end) if b.type == box_type), None)
+        if parent is None:
+            return None
+    return parent
+
+
+def _get_iso_media_language(code: int) -> str:
+    # three letters of five bits each, offset from 0x60
+    if code == ISO_MEDIA_MAC_ENGLISH:
+        return 'eng'
+    if code == ISO_MEDIA_UNDETERMINED:
+        return 'und'
+    if code < 0x400:
+        raise ValueError(f'QuickTime language {code} left to ffprobe')
+    return ''.join(chr((code >> shift & 0x1F) + 0x60) for shift in (10, 5, 0))
+
+
+def _read_descriptor(buffer, pos: int):
+    # MPEG-4 descriptor: tag, then the size in 7-bit groups
+    tag = buffer[pos]
+    size = 0
+    pos += 1
+    for _ in range(4):
+        size = size << 7 | buffer[pos] & 0x7F
+        pos += 1
+        if not buffer[pos - 1] & 0x80:
+            break
+    return tag, pos, pos + size
+
+
+def _get_mp4a_object_type(buffer, sample_entry: Box) -> Optional[int]:
+    # sample entry (8 bytes) and audio fields (20 bytes) come before the child boxes
+    esds = next((b for b in _iter_boxes(buffer, sample_entry.data_start + 28, sample_entry.end)
+                 if b.type == b'esds'), None)
+    if esds is None:
+        return None
+    tag, pos, _ = _read_descriptor(buffer, esds.data_start + 4)
+    if tag != 0x03:
+        return None
+    flags = buffer[pos + 2]
+    # ES_ID and flags, then the optional fields the flags announce in this order: dependsOn_ES_ID,
+    # the URL with its length byte first, OCR_ES_ID
+    pos += 3
+    if flags & 0x80:
+        pos += 2
+    if flags & 0x40:
+        pos += 1 + buffer[pos]
+    if flags & 0x20:
+        pos += 2
+    tag, pos, _ = _read_descriptor(buffer, pos)
+    return buffer[pos] if tag == 0x04 else None
+
+
+def _get_iso_media_sample_entry(buffer, stbl: Box, stream_data: dict) -> None:
+    stsd = _find_box(buffer, stbl, b'stsd')
+    if stsd is None:
+        raise ValueError('no stsd box')
+    # version, flags and the entry count before the first entry
+    sample_entry = next(_iter_boxes(buffer, stsd.data_start + 8, stsd.end), None)
+    if sample_entry is None:
+        raise ValueError('no sample entry in stsd')
+    codec_name = ISO_MEDIA_CODECS.get(sample_entry.type)
+    if codec_name is None:
+        raise ValueError(f'codec {sample_entry.type!r} left to ffprobe')
+    if sample_entry.type == b'mp4a' and _get_mp4a_object_type(buffer, sample_entry) in ISO_MEDIA_MP3_OBJECT_TYPES:
+        codec_name = 'mp3'
+    stream_data['codec_name'] = codec_name
+    if stream_data['codec_type'] == constants.STREAM_TYPE_AUDIO:
+        stream_data['channels'] = struct.unpack_from('>H', buffer, sample_entry.data_start + 16)[0]
+
+
+def _get_iso_media_frame_rate(buffer, stbl: Box, timescale: int) -> Optional[str]:
+    # samples over the sum of their durations, as ffmpeg's average frame rate of a track
+    stts = _find_box(buffer, stbl, b'stts')
+    if stts is None:
+        return None
+    entry_count = struct.unpack_from('>I', buffer, stts.data_start + 4)[0]
+    samples = duration = 0
+    for i in range(entry_count):
+        count, delta = struct.unpack_from('>II', buffer, stts.data_start + 8 + 8 * i)
+        samples += count
+        duration += count * delta
+    if not samples or not duration:
+        return None
+    return _get_frame_rate(samples * timescale, duration, ISO_MEDIA_FRAME_RATE_MAX)
+
+
+def _get_iso_media_stream(buffer, trak: Box, index: int) -> dict:
+    if _find_box(buffer, trak, b'tref', b'chap') is not None:
+        raise ValueError(f'track {index} has chapters, left to ffprobe')
+    tkhd = _find_box(buffer, trak, b'tkhd')
+    mdhd = _find_box(buffer, trak, b'mdia', b'mdhd')
+    hdlr = _find_box(buffer, trak, b'mdia', b'hdlr')
+    stbl = _find_box(buffer, trak, b'mdia', b'minf', b'stbl')
+    if None in (tkhd, mdhd, hdlr, stbl):
+        raise ValueError(f'track {index} has no media header')
+
+    track_type = ISO_MEDIA_HANDLERS.get(bytes(buffer[hdlr.data_start + 8:hdlr.data_start + 12]))
+    if track_type is None:
+        raise ValueError(f'track {index} is not audio, video or subtitles')
+    if buffer[mdhd.data_start] == 1:
+        timescale, duration, language = struct.unpack_from('>IQH', buffer, mdhd.data_start + 20)
+    else:
+        timescale, duration, language = struct.unpack_from('>IIH', buffer, mdhd.data_start + 12)
+
+    stream_data = {
+        'index': index,
+        'codec_type': track_type,
+        # the track is enabled: ffmpeg's default disposition
+        'disposition': {'default': buffer[tkhd.data_start + 3] & 1, 'forced': 0},
+        'tags': {'language': _get_iso_media_language(language)},
+    }
+    if timescale:
+        stream_data['duration'] = f'{duration / timescale:.6f}'
+    handler_name = bytes(buffer[hdlr.data_start + 24:hdlr.end]).split(b'\0')[0]
+    if handler_name:
+        stream_data['tags']['handler_name'] = handler_name.decode('utf-8', errors='replace')
+    name = _find_box(buffer, trak, b'udta', b'name')
+    if name is not None:
+        stream_data['tags']['title'] = bytes(buffer[name.data_start:name.end]).rstrip(b'\0').decode(
+            'utf-8', errors='replace')
+
+    _get_iso_media_sample_entry(buffer, stbl, stream_data)
+    if track_type == constants.STREAM_TYPE_VIDEO and timescale:
+        frame_rate = _get_iso_media_frame_rate(buffer, stbl, timescale)
+        if frame_rate is not None:
+            stream_data['avg_frame_rate'] = frame_rate
+    return stream_data
+
+
+def _probe_iso_media(buffer) -> List[dict]:
+    # moov may come after mdat: only the 8 or 16 header bytes of the boxes before it are read
+    moov = next((b for b in _iter_boxes(buffer, 0, len(buffer)) if b.type == b'moov'), None)
+    if moov is None:
+        raise ValueError('no moov box')
+    traks = [b for b in _iter_boxes(buffer, moov.data_start, moov.end) if b.type == b'trak']
+    return [_get_iso_media_stream(buffer, trak, index) for index, trak in enumerate(traks)]
+
+
+def probe(path: str) -> str:
+    # ValueError when the file is not one the probe reads, the caller runs ffprobe then
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, 'rb') as media_file, mmap.mmap(media_file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        try:
+            if extension in constants.MATROSKA:
+                streams = _probe_matroska(buffer)
+            elif extension in constants.ISO_MEDIA:
+                streams = _probe_iso_media(buffer)
+            else:
+                raise ValueError(f'{extension} is not read by the header probe')
+        except (IndexError, KeyError, StopIteration, struct.error) as exc:
+            raise ValueError(f'malformed header: {exc!r}') from exc
+    return json.dumps({'streams': streams}, ensure_ascii=False)
@@ -0,0 +1,147 @@
+import contextlib
+import json
+import os
+import sqlite3
+import time
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from movie.utils import constants
+from movie.utils import files
+from movie.utils.logging_config import LOG
+from movie.utils import sqlite_store
+
+
+STATE_RUNNING = 'running'
+STATE_DONE = 'done'
+STATE_FAILED = 'failed'
+
+
+def _fingerprint(path: str) -> Tuple[Optional[int], Optional[int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None, None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _is_running(pid: int) -> bool:
+    # POSIX only: on Windows os.kill would terminate the process
+    if pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueue(sqlite_store.SqliteStore):
+    # state of every per-file operation keyed by (absolute path, operation, arguments), kept in sqlite;
+    # without sqlite nothing is recorded and batches are not resumable
+    def __init__(self, db_path: str) -> None:
+        super().__init__(db_path, (
+            'jobs',
+            'path TEXT, operation TEXT, args TEXT, state TEXT, '
+            'input_size INTEGER, input_mtime_ns INTEGER, '
+            'outputs TEXT, '
+            'temp_path TEXT, pid INTEGER, error TEXT, updated REAL, '
+            'PRIMARY KEY (path, operation, args)',
+            constants.JOB_QUEUE_VERSION))
+
+    @staticmethod
+    def _key(path: str, operation: str, args: list) -> Tuple[str, str, str]:
+        return os.path.abspath(path), operation, json.dumps(args)
+
+    def _is_done(self, connection: sqlite3.Connection, key: Tuple[str, str, str]) -> bool:
+        row = connection.execute(
+            'SELECT outputs FROM jobs WHERE path = ? AND operation = ? AND args = ? AND state = ?',
+            (*key, STATE_DONE)).fetchone()
+        # done only while every output is still exactly what this job wrote
+        return row is not None and all(
+            _fingerprint(output_path) == (size, mtime_ns) for output_path, size, mtime_ns in json.loads(row[0]))
+
+    def is_done(self, path: str, operation: str, args: list) -> bool:
+        with self.locked() as connection:
+            return connection is not None and self._is_done(connection, self._key(path, operation, args))
+
+    def count_done(self, file_jobs: List[Tuple[str, str, list]]) -> int:
+        # the jobs of a batch an earlier run already finished
+        with self.locked() as connection:
+            if connection is None:
+                return 0
+            return sum(self._is_done(connection, self._key(*file_job)) for file_job in file_jobs)
+
+    def start(self, path: str, operation: str, args: list, temp_path: Optional[str]) -> None:
+        self._update(
+            self._key(path, operation, args),
+            'state = ?, input_size = ?, input_mtime_ns = ?, temp_path = ?, pid = ?, error = NULL',
+            (STATE_RUNNING, *_fingerprint(path), temp_path, os.getpid()))
+
+    def finish(self, path: str, operation: str, args: list, output_paths: List[str]) -> None:
+        outputs = [[os.path.abspath(output_path), *_fingerprint(output_path)] for output_path in output_paths]
+        self._update(self._key(path, operation, args), 'state = ?, outputs = ?, temp_path = NULL',
+                     (STATE_DONE, json.dumps(outputs)))
+
+    @contextlib.contextmanager
+    def track(self, path: str, operation: str, args: list, temp_path: Optional[str] = None,
+              output_paths: Optional[List[str]] = None):
+        # running while the block runs, then done with `output_paths` (`path` by default) as the outputs,
+        # or failed without its temp file
+        self.start(path, operation, args, temp_path)
+        try:
+            yield
+        except Exception as exc:
+            self.fail(path, operation, args, str(exc))
+            if temp_path is not None:
+                files.remove(temp_path)
+            raise
+        self.finish(path, operation, args, output_paths or [path])
+
+    def fail(self, path: str, operation: str, args: list, error: str) -> None:
+        self._update(self._key(path, operation, args), 'state = ?, error = ?', (STATE_FAILED, error))
+
+    def _update(self, key: Tuple[str, str, str], assignments: str, values: tuple) -> None:
+        with self.locked() as connection:
+            if connection is None:
+                return
+            connection.execute(
+                'INSERT OR IGNORE INTO jobs (path, operation, args) VALUES (?, ?, ?)', key)
+            connection.execute(
+                f'UPDATE jobs SET {assignments}, updated = ? WHERE path = ? AND operation = ? AND args = ?',
+                (*values, time.time(), *key))
+            connection.commit()
+
+    def recover(self, folder: str) -> None:
+        # jobs left running by a process that is gone: only the temp files recorded for them are touched.
+        # Without a way to tell a live process on Windows, nothing is recovered there
+        if os.name == 'nt':
+            LOG.debug('interrupted jobs are not recovered on Windows')
+            return
+        abs_folder = os.path.abspath(folder)
+        with self.locked() as connection:
+            if connection is None:
+                return
+            rows = connection.execute(
+                'SELECT path, operation, args, temp_path, pid FROM jobs WHERE state = ?', (STATE_RUNNING,)).fetchall()
+
+        for path, operation, args, temp_path, pid in rows:
+            if os.path.dirname(path) != abs_folder or (pid is not None and _is_running(pid)):
+                continue
+            args = json.loads(args)
+            if temp_path and os.path.isfile(temp_path) and not os.path.exists(path):
+                # the crash came between removing the source and renaming the finished output back
+                LOG.warning('restoring interrupted output: %s -> %s', temp_path, path)
+                files.rename(temp_path, path)
+                self.finish(path, operation, args, [path])
+                continue
+            if temp_path and os.path.isfile(temp_path):
+                LOG.warning('removing leftover temp file: %s', temp_path)
+                files.remove(temp_path)
+            self.fail(path, operation, args, 'interrupted')
+
+
+JOB_QUEUE = JobQueue(constants.JOB_QUEUE_FILE)
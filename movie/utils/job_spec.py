@@ -0,0 +1,292 @@
+import argparse
+import concurrent.futures
+import fnmatch
+import json
+import os
+import re
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+from movie.utils import config
+from movie.utils import constants
+from movie.utils import jobs
+from movie.utils import library
+from movie.utils.logging_config import LOG
+from movie.utils.movie import Movie
+from movie.utils import notation
+from movie.utils import retiming
+from movie.utils import tracing
+
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_INVALID_SPEC = 2
+
+FOLDER_KEYS = {'path', 'streams', 'subtitles', 'extract_audio', 'preview', 'rename'}
+LIBRARY_KEYS = FOLDER_KEYS - {'path'} | {'root'}
+SUBTITLE_KEYS = {'extract', 'keep', 'convert_srt', 'purify', 'translate', 'retime'}
+PREVIEW_MODES = ['numbered', 'plain']
+ALL_STREAMS = 'all'
+
+
+def _check(condition: bool, message: str) -> None:
+    if not condition:
+        raise ValueError(message)
+
+
+def _validate_selection(pattern: str, selection) -> None:
+    if isinstance(selection, dict):
+        _check(all(str(key).isdigit() for key in selection), f'streams "{pattern}": language keys are stream numbers')
+        return
+    if isinstance(selection, str):
+        _check(notation.validation(selection), f'streams "{pattern}": wrong stream numbers "{selection}"')
+        return
+    _check(isinstance(selection, list) and all(isinstance(i, int) for i in selection),
+           f'streams "{pattern}": expected stream numbers, a notation string or a {{number: language}} table')
+
+
+def _validate_folder(folder: dict) -> None:
+    _check(isinstance(folder, dict), 'every folder entry must be a table')
+    _check(not set(folder) - FOLDER_KEYS, f'unknown folder keys: {sorted(set(folder) - FOLDER_KEYS)}')
+    _check(os.path.isdir(folder.get('path', '')), f'folder not found: {folder.get("path")}')
+
+    _check(isinstance(folder.get('streams', {}), dict), 'streams must be a {file or glob: selection} table')
+    for pattern, selection in folder.get('streams', {}).items():
+        _validate_selection(pattern, selection)
+
+    subtitle_options = folder.get('subtitles', {})
+    _check(isinstance(subtitle_options, dict), 'subtitles must be a table')
+    _check(not set(subtitle_options) - SUBTITLE_KEYS,
+           f'unknown subtitle keys: {sorted(set(subtitle_options) - SUBTITLE_KEYS)}')
+    if subtitle_options.get('extract', ALL_STREAMS) != ALL_STREAMS:
+        # languages are set by the streams step, extraction only takes stream numbers
+        _check(not isinstance(subtitle_options['extract'], dict),
+               'subtitles.extract: expected "all", stream numbers or a notation string')
+        _validate_selection('subtitles.extract', subtitle_options['extract'])
+    _check(retiming.is_valid(str(subtitle_options.get('retime', '+0'))),
+           f'subtitles.retime: wrong retiming, for example {retiming.SPEC_EXAMPLES}')
+
+    unknown_formats = [f for f in folder.get('extract_audio', []) if f not in constants.AUDIO]
+    _check(not unknown_formats, f'unknown audio formats {unknown_formats}, must be from {constants.AUDIO}')
+    _check(folder.get('preview', False) in PREVIEW_MODES + [True, False],
+           f'preview must be true/false or one of {PREVIEW_MODES}')
+    _check(isinstance(folder.get('rename', False), (bool, str)), 'rename must be true/false or a name template')
+    if isinstance(folder.get('rename'), str):
+        _check(re.match(constants.NAME_TEMPLATE_VERIFICATION_REGEX, folder['rename']) is not None,
+               f'rename: name template "{folder["rename"]}" is empty or contains special characters')
+
+
+def _validate_library(library_entry: dict) -> None:
+    _check(isinstance(library_entry, dict), 'every library entry must be a table')
+    _check(not set(library_entry) - LIBRARY_KEYS, f'unknown library keys: {sorted(set(library_entry) - LIBRARY_KEYS)}')
+    _check(os.path.isdir(library_entry.get('root', '')), f'library root not found: {library_entry.get("root")}')
+    _validate_folder({**{key: value for key, value in library_entry.items() if key != 'root'}, 'path': '.'})
+
+
+def validate(spec: dict) -> None:
+    _check(isinstance(spec, dict), 'the spec must be a table')
+    folders, libraries = spec.get('folders', []), spec.get('libraries', [])
+    _check(isinstance(folders, list) and isinstance(libraries, list) and (folders or libraries),
+           'the spec must have a non-empty "folders" or "libraries" list')
+    for folder in folders:
+        _validate_folder(folder)
+    for library_entry in libraries:
+        _validate_library(library_entry)
+
+
+def load(spec_path: str) -> dict:
+    _, spec_ext = os.path.splitext(spec_path)
+    if spec_ext.lower() == '.toml':
+        _check(tomllib is not None, 'TOML job specs need Python 3.11 or newer, use JSON instead')
+        with open(spec_path, 'rb') as spec_file:
+            spec = tomllib.load(spec_file)
+    else:
+        with open(spec_path, encoding='utf-8') as spec_file:
+            spec = json.load(spec_file)
+    validate(spec)
+    return spec
+
+
+def _get_streams(selection) -> List[int]:
+    return notation.recognition(selection) if isinstance(selection, str) else list(selection)
+
+
+def _match(file: str, selections: dict):
+    # the first pattern that matches wins, an exact file name is a pattern too
+    for pattern, selection in selections.items():
+        if fnmatch.fnmatch(file, pattern):
+            return selection
+    return None
+
+
+def _step_streams(movie_obj: Movie, selections: dict) -> List[jobs.JobResult]:
+    map_video_streams = {}
+    map_video_streams_language = {}
+    for video in movie_obj.__get_video_files__():
+        selection = _match(video, selections)
+        if isinstance(selection, dict):
+            map_video_streams_language[video] = {int(key): language for key, language in selection.items()}
+        elif selection is not None:
+            map_video_streams[video] = _get_streams(selection)
+
+    results = []
+    if map_video_streams:
+        results.extend(movie_obj.process_streams_to_video_files(map_video_streams))
+    if map_video_streams_language:
+        results.extend(movie_obj.process_streams_language_to_video_files(map_video_streams_language))
+    return results
+
+
+def _extract_subtitle(movie_obj: Movie, video: str, selection, keep_subtitles: bool) -> None:
+    movie_obj.analyze_video_file(video)
+    # None: every subtitle stream of the video
+    streams_index = None if selection == ALL_STREAMS else _get_streams(selection)
+    movie_obj.extract_subtitle(keep_subtitles, streams_index, [video])
+
+
+def _step_subtitles(movie_obj: Movie, options: dict) -> List[jobs.JobResult]:
+    results = []
+    if 'extract' in options:
+        extract_jobs = [(video, (movie_obj, video, options['extract'], options.get('keep', True)))
+                        for video in movie_obj.__get_video_files__()]
+        results.extend(jobs.run(_extract_subtitle, extract_jobs))
+    if options.get('convert_srt', 'extract' in options):
+        results.extend(movie_obj.subs_convert_srt_to_ass())
+    if options.get('purify', False):
+        results.extend(movie_obj.ass_subtitle_purification())
+    if options.get('translate', False):
+        results.extend(movie_obj.ass_subtitle_translation())
+    if 'retime' in options:
+        results.extend(movie_obj.subtitle_retiming(options['retime']))
+    return results
+
+
+def _step_extract_audio(movie_obj: Movie, audio_types: List[str]) -> List[jobs.JobResult]:
+    return movie_obj.extract_audio_from_video_files(audio_types)
+
+
+def _step_preview(movie_obj: Movie, mode) -> List[jobs.JobResult]:
+    if mode is False:
+        return []
+    return movie_obj.preview_generate(mode != 'plain')
+
+
+def _step_rename(movie_obj: Movie, template) -> List[jobs.JobResult]:
+    if template is False:
+        return []
+    if isinstance(template, str):
+        movie_obj.name_template = template
+    movie_obj.rename_files()
+    return [jobs.JobResult(movie_obj.name_template)]
+
+
+# folder key -> step, in the order the steps run
+STEPS = [
+    ('streams', _step_streams),
+    ('subtitles', _step_subtitles),
+    ('extract_audio', _step_extract_audio),
+    ('preview', _step_preview),
+    ('rename', _step_rename),
+]
+
+
+def _get_step_summary(step: str, results: List[jobs.JobResult]) -> dict:
+    return {
+        'step': step,
+        'succeeded': [result.name for result in results if result.succeeded],
+        'failed': {result.name: result.error for result in results if not result.succeeded},
+    }
+
+
+def run_folder(movie_obj: Movie, folder: dict, workers: int) -> dict:
+    # each folder has its own Movie: its own temp names, streams and file index
+    LOG.info('=== %s ===', folder['path'])
+    folder_movie = Movie(movie_obj.ffmpeg_path, movie_obj.ffprobe_path, folder['path'], movie_obj.name_template)
+    folder_movie.workers = workers
+    folder_movie.recover_interrupted_jobs()
+
+    steps = []
+    for key, step in STEPS:
+        if key not in folder:
+            continue
+        try:
+            results = step(folder_movie, folder[key])
+        except Exception as exc:
+            LOG.exception('Error while running step [%s] for %s', key, folder['path'])
+            results = [jobs.JobResult(key, str(exc))]
+        steps.append(_get_step_summary(key, results))
+
+    return {'path': folder['path'], 'steps': steps, 'ok': not any(s['failed'] for s in steps)}
+
+
+def log_report(summary: dict) -> None:
+    LOG.info('%-60s %6s %6s', 'folder', 'done', 'failed')
+    for folder in summary['folders']:
+        done = sum(len(step['succeeded']) for step in folder['steps'])
+        failed = sum(len(step['failed']) for step in folder['steps'])
+        status = constants.CHECK if folder['ok'] else constants.CROSS
+        LOG.info('%-60s %6d %6d %s', folder['path'], done, failed, status)
+
+
+def run(movie_obj: Movie, spec: dict) -> dict:
+    folders = list(spec.get('folders', []))
+    for library_entry in spec.get('libraries', []):
+        folders.extend(library.expand(library_entry))
+
+    # folders share one pool of `workers`; what is left of it goes to the jobs inside each folder.
+    # The process pool, shared by the folders too, starts before their threads
+    jobs.start_process_pool()
+    pool_size = max(1, min(movie_obj.workers, len(folders)))
+    folder_workers = max(1, movie_obj.workers // pool_size)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=pool_size) as executor:
+        futures = [executor.submit(run_folder, movie_obj, folder, folder_workers) for folder in folders]
+        folder_summaries = [future.result() for future in futures]
+
+    summary = {'folders': folder_summaries, 'ok': all(folder['ok'] for folder in folder_summaries)}
+    log_report(summary)
+    return summary
+
+
+def _run_with_config(args: argparse.Namespace, spec: dict) -> Tuple[dict, int]:
+    # an invalid config is reported like an invalid spec, apply_config would exit the process
+    movie_config, config_errors = config.validate_config(args.config)
+    if config_errors:
+        LOG.error('Config not valid: %s %s', ', '.join(config_errors), constants.CROSS)
+        return {'ok': False, 'error': 'config not valid', 'config': config_errors, 'folders': []}, EXIT_INVALID_SPEC
+
+    movie_obj = config.apply_config(args.config, movie_config)
+    if args.trace:
+        tracing.configure(args.trace)
+    summary = run(movie_obj, spec)
+    return summary, EXIT_OK if summary['ok'] else EXIT_FAILED
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='run a JSON/TOML job spec on the movie folders without prompts')
+    parser.add_argument('spec', help='path to a .json or .toml job spec')
+    parser.add_argument('--config', default=constants.CONFIG_PATH, help='config with the ffmpeg/ffprobe paths')
+    parser.add_argument('--summary', help='also write the JSON summary to this file')
+    parser.add_argument('--trace', help='write a Chrome trace of the run to this file, instead of TRACE_FILE')
+    args = parser.parse_args(argv)
+
+    try:
+        spec = load(args.spec)
+    except (OSError, ValueError) as exc:
+        # json.JSONDecodeError and tomllib.TOMLDecodeError are ValueErrors too
+        LOG.error('Job spec not valid: %s %s', exc, constants.CROSS)
+        summary, exit_code = {'ok': False, 'error': str(exc), 'folders': []}, EXIT_INVALID_SPEC
+    else:
+        summary, exit_code = _run_with_config(args, spec)
+
+    summary_json = json.dumps(summary, ensure_ascii=False, indent=2)
+    print(summary_json)
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as summary_file:
+            summary_file.write(summary_json)
+    return exit_code
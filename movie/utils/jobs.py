@@ -0,0 +1,132 @@
+import atexit
+import concurrent.futures
+import contextvars
+import os
+import threading
+from typing import Any
+from typing import Callable
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from movie.utils import constants
+from movie.utils.logging_config import LOG
+from movie.utils import tracing
+
+
+_SETTINGS = {'processes': os.cpu_count() or 1}
+
+# one process pool for the whole program, so `processes` is the budget of every caller together
+_PROCESS_POOL = {'executor': None}
+_PROCESS_POOL_LOCK = threading.Lock()
+
+
+def configure(processes: int) -> None:
+    LOG.debug('processes = %r', processes)
+    _SETTINGS['processes'] = processes
+    # workers are forked with the settings of their time: the next jobs get a new pool
+    shutdown_process_pool()
+
+
+def start_process_pool() -> Optional[concurrent.futures.ProcessPoolExecutor]:
+    # with fork, every worker is started on the first job: that has to happen before other threads run,
+    # a worker forked while another thread holds a lock (an index or cache lock) would wait for it forever
+    with _PROCESS_POOL_LOCK:
+        if _PROCESS_POOL['executor'] is None and _SETTINGS['processes'] > 1:
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=_SETTINGS['processes'])
+            executor.submit(int).result()
+            _PROCESS_POOL['executor'] = executor
+        return _PROCESS_POOL['executor']
+
+
+def shutdown_process_pool() -> None:
+    with _PROCESS_POOL_LOCK:
+        executor, _PROCESS_POOL['executor'] = _PROCESS_POOL['executor'], None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+atexit.register(shutdown_process_pool)
+
+
+class JobResult:
+    def __init__(self, name: str, error: Optional[str] = None, value: Any = None) -> None:
+        self.name = name
+        self.error = error
+        self.value = value
+
+    def __repr__(self):
+        if self.succeeded:
+            return f'{self.name} {constants.CHECK}'
+        return f'{self.name} {constants.CROSS} {self.error}'
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+
+def _run_job(function: Callable, name: str, args: tuple) -> JobResult:
+    # in a process pool the span stays in the worker process and is not part of the trace
+    try:
+        with tracing.span(name, tracing.CATEGORY_FILE):
+            value = function(*args)
+    except Exception as exc:
+        LOG.exception('Error while running job [%s]', name)
+        return JobResult(name, str(exc))
+    return JobResult(name, value=value)
+
+
+def _submit(executor: concurrent.futures.Executor, function: Callable, name: str, args: tuple):
+    if isinstance(executor, concurrent.futures.ThreadPoolExecutor):
+        # the job's spans nest under the span that started the jobs
+        return executor.submit(contextvars.copy_context().run, _run_job, function, name, args)
+    return executor.submit(_run_job, function, name, args)
+
+
+def run(
+        function: Callable,
+        jobs: Sequence[Tuple[str, tuple]],
+        workers: int = 1,
+        executor_class: type = concurrent.futures.ThreadPoolExecutor,
+) -> List[JobResult]:
+    # a failing job is reported in its JobResult and does not abort the others
+    LOG.debug(constants.LOG_FUNCTION_START.format(name = 'RUN JOBS'))
+    workers = max(1, min(workers, len(jobs)))
+    LOG.debug('%d jobs, %d workers, %s', len(jobs), workers, executor_class.__name__)
+
+    if workers == 1:
+        results = [_run_job(function, name, args) for name, args in jobs]
+    else:
+        with executor_class(max_workers=workers) as executor:
+            results = _run_in(executor, function, jobs)
+
+    log_results(results)
+    LOG.debug(constants.LOG_FUNCTION_END.format(name = 'RUN JOBS'))
+    return results
+
+
+def _run_in(executor: concurrent.futures.Executor, function: Callable,
+            jobs: Sequence[Tuple[str, tuple]]) -> List[JobResult]:
+    futures = [_submit(executor, function, name, args) for name, args in jobs]
+    return [future.result() for future in futures]
+
+
+def run_processes(function: Callable, jobs: Sequence[Tuple[str, tuple]]) -> List[JobResult]:
+    # for CPU-bound per-file work, in the shared process pool; `function` and its arguments have to be picklable
+    executor = start_process_pool() if len(jobs) > 1 else None
+    if executor is None:
+        return run(function, jobs)
+
+    LOG.debug('%d jobs, process pool of %d', len(jobs), _SETTINGS['processes'])
+    results = _run_in(executor, function, jobs)
+    log_results(results)
+    return results
+
+
+def log_results(results: List[JobResult]) -> None:
+    failed = [result for result in results if not result.succeeded]
+    for result in failed:
+        LOG.error('%s', result)
+    if results:
+        LOG.info('done: %d/%d, failed: %d', len(results) - len(failed), len(results), len(failed))
@@ -0,0 +1,28 @@
+import os
+from typing import List
+
+from movie.utils import constants
+from movie.utils import folder_index
+from movie.utils.logging_config import LOG
+
+
+SKIPPED_FOLDERS = {'logs'}
+
+
+def find_media_folders(root: str) -> List[str]:
+    # every folder under `root` (root included) that holds video files, in natural order
+    media_folders = []
+    for folder, sub_folders, _ in os.walk(root):
+        sub_folders[:] = sorted(
+            (d for d in sub_folders if not d.startswith('.') and d not in SKIPPED_FOLDERS),
+            key=folder_index.natural_sort_key)
+        if folder_index.get_files(folder, constants.VIDEO):
+            media_folders.append(folder)
+    LOG.debug('%s: media_folders = %r', root, media_folders)
+    return media_folders
+
+
+def expand(library: dict) -> List[dict]:
+    # a library entry is a folder entry with `root` instead of `path`: its steps apply to every media folder
+    steps = {key: value for key, value in library.items() if key != 'root'}
+    return [{**steps, 'path': folder} for folder in find_media_folders(library['root'])]
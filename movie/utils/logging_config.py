@@ -1,41 +1,130 @@
+import atexit
+import json
 import logging
-import logging.config
+import logging.handlers
+import os
+import queue
 
 from movie.utils import constants
 
 
-LOG_CONFIG = {
-    'version': 1,
-    'formatters': {
-        'file_log': {
-            'format': '%(asctime)s [%(levelname)s]\t%(message)s',
-            'exc_info': True
-        },
-        'console_log': {
-            'format': '%(message)s'
-        },
-    },
-    'handlers': {
-        'file': {
-            'class': 'logging.FileHandler',
-            'filename': constants.LOG_FILE,
-            'encoding': 'utf-8',
-            'formatter': 'file_log',
-            'level': logging.DEBUG,
-        },
-        'console': {
-            'class': 'logging.StreamHandler',
-            'formatter': 'console_log',
-            'level': logging.INFO,
-        },
-    },
-    'loggers': {
-        __name__: {
-            'level': logging.DEBUG,
-            'handlers': ['file', 'console'],
-            'propagate': False
-        }
-    }
-}
-logging.config.dictConfig(LOG_CONFIG)
+FILE_FORMAT = '%(asctime)s [%(levelname)s]\t%(message)s'
+CONSOLE_FORMAT = '%(message)s'
+
+
+class RecordQueueHandler(logging.handlers.QueueHandler):
+    # the message is merged with its arguments here, as QueueHandler.prepare does: the arguments may change
+    # before the listener thread formats the record. The listener still does the file format and the write;
+    # the probe journal's dict messages are built for one record and go as they are
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # a shallow copy, copy.copy goes through the pickle protocol and takes three times as long
+        prepared = logging.LogRecord.__new__(type(record))
+        prepared.__dict__.update(record.__dict__)
+        record = prepared
+        if isinstance(record.msg, str) or record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class RecordQueueListener(logging.handlers.QueueListener):
+    def stop(self) -> None:
+        # also called at exit, after an explicit stop
+        if self._thread is not None:
+            super().stop()
+
+
+class RotatingLogHandler(logging.handlers.RotatingFileHandler):
+    def _open(self):
+        # the folder is made on the first write, not on import
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        # the size after the last write: the stock check formats every record a second time to measure it
+        if self.stream is None:
+            self.stream = self._open()
+        return 0 < self.maxBytes <= self.stream.tell()
+
+
+class JsonLinesFormatter(logging.Formatter):
+    # one compact JSON object per line, the record's message is a dict
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {'time': self.formatTime(record), **record.msg}
+        try:
+            # ffprobe prints indented JSON, the journal keeps it parsed and on one line
+            entry['stdout'] = json.loads(entry.get('stdout') or 'null')
+        except ValueError:
+            pass
+        return json.dumps(entry, ensure_ascii=False, separators=(',', ':'))
+
+
+def get_rotating_handler(path: str, formatter: logging.Formatter) -> RotatingLogHandler:
+    handler = RotatingLogHandler(
+        path, maxBytes=constants.LOG_MAX_BYTES, backupCount=constants.LOG_BACKUP_COUNT, encoding='utf-8', delay=True)
+    handler.setFormatter(formatter)
+    return handler
+
+
+def get_append_handler(handler: logging.FileHandler) -> logging.FileHandler:
+    append_handler = logging.FileHandler(handler.baseFilename, encoding='utf-8', delay=True)
+    append_handler.setFormatter(handler.formatter)
+    append_handler.setLevel(handler.level)
+    return append_handler
+
+
+def start_queue_logging(logger: logging.Logger, handler: logging.Handler) -> RecordQueueListener:
+    # `handler` runs on the listener's thread; the listener is stopped, and its queue drained, at exit
+    record_queue = queue.SimpleQueue()
+    queue_handler = RecordQueueHandler(record_queue)
+    logger.addHandler(queue_handler)
+    listener = RecordQueueListener(record_queue, handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    if hasattr(os, 'register_at_fork'):
+        # a forked worker has no listener thread and may exit without atexit: it appends to the file the
+        # listener writes at the time, without rotating it, only the main process rotates
+        def write_directly():
+            logger.removeHandler(queue_handler)
+            logger.addHandler(get_append_handler(listener.handlers[0]))
+        os.register_at_fork(after_in_child=write_directly)
+    return listener
+
+
+def configure(level: str = constants.LOG_LEVEL) -> None:
+    # below INFO the records are dropped before their messages are built
+    LOG.setLevel(level)
+    LOG.debug('level = %r', level)
+
+
+def _get_console_handler() -> logging.Handler:
+    # the console stays synchronous, its lines must not come after the next menu prompt
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+    handler.setLevel(logging.INFO)
+    return handler
+
+
+# neither format uses the thread or process of a record: the flags of the "Optimization" section of the
+# logging HOWTO turn collecting them off. The caller's file and line are still collected, logging has no
+# public flag for them
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+
 LOG = logging.getLogger(__name__)
+LOG.setLevel(constants.LOG_LEVEL)
+LOG.propagate = False
+LOG.addHandler(_get_console_handler())
+LOG_LISTENER = start_queue_logging(LOG, get_rotating_handler(constants.LOG_FILE, logging.Formatter(FILE_FORMAT)))
+
+# one line per ffprobe run, instead of one file per run in logs/
+PROBE_JOURNAL = logging.getLogger(f'{__name__}.probes')
+PROBE_JOURNAL.setLevel(logging.INFO)
+PROBE_JOURNAL.propagate = False
+PROBE_JOURNAL_LISTENER = start_queue_logging(
+    PROBE_JOURNAL, get_rotating_handler(constants.PROBE_JOURNAL_FILE, JsonLinesFormatter()))
@@ -0,0 +1,247 @@
+import mmap
+import zlib
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+
+from movie.utils import constants
+from movie.utils.logging_config import LOG
+
+
+# element ids keep their length marker, as the Matroska specification lists them
+ID_EBML = 0x1A45DFA3
+ID_DOC_TYPE = 0x4282
+ID_SEGMENT = 0x18538067
+ID_CLUSTER = 0x1F43B675
+ID_TRACKS = 0x1654AE6B
+ID_TRACK_ENTRY = 0xAE
+ID_TRACK_TYPE = 0x83
+ID_CODEC_ID = 0x86
+ID_VIDEO = 0xE0
+ID_DEFAULT_DURATION = 0x23E383
+ID_AUDIO = 0xE1
+ID_CHANNELS = 0x9F
+ID_FLAG_DEFAULT = 0x88
+ID_FLAG_FORCED = 0x55AA
+ID_NAME = 0x536E
+ID_LANGUAGE = 0x22B59C
+ID_LANGUAGE_BCP47 = 0x22B59D
+ID_VOID = 0xEC
+ID_CRC32 = 0xBF
+
+DOC_TYPES = [b'matroska', b'webm']
+TRACK_TYPES = {1: constants.STREAM_TYPE_VIDEO, 2: constants.STREAM_TYPE_AUDIO, 17: constants.STREAM_TYPE_SUBTITLE}
+
+
+class Element(NamedTuple):
+    id: int
+    start: int
+    data_start: int
+    end: int
+
+
+class TrackEdit(NamedTuple):
+    # None leaves the value as it is; `stream_type` is checked against the track before anything is written
+    stream_type: Optional[str] = None
+    language: Optional[str] = None
+    name: Optional[str] = None
+    default: Optional[bool] = None
+    forced: Optional[bool] = None
+
+
+def read_vint(buffer, pos: int) -> Tuple[int, int]:
+    # (value without the length marker, length in bytes); a size with all value bits set is unknown: -1
+    if pos >= len(buffer):
+        raise ValueError(f'EBML number at {pos} after the end of the file')
+    first = buffer[pos]
+    length = 9 - first.bit_length() if first else 9
+    if length > 8 or pos + length > len(buffer):
+        raise ValueError(f'invalid EBML number at {pos}')
+    value = first & (0xFF >> length)
+    for byte in buffer[pos + 1:pos + length]:
+        value = value << 8 | byte
+    return (-1 if value == (1 << 7 * length) - 1 else value), length
+
+
+def read_id(buffer, pos: int) -> Tuple[int, int]:
+    _, length = read_vint(buffer, pos)
+    if length > 4:
+        raise ValueError(f'invalid EBML id at {pos}')
+    return int.from_bytes(buffer[pos:pos + length], 'big'), length
+
+
+def read_element(buffer, pos: int, parent_end: int) -> Element:
+    element_id, id_length = read_id(buffer, pos)
+    size, size_length = read_vint(buffer, pos + id_length)
+    data_start = pos + id_length + size_length
+    end = parent_end if size == -1 else data_start + size
+    if end > parent_end:
+        raise ValueError(f'element {element_id:X} at {pos} ends after its parent')
+    return Element(element_id, pos, data_start, end)
+
+
+def iter_elements(buffer, start: int, end: int) -> Iterator[Element]:
+    pos = start
+    while pos < end:
+        element = read_element(buffer, pos, end)
+        yield element
+        pos = element.end
+
+
+def read_uint(buffer, element: Element) -> int:
+    return int.from_bytes(buffer[element.data_start:element.end], 'big')
+
+
+def read_string(buffer, element: Element) -> str:
+    return bytes(buffer[element.data_start:element.end]).rstrip(b'\0').decode('utf-8', errors='replace')
+
+
+def find_tracks(buffer) -> Element:
+    # Tracks is a top-level element of the segment, written before the first cluster
+    header = read_element(buffer, 0, len(buffer))
+    if header.id != ID_EBML:
+        raise ValueError('not an EBML file')
+    doc_type = next((e for e in iter_elements(buffer, header.data_start, header.end) if e.id == ID_DOC_TYPE), None)
+    if doc_type is None or bytes(buffer[doc_type.data_start:doc_type.end]).rstrip(b'\0') not in DOC_TYPES:
+        raise ValueError('not a Matroska file')
+
+    segment = read_element(buffer, header.end, len(buffer))
+    if segment.id != ID_SEGMENT:
+        raise ValueError('no Matroska segment')
+    for element in iter_elements(buffer, segment.data_start, segment.end):
+        if element.id == ID_TRACKS:
+            return element
+        if element.id == ID_CLUSTER:
+            break
+    raise ValueError('no Tracks element before the first cluster')
+
+
+def encode_id(element_id: int) -> bytes:
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, 'big')
+
+
+def encode_size(size: int, length: Optional[int] = None) -> bytes:
+    if length is None:
+        length = next(n for n in range(1, 9) if size < (1 << 7 * n) - 1)
+    return (size | 1 << 7 * length).to_bytes(length, 'big')
+
+
+def encode_element(element_id: int, data: bytes) -> bytes:
+    return encode_id(element_id) + encode_size(len(data)) + data
+
+
+def encode_void(length: int) -> bytes:
+    # a Void element exactly `length` bytes long, at least 2
+    for size_length in range(1, 9):
+        data_length = length - 1 - size_length
+        if 0 <= data_length < (1 << 7 * size_length) - 1:
+            return encode_id(ID_VOID) + encode_size(data_length, size_length) + bytes(data_length)
+    raise ValueError(f'no Void element of {length} bytes')
+
+
+def _edit_track_entry(buffer, entry: Element, edit: TrackEdit) -> bytes:
+    children = [c for c in iter_elements(buffer, entry.data_start, entry.end) if c.id != ID_VOID]
+    track_type = next((read_uint(buffer, c) for c in children if c.id == ID_TRACK_TYPE), None)
+    if edit.stream_type is not None and TRACK_TYPES.get(track_type) != edit.stream_type:
+        raise ValueError(f'track type {track_type} is not {edit.stream_type}')
+
+    values = {}
+    if edit.language is not None:
+        values[ID_LANGUAGE] = edit.language.encode('ascii')
+    if edit.name is not None:
+        values[ID_NAME] = edit.name.encode('utf-8')
+    if edit.default is not None:
+        values[ID_FLAG_DEFAULT] = bytes([int(edit.default)])
+    if edit.forced or (edit.forced is not None and any(c.id == ID_FLAG_FORCED for c in children)):
+        # an absent FlagForced is 0 already: clearing it adds nothing to the headers
+        values[ID_FLAG_FORCED] = bytes([int(edit.forced)])
+
+    data = []
+    for child in children:
+        if child.id == ID_LANGUAGE_BCP47 and edit.language is not None:
+            # it would win over the new Language in players
+            continue
+        if child.id in values:
+            data.append(encode_element(child.id, values.pop(child.id)))
+        else:
+            data.append(bytes(buffer[child.start:child.end]))
+    data.extend(encode_element(element_id, value) for element_id, value in values.items())
+    return encode_element(ID_TRACK_ENTRY, b''.join(data))
+
+
+def _get_tracks_data(buffer, tracks: Element, edits: Dict[int, TrackEdit]) -> bytes:
+    children = [c for c in iter_elements(buffer, tracks.data_start, tracks.end) if c.id != ID_VOID]
+    entries = [c for c in children if c.id == ID_TRACK_ENTRY]
+    if any(position >= len(entries) for position in edits):
+        raise ValueError(f'{len(entries)} tracks, edits for {sorted(edits)}')
+
+    data = []
+    for child in children:
+        if child.id == ID_CRC32:
+            continue
+        if child.id == ID_TRACK_ENTRY and entries.index(child) in edits:
+            data.append(_edit_track_entry(buffer, child, edits[entries.index(child)]))
+        else:
+            data.append(bytes(buffer[child.start:child.end]))
+    data = b''.join(data)
+
+    if children and children[0].id == ID_CRC32:
+        # CRC-32 of the rest of the element, little-endian
+        data = encode_element(ID_CRC32, zlib.crc32(data).to_bytes(4, 'little')) + data
+    return data
+
+
+def _get_region(buffer, tracks: Element) -> int:
+    # the end of the Void elements right after Tracks: the space a new Tracks element can take
+    end = tracks.end
+    while end < len(buffer):
+        try:
+            element = read_element(buffer, end, len(buffer))
+        except ValueError:
+            break
+        if element.id != ID_VOID:
+            break
+        end = element.end
+    return end
+
+
+def _fit(tracks_data: bytes, space: int) -> Optional[bytes]:
+    tracks = encode_element(ID_TRACKS, tracks_data)
+    left = space - len(tracks)
+    if left < 0:
+        return None
+    if left == 1:
+        # one byte is too little for a Void: the size of Tracks takes it, EBML allows longer sizes
+        size = encode_size(len(tracks_data))
+        if len(size) == 8:
+            return None
+        return encode_id(ID_TRACKS) + encode_size(len(tracks_data), len(size) + 1) + tracks_data
+    return tracks + (encode_void(left) if left else b'')
+
+
+def edit_tracks(path: str, edits: Dict[int, TrackEdit]) -> bool:
+    # edits by track position in Tracks (ffprobe's stream index); only the Tracks element and the Void
+    # padding after it are rewritten. False when the new Tracks does not fit, the file is then unchanged
+    with open(path, 'r+b') as media_file, mmap.mmap(media_file.fileno(), 0) as buffer:
+        tracks = find_tracks(buffer)
+        region_end = _get_region(buffer, tracks)
+        region = _fit(_get_tracks_data(buffer, tracks, edits), region_end - tracks.start)
+        if region is None:
+            LOG.debug('%s: new Tracks does not fit in %d bytes', path, region_end - tracks.start)
+            return False
+        if region != buffer[tracks.start:region_end]:
+            buffer[tracks.start:region_end] = region
+            buffer.flush()
+        LOG.debug('%s: %d bytes of Tracks rewritten in place', path, region_end - tracks.start)
+    return True
+
+
+def get_track_types(path: str) -> List[Optional[str]]:
+    with open(path, 'rb') as media_file, mmap.mmap(media_file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        tracks = find_tracks(buffer)
+        return [TRACK_TYPES.get(next((read_uint(buffer, c) for c in iter_elements(buffer, e.data_start, e.end)
+                                      if c.id == ID_TRACK_TYPE), None))
+                for e in iter_elements(buffer, tracks.data_start, tracks.end) if e.id == ID_TRACK_ENTRY]
@@ -1,25 +1,35 @@
-import codecs
 import collections
 from datetime import datetime
 import os
-import re
 import subprocess
+from typing import Dict
 from typing import List
 from typing import Optional
 from typing import Tuple
 
 import ass
-import chardet
-import deep_translator
-from PIL import Image, ImageDraw, ImageFont
 import pysubs2
 
 from movie.utils import command
 from movie.utils import constants
+from movie.utils import encoding
 from movie.utils import generator
+from movie.utils import header_probe
 from movie.utils import files
+from movie.utils import folder_index
+from movie.utils import job_queue
+from movie.utils import jobs
 from movie.utils.logging_config import LOG
+from movie.utils.logging_config import PROBE_JOURNAL
+from movie.utils import matroska
+from movie.utils import preview
+from movie.utils import probe_cache
+from movie.utils import retiming
+from movie.utils import scheduler
 from movie.utils import stream
+from movie.utils import subtitles
+from movie.utils import tracing
+from movie.utils import translation
 
 
 class Movie():
@@ -27,7 +37,8 @@ class Movie():
     ffprobe_path: str
     movies_folder: str
     name_template: str
-    streams: List[stream.Stream]
+    streams: stream.Streams
+    workers: int
 
     def __init__(self, ffmpeg_path: str, ffprobe_path: str, movies_folder: str, name_template: str) -> None:
         self._filename_prefix = generator.get_filename_prefix()
@@ -36,20 +47,20 @@ class Movie():
         self.movies_folder = movies_folder
         self.name_template = name_template
         self.streams = None
+        self.workers = constants.DEFAULT_WORKERS
 
     def __set_streams__(self, stdout: str) -> None:
-        streams = stream.parse_ffprobe_output(stdout)
-        media_streams = stream.filter_media_streams(streams)
-        LOG.debug(f'{media_streams = }')
+        media_streams = stream.parse_ffprobe_json(stdout)
+        LOG.debug('media_streams = %r', media_streams)
         self.streams = media_streams
 
     def __get_video_streams_and_log_file__(self, video: str):
         vid_path_source = os.path.join(self.movies_folder, video)
-        LOG.debug(f'{vid_path_source = }')
+        LOG.debug('vid_path_source = %r', vid_path_source)
         dt_string = datetime.now().strftime('%Y.%m.%d - %H.%M.%S')
-        LOG.debug(f'{dt_string = }')
+        LOG.debug('dt_string = %r', dt_string)
 
-        cmd_exec = [self.ffprobe_path, '-show_streams', vid_path_source]
+        cmd_exec = stream.get_probe_command(self.ffprobe_path, vid_path_source)
         stdout = command.execute(cmd_exec)
         log_data = str("")
         if stdout.stderr is not None:
@@ -71,69 +82,86 @@ class Movie():
         with open(log_path_target, 'w', encoding='utf-8') as fp:
             for item in log_info:
                 fp.write(f'{item}\n')
-        LOG.info(f'info in: {log_path_target}')
+        LOG.info('info in: %s', log_path_target)
 
         self.__set_streams__(stdout.stdout)
 
         return log_path_target
 
-    def __analyze_video_streams__(self, video_path: str) -> subprocess.CompletedProcess:
-        cmd_exec = [self.ffprobe_path, '-show_streams', video_path]
-        stdout = command.execute(cmd_exec)
+    def __probe_headers__(self, video_path: str) -> Optional[subprocess.CompletedProcess]:
+        # Matroska and MP4 headers are read without starting ffprobe, None: ffprobe has to run
+        if not header_probe.is_supported(video_path):
+            return None
+        try:
+            with tracing.span(header_probe.PROBER_NAME, tracing.CATEGORY_COMMAND):
+                output = header_probe.probe(video_path)
+        except (OSError, ValueError) as exc:
+            LOG.debug('%s: %s, probing with ffprobe', video_path, exc)
+            return None
+        return subprocess.CompletedProcess([header_probe.PROBER_NAME, video_path], 0, output, '')
+
+    def __analyze_video_streams__(self, video_path: str) -> Optional[subprocess.CompletedProcess]:
+        cached_output = probe_cache.PROBE_CACHE.get(video_path)
+        if cached_output is not None:
+            LOG.debug('probe cache hit: %s', video_path)
+            self.__set_streams__(cached_output)
+            return None
+
+        stdout = self.__probe_headers__(video_path)
+        if stdout is None:
+            cmd_exec = stream.get_probe_command(self.ffprobe_path, video_path)
+            stdout = command.execute(cmd_exec)
+        probe_cache.PROBE_CACHE.put(video_path, stdout.stdout)
 
         self.__set_streams__(stdout.stdout)
         return stdout
 
     def __save_ffprobe_log__(self, output: subprocess.CompletedProcess, video_name: str) -> None:
-        dt_string = datetime.now().strftime('%Y.%m.%d - %H.%M.%S')
-        LOG.debug(f'{dt_string = }')
-
-        log_data = output.stderr if output.stderr is not None else ""
-        log_data += output.stdout if output.stdout is not None else ""
-
-        logs_folder = 'logs'
-        os.makedirs(logs_folder, exist_ok=True)
-
-        log_path_target = os.path.join(logs_folder, f'{dt_string}-{video_name}.log')
-        with open(log_path_target, 'w', encoding='utf-8') as log_file:
-            log_file.write('\n'.join(log_data.split('\n')))
-
+        # formatted and appended to the journal by the logging thread
+        PROBE_JOURNAL.info({
+            'video': os.path.join(self.movies_folder, video_name),
+            'stderr': output.stderr or '',
+            'stdout': output.stdout or '',
+        })
+
+    @tracing.traced
     def analyze_video_file(self, video_file: str) -> None:
         LOG.debug(constants.LOG_FUNCTION_START.format(name='ANALYZE VIDEO FILE'))
 
         vid_path_source = os.path.join(self.movies_folder, video_file)
-        LOG.debug(f'{vid_path_source = }')
+        LOG.debug('vid_path_source = %r', vid_path_source)
 
         ffprobe_output = self.__analyze_video_streams__(vid_path_source)
-        self.__save_ffprobe_log__(ffprobe_output, video_file)
+        if ffprobe_output is not None:
+            self.__save_ffprobe_log__(ffprobe_output, video_file)
 
         LOG.debug(constants.LOG_FUNCTION_END.format(name='ANALYZE VIDEO FILE'))
 
+    @tracing.traced
     def analyze_first_video_file(self):
         LOG.debug(constants.LOG_FUNCTION_START.format(name='ANALYZE FIRST VIDEO FILE'))
 
         first_video_file = self.__get_first_video_in_directory__()
-        LOG.debug(f'{first_video_file = }')
+        LOG.debug('first_video_file = %r', first_video_file)
         if first_video_file is None:
             return
 
         vid_path_source = os.path.join(self.movies_folder, first_video_file)
-        LOG.debug(f'{vid_path_source = }')
+        LOG.debug('vid_path_source = %r', vid_path_source)
 
         ffprobe_output = self.__analyze_video_streams__(vid_path_source)
-        self.__save_ffprobe_log__(ffprobe_output, first_video_file)
+        if ffprobe_output is not None:
+            self.__save_ffprobe_log__(ffprobe_output, first_video_file)
 
         LOG.debug(constants.LOG_FUNCTION_END.format(name='ANALYZE FIRST VIDEO FILE'))
 
     def __get_first_stream_of_type__(self,  selected_streams: List[int], stream_type: str) -> Optional[int]:
-        stream_indices = {stream.index for stream in self.streams}
-        LOG.debug(f'{stream_type = }')
+        LOG.debug('stream_type = %r', stream_type)
         for selected_stream in selected_streams:
-            if selected_stream in stream_indices:
-                corresponding_stream = next(stream for stream in self.streams if stream.index == selected_stream)
-                if corresponding_stream.stream_type == stream_type:
-                    LOG.debug(f'{corresponding_stream} - {corresponding_stream.stream_type}')
-                    return selected_stream
+            corresponding_stream = self.streams.get(selected_stream, stream_type)
+            if corresponding_stream is not None:
+                LOG.debug('%s - %s', corresponding_stream, corresponding_stream.stream_type)
+                return selected_stream
         return None
 
     def __get_default_streams__(self, selected_streams: List[int]) -> List[int]:
@@ -145,35 +173,40 @@ class Movie():
         default_stream_subtitle = self.__get_first_stream_of_type__(selected_streams, constants.STREAM_TYPE_SUBTITLE)
         default_streams = [default_stream_video, default_stream_audio, default_stream_subtitle]
 
-        LOG.debug(f'default stream {constants.STREAM_TYPE_VIDEO}: {default_stream_video}')
-        LOG.debug(f'default stream {constants.STREAM_TYPE_AUDIO}: {default_stream_audio}')
-        LOG.debug(f'default stream {constants.STREAM_TYPE_SUBTITLE}: {default_stream_subtitle}')
-        LOG.debug(f'{default_streams = }')
+        LOG.debug('default stream %s: %s', constants.STREAM_TYPE_VIDEO, default_stream_video)
+        LOG.debug('default stream %s: %s', constants.STREAM_TYPE_AUDIO, default_stream_audio)
+        LOG.debug('default stream %s: %s', constants.STREAM_TYPE_SUBTITLE, default_stream_subtitle)
+        LOG.debug('default_streams = %r', default_streams)
 
         LOG.debug(constants.LOG_FUNCTION_END.format(name = 'GET DEFAULT SELECTED STREAMS'))
         return default_streams
 
-    def process_streams_to_video_files(self, map_video_streams):
+    @tracing.traced
+    def process_streams_to_video_files(self, map_video_streams) -> List[jobs.JobResult]:
         LOG.debug(constants.LOG_FUNCTION_START.format(name = 'PROCESS STREAMS TO VIDEO FILES'))
+        remux_jobs = []
+        track_edits = {}
         for video, streams in map_video_streams.items():
             self.analyze_video_file(video)
             streams_metadata = self.__get_process_streams_metadata__(streams)
-            LOG.debug(f'{video = }')
-            LOG.debug(f'{streams = }')
-            LOG.debug(f'{streams_metadata = }')
-            self.exec_command_for_file(video, streams_metadata)
+            LOG.debug('video = %r', video)
+            LOG.debug('streams = %r', streams)
+            LOG.debug('streams_metadata = %r', streams_metadata)
+            remux_jobs.append((video, (video, streams_metadata)))
+            track_edits[video] = self.__get_track_edits__(streams)
+        results = self.__run_remux_jobs__(remux_jobs, track_edits)
         LOG.debug(constants.LOG_FUNCTION_END.format(name = 'PROCESS STREAMS TO VIDEO FILES'))
+        return results
 
     def __get_process_streams_metadata__(self, selected_streams: List[int]) -> list:
         LOG.debug(constants.LOG_FUNCTION_START.format(name = 'PROCESS STREAMS'))
-        LOG.debug(f'{selected_streams = }')
+        LOG.debug('selected_streams = %r', selected_streams)
 
         default_streams = self.__get_default_streams__(selected_streams)
         streams_metadata = []
-        stream_indices = {stream.index for stream in self.streams}
         for i, selected_stream in enumerate(selected_streams):
-            LOG.debug(f'{selected_stream = }')
-            if selected_stream in stream_indices:
+            LOG.debug('selected_stream = %r', selected_stream)
+            if selected_stream in self.streams:
                 stream_metadata = [
                     '-map', f'0:{selected_stream}', f'-disposition:{i}'
                 ]
@@ -186,32 +219,40 @@ class Movie():
                         ['0']
                     )
 
-                LOG.debug(f'{stream_metadata = }')
+                LOG.debug('stream_metadata = %r', stream_metadata)
                 streams_metadata.extend(stream_metadata)
-        LOG.debug(f'{streams_metadata = }')
+        LOG.debug('streams_metadata = %r', streams_metadata)
         LOG.debug(constants.LOG_FUNCTION_END.format(name = 'PROCESS STREAMS'))
 
         return streams_metadata
 
-    def process_streams_language_to_video_files(self, map_video_streams_language):
+    @tracing.traced
+    def process_streams_language_to_video_files(self, map_video_streams_language) -> List[jobs.JobResult]:
         LOG.debug(constants.LOG_FUNCTION_START.format(name = 'PROCESS STREAMS LANGUAGE TO VIDEO FILES'))
+        remux_jobs = []
+        track_edits = {}
         for video, streams_map in map_video_streams_language.items():
+            # default streams are chosen from this file's own streams
+            self.analyze_video_file(video)
             streams_language_metadata = self.__get_process_streams_language__metadata__(streams_map)
-            LOG.debug(f'{video = }')
-            LOG.debug(f'{streams_map = }')
-            LOG.debug(f'{streams_language_metadata = }')
-            self.exec_command_for_file(video, streams_language_metadata)
+            LOG.debug('video = %r', video)
+            LOG.debug('streams_map = %r', streams_map)
+            LOG.debug('streams_language_metadata = %r', streams_language_metadata)
+            remux_jobs.append((video, (video, streams_language_metadata)))
+            track_edits[video] = self.__get_track_edits__(list(streams_map), streams_map)
+        results = self.__run_remux_jobs__(remux_jobs, track_edits)
         LOG.debug(constants.LOG_FUNCTION_END.format(name = 'PROCESS STREAMS LANGUAGE TO VIDEO FILES'))
+        return results
 
     def __get_process_streams_language__metadata__(self, streams_languages: dict):
         LOG.debug(constants.LOG_FUNCTION_START.format(name = 'PROCESS STREAMS LANGUAGE'))
-        LOG.debug(f'{streams_languages = }')
+        LOG.debug('streams_languages = %r', streams_languages)
         default_streams = self.__get_default_streams__(list(streams_languages.keys()))
         streams_metadata = []
         for i, key in enumerate(streams_languages):
-            LOG.debug(f'{i = }')
-            LOG.debug(f'{key = }')
-            LOG.debug(f'{streams_languages[key] = }')
+            LOG.debug('i = %r', i)
+            LOG.debug('key = %r', key)
+            LOG.debug('streams_languages[key] = %r', streams_languages[key])
             stream_metadata = [
                 '-map', f'0:{key}',
                 f'-metadata:s:{i}', f'language={streams_languages[key]}',
@@ -224,26 +265,27 @@ class Movie():
                 stream_metadata.extend(
                     [f'-disposition:{i}', '0',]
                 )
-            LOG.debug(f'{stream_metadata = }')
+            LOG.debug('stream_metadata = %r', stream_metadata)
             streams_metadata.extend(stream_metadata)
-        LOG.debug(f'{streams_metadata = }')
+        LOG.debug('streams_metadata = %r', streams_metadata)
         LOG.debug(constants.LOG_FUNCTION_END.format(name = 'PROCESS STREAMS LANGUAGE'))
 
         return streams_metadata
 
-    def _natural_sort_key(self, s: str) -> list:
-        def convert(text):
-            return int(text) if text.isdigit() else text.lower()
-        return [convert(c) for c in re.split('([0-9]+)', s)]
+    def __get_track_edits__(self, selected_streams: List[int], streams_languages: Optional[dict] = None
+                            ) -> Dict[int, matroska.TrackEdit]:
+        # what the remux would change when every stream keeps its place: the headers can be edited in place
+        if selected_streams != [s.stream_index for s in self.streams]:
+            return {}
+        default_streams = self.__get_default_streams__(selected_streams)
+        languages = streams_languages or {}
+        return {s.stream_index: matroska.TrackEdit(s.stream_type, language=languages.get(s.stream_index),
+                                            default=s.stream_index in default_streams, forced=False)
+                for s in self.streams}
 
     def __get_files_by_type__(self, files_type) -> List[str]:
-        multimedia_files = []
-        for _, f in enumerate(os.listdir(self.movies_folder), start=1):
-            _, file_extension = os.path.splitext(f)
-            if file_extension in files_type:
-                multimedia_files.append(f)
-        multimedia_files.sort(key=self._natural_sort_key)
-        LOG.debug(f'{multimedia_files}')
+        multimedia_files = folder_index.get_files(self.movies_folder, files_type)
+        LOG.debug('%s', multimedia_files)
         return multimedia_files
 
     def __get_audio_files__(self) -> List[str]:
@@ -281,50 +323,137 @@ class Movie():
         }
         return codec_settings[audio_type]
 
-    def extract_audio_from_video_files(self, audio_type: str) -> None:
-        LOG.debug(constants.LOG_FUNCTION_START.format(name = 'Extract audio from video files'))
-
-        video_files = self.__get_video_files__()
-        for f in video_files:
-            LOG.info(f'{f}')
-            file_name, _ = os.path.splitext(f)
-            path_source = os.path.join(self.movies_folder, f)
+    def __extract_audio_file__(self, video_file: str, audio_types: List[str], threads: int) -> None:
+        # one demux and decode per file, every format is a separate output of the same ffmpeg
+        LOG.info('%s', video_file)
+        file_name, _ = os.path.splitext(video_file)
+        path_source = os.path.join(self.movies_folder, video_file)
+        cmd_exec = [self.ffmpeg_path, '-i', path_source]
+        transcode = False
+        for audio_type in audio_types:
             path_target = os.path.join(self.movies_folder, f'{file_name}{audio_type}')
             audio_codec = self.__get_codec_by_audio_type__(audio_type)
-            cmd_exec = [
-                self.ffmpeg_path,
-                '-i', path_source,
+            transcode = transcode or audio_codec[0] != 'copy'
+            cmd_exec.extend([
                 '-vn',  '-acodec', *audio_codec,
+                '-threads', str(threads),
                 path_target
-            ]
-            LOG.debug(f'{cmd_exec = }')
+            ])
+        LOG.debug('cmd_exec = %r', cmd_exec)
+        with scheduler.SCHEDULER.slot(path_source, threads=threads if transcode else 0):
             command.execute(cmd_exec)
 
+    @tracing.traced
+    def extract_audio_from_video_files(self, audio_types) -> List[jobs.JobResult]:
+        LOG.debug(constants.LOG_FUNCTION_START.format(name = 'Extract audio from video files'))
+        if isinstance(audio_types, str):
+            audio_types = [audio_types]
+        LOG.debug('audio_types = %r', audio_types)
+
+        video_files = self.__get_video_files__()
+        # the CPU budget is split between the files that run at once; every thread is a permit of the budget,
+        # other folders running at the same time wait for them
+        threads = max(1, scheduler.get_cpu_limit() // max(1, min(self.workers, len(video_files))))
+        extract_jobs = [(f, (f, list(audio_types), threads)) for f in video_files]
+        results = jobs.run(self.__extract_audio_file__, extract_jobs, self.workers)
+        folder_index.invalidate(self.movies_folder)
+        scheduler.SCHEDULER.log_throughput()
+
         LOG.debug(constants.LOG_FUNCTION_END.format(name = 'Extract audio from video files'))
+        return results
 
-    def set_external_audio_non_default(self):
+    @tracing.traced
+    def set_external_audio_non_default(self) -> List[jobs.JobResult]:
         LOG.debug(constants.LOG_FUNCTION_START.format(name = 'Remove default settings in external audio'))
 
         cmd_exec = ['-disposition:a:0', '0']
-        for audio_file in self.__get_audio_files__():
-            self.exec_command_for_file(audio_file, cmd_exec)
+        audio_files = self.__get_audio_files__()
+        remux_jobs = [(audio_file, (audio_file, cmd_exec)) for audio_file in audio_files]
+        track_edits = {audio_file: self.__get_non_default_edits__(audio_file, constants.STREAM_TYPE_AUDIO)
+                       for audio_file in audio_files}
+        results = self.__run_remux_jobs__(remux_jobs, track_edits)
 
         LOG.debug(constants.LOG_FUNCTION_END.format(name = 'Remove default settings in external audio'))
+        return results
 
     def __separate_media_streams__(self) -> Tuple[List[stream.Stream], List[stream.Stream], List[stream.Stream]]:
-        vid_list = [d for d in self.streams if d.stream_type == constants.STREAM_TYPE_VIDEO]
-        aud_list = [d for d in self.streams if d.stream_type == constants.STREAM_TYPE_AUDIO]
-        sub_list = [d for d in self.streams if d.stream_type == constants.STREAM_TYPE_SUBTITLE]
-        return vid_list, aud_list, sub_list
-
+        return (self.streams.of_type(constants.STREAM_TYPE_VIDEO),
+                self.streams.of_type(constants.STREAM_TYPE_AUDIO),
+                self.streams.of_type(constants.STREAM_TYPE_SUBTITLE))
+
+    def __get_temp_path__(self, multimedia_file: str, suffix: str = '') -> str:
+        # one temp name per source file, so concurrent jobs never share a target
+        file_name, file_extension = os.path.splitext(multimedia_file)
+        return os.path.join(self.movies_folder, f'{self._filename_prefix}.{file_name}{suffix}{file_extension}')
+
+    def __is_matroska__(self, multimedia_file: str) -> bool:
+        return os.path.splitext(multimedia_file)[1].lower() in constants.MATROSKA
+
+    def __get_non_default_edits__(self, multimedia_file: str, stream_type: str) -> Dict[int, matroska.TrackEdit]:
+        # `-disposition:a:0 0` as a header edit of the first track of the type
+        if not self.__is_matroska__(multimedia_file):
+            return {}
+        try:
+            track_types = matroska.get_track_types(os.path.join(self.movies_folder, multimedia_file))
+        except (OSError, ValueError) as exc:
+            LOG.debug('%s: %s', multimedia_file, exc)
+            return {}
+        if stream_type not in track_types:
+            return {}
+        return {track_types.index(stream_type): matroska.TrackEdit(stream_type, default=False, forced=False)}
+
+    def __edit_tracks_in_place__(self, multimedia_file: str, edits: Dict[int, matroska.TrackEdit]) -> bool:
+        # rewrites only the track headers, False: the file needs the remux
+        if not edits or not self.__is_matroska__(multimedia_file):
+            return False
+        path_source = os.path.join(self.movies_folder, multimedia_file)
+        try:
+            with tracing.span(f'edit {multimedia_file}', tracing.CATEGORY_FILE):
+                edited = matroska.edit_tracks(path_source, edits)
+        except (OSError, ValueError) as exc:
+            LOG.warning('%s: in-place edit failed (%s), remuxing', multimedia_file, exc)
+            return False
+        if not edited:
+            LOG.info('%s: no room for the new track headers, remuxing', multimedia_file)
+            return False
+        probe_cache.PROBE_CACHE.invalidate(path_source)
+        LOG.info('%s: edited in place', multimedia_file)
+        return True
+
+    def __run_remux_jobs__(self, remux_jobs: List[Tuple[str, tuple]],
+                           track_edits: Optional[Dict[str, Dict[int, matroska.TrackEdit]]] = None
+                           ) -> List[jobs.JobResult]:
+        # Matroska files whose new headers fit in the old ones, with their padding, are not rewritten
+        # (milliseconds per file, no job pool needed)
+        track_edits = track_edits or {}
+        edited = [jobs.JobResult(f) for f, _ in remux_jobs if self.__edit_tracks_in_place__(f, track_edits.get(f))]
+        remux_jobs = [job for job in remux_jobs if job[0] not in {result.name for result in edited}]
+
+        # files finished by an earlier, interrupted run of the same batch are skipped in exec_command_for_file
+        done = job_queue.JOB_QUEUE.count_done([
+            (os.path.join(self.movies_folder, multimedia_file), constants.JOB_OPERATION_REMUX, command_exec)
+            for multimedia_file, command_exec in (args for _, args in remux_jobs)
+        ])
+        if done:
+            LOG.info('resuming batch: %s/%s files already done', done, len(remux_jobs))
+        results = jobs.run(self.exec_command_for_file, remux_jobs, self.workers)
+        scheduler.SCHEDULER.log_throughput()
+        return edited + results
+
+    def recover_interrupted_jobs(self) -> None:
+        job_queue.JOB_QUEUE.recover(self.movies_folder)
+
+    def is_temp_file(self, multimedia_file: str) -> bool:
+        return os.path.basename(multimedia_file).startswith(f'{self._filename_prefix}.')
+
+    @tracing.traced
     def exec_command_for_file(self, multimedia_file: str, command_exec: List[str]):
         LOG.debug(constants.LOG_FUNCTION_START.format(name = 'Execution command for file'))
 
-        _, file_extension = os.path.splitext(multimedia_file)
         path_source = os.path.join(self.movies_folder, multimedia_file)
-        path_target = os.path.join(self.movies_folder, f'{self._filename_prefix}{file_extension}')
-        LOG.info(f'{multimedia_file}')
-        LOG.debug(f'{path_target = }')
+        path_target = self.__get_temp_path__(multimedia_file)
+        LOG.info('%s', multimedia_file)
+        LOG.debug('path_target = %r', path_target)
         cmd_exec = [
             self.ffmpeg_path,
             '-i', path_source,
@@ -332,29 +461,37 @@ class Movie():
             *command_exec,
             path_target
         ]
-        LOG.debug(f'{cmd_exec = }')
+        LOG.debug('cmd_exec = %r', cmd_exec)
+
+        if job_queue.JOB_QUEUE.is_done(path_source, constants.JOB_OPERATION_REMUX, command_exec):
+            LOG.info('%s: already done, skipped', multimedia_file)
+            return
 
-        command.execute(cmd_exec)
-        files.restoring_target_filename_to_source(path_target, path_source)
+        with job_queue.JOB_QUEUE.track(path_source, constants.JOB_OPERATION_REMUX, command_exec, path_target):
+            with scheduler.SCHEDULER.slot(path_source):
+                command.execute(cmd_exec)
+            files.restoring_target_filename_to_source(path_target, path_source)
+        probe_cache.PROBE_CACHE.invalidate(path_source)
 
         LOG.debug(constants.LOG_FUNCTION_END.format(name = 'Execution command for file'))
 
     def __is_series__(self) -> int:
         video_files = self.__get_video_files__()
         video_count = len(video_files)
-        LOG.debug(f'{video_count = }')
+        LOG.debug('video_count = %r', video_count)
         return video_count
 
     def __rename__(self, file: str, template: str, idx: int):
         file_name, file_extension = os.path.splitext(file)
         new_file_name = template.format(episode_idx=idx)
-        LOG.debug(f'old_file: {file_name}{file_extension}')
-        LOG.debug(f'new_file: {new_file_name}{file_extension}')
+        LOG.debug('old_file: %s%s', file_name, file_extension)
+        LOG.debug('new_file: %s%s', new_file_name, file_extension)
         old_path = os.path.join(self.movies_folder, file)
         new_path = os.path.join(self.movies_folder, new_file_name + file_extension)
 
         files.rename(old_path, new_path)
 
+    @tracing.traced
     def rename_files(self):
         LOG.debug(constants.LOG_FUNCTION_START.format(name = 'RENAMING FILES'))
         if self.__is_series__() == 1:
@@ -368,59 +505,58 @@ class Movie():
             template_img = self.name_template + '.E{episode_idx:02d}'
             template_aud = self.name_template + '.E{episode_idx:02d}.RUS'
 
-        for idx, f in enumerate(self.__get_video_files__(), start=1):
-            self.__rename__(f, template_vid, idx)
-        for idx, f in enumerate(self.__get_audio_files__(), start=1):
-            self.__rename__(f, template_aud, idx)
-        for idx, f in enumerate(self.__get_subtitle_files__(), start=1):
-            self.__rename__(f, template_sub, idx)
-        for idx, f in enumerate(self.__get_image_files__(), start=1):
-            self.__rename__(f, template_img, idx)
+        # all lists are taken before the first rename, the types do not overlap
+        renames = [
+            (self.__get_video_files__(), template_vid),
+            (self.__get_audio_files__(), template_aud),
+            (self.__get_subtitle_files__(), template_sub),
+            (self.__get_image_files__(), template_img),
+        ]
+        for files_of_type, template in renames:
+            for idx, f in enumerate(files_of_type, start=1):
+                self.__rename__(f, template, idx)
 
-    def subs_convert_srt_to_ass(self):
-        LOG.debug(
-            constants.LOG_FUNCTION_START.format(
-                name = f'convert {constants.STREAM_TYPE_SUBTITLE} {constants.SRT} -> {constants.ASS}')
-        )
-        for f in self.__get_srt_subtitle_files__():
-            filename, file_extension = os.path.splitext(f)
+    def convert_srt_file(self, file: str) -> None:
+        # one file; subs_convert_srt_to_ass runs it for every .srt of the folder
+        filename, _ = os.path.splitext(file)
 
-            LOG.debug(f'{filename} -> .ass ')
+        LOG.debug('%s -> .ass ', filename)
 
-            sub_path_source = os.path.join(self.movies_folder, f)
-            sub_path_target = os.path.join(self.movies_folder, f'{filename}.ass')
+        sub_path_source = os.path.join(self.movies_folder, file)
+        sub_path_target = os.path.join(self.movies_folder, f'{filename}.ass')
 
-            subs = pysubs2.load(sub_path_source, encoding='utf-8')
-            subs.save(sub_path_target, encoding='utf-8')
-            sub_srt_path = os.path.join(self.movies_folder, filename + file_extension)
+        text, _ = encoding.read_text(sub_path_source)
+        subs = pysubs2.SSAFile.from_string(text)
+        subs.save(sub_path_target, encoding='utf-8')
+
+        files.remove(sub_path_source)
 
-            files.remove(sub_srt_path)
+    @tracing.traced
+    def subs_convert_srt_to_ass(self) -> List[jobs.JobResult]:
+        LOG.debug(
+            constants.LOG_FUNCTION_START.format(
+                name = f'convert {constants.STREAM_TYPE_SUBTITLE} {constants.SRT} -> {constants.ASS}')
+        )
+        convert_jobs = [(f, (f,)) for f in self.__get_srt_subtitle_files__()]
+        results = jobs.run_processes(self.convert_srt_file, convert_jobs)
+        # files were created and removed by the worker processes
+        folder_index.invalidate(self.movies_folder)
         LOG.debug(
             constants.LOG_FUNCTION_END.format(
                 name = f'convert {constants.STREAM_TYPE_SUBTITLE} {constants.SRT} -> {constants.ASS}')
         )
+        return results
 
     def __get_styles__(self, file: str) -> dict:
         sub_path_source = os.path.join(self.movies_folder, file)
-        with codecs.open(
-            sub_path_source, mode='r', encoding=self.__get_file_encoding__(sub_path_source)
-        ) as sub_file_source:
-            doc = ass.parse(sub_file_source)
-            style_occurrences = {}
-            for event in doc.events:
-                if event.style in style_occurrences:
-                    style_occurrences[event.style] += 1
-                else:
-                    style_occurrences[event.style] = 1
-        sub_file_source.close()
+        sorted_style_occurrences = subtitles.SUBTITLE_CACHE.get(sub_path_source).styles
+        LOG.debug('sorted_style_occurrences = %r', sorted_style_occurrences)
 
-        sorted_style_occurrences = dict(sorted(style_occurrences.items(), key=lambda x: x[1], reverse=True))
-        LOG.debug(f'{sorted_style_occurrences = }')
-
-        LOG.info(f"{file}: {', '.join(f'{k}: {v}' for k, v in sorted_style_occurrences.items())}")
+        LOG.info('%s: %s', file, ', '.join(f'{k}: {v}' for k, v in sorted_style_occurrences.items()))
 
         return sorted_style_occurrences
 
+    @tracing.traced
     def get_sub_info(self):
         LOG.debug(constants.LOG_FUNCTION_START.format(name = f'{constants.ASS}-SUBTITLE INFO'))
         ass_sub_files = self.__get_ass_subtitle_files__()
@@ -430,15 +566,11 @@ class Movie():
             return
 
         first_subtitle = ass_sub_files[0]
-        LOG.debug(f'{first_subtitle = }')
+        LOG.debug('first_subtitle = %r', first_subtitle)
         self.__get_styles__(first_subtitle)
 
     def __find_subtitle_stream_by_index__(self, stream_index: int):
-        _, _, subtitle_streams = self.__separate_media_streams__()
-        for subtitle_stream in subtitle_streams:
-            if subtitle_stream.index == stream_index:
-                return subtitle_stream
-        return None
+        return self.streams.get(stream_index, constants.STREAM_TYPE_SUBTITLE)
 
     def __get_subtitle_extension__(self, codec_name: str) -> str:
         extension_map = {
@@ -458,305 +590,324 @@ class Movie():
 
         return subtitle_extension
 
-    def extract_subtitle(self, keep_subtitles=False, streams_index: Optional[List[int]] = None):
+    def __get_subtitle_target__(self, video_file: str, subtitle_stream: stream.Stream) -> str:
+        filename, _ = os.path.splitext(video_file)
+        subtitle_extension = self.__get_subtitle_extension__(subtitle_stream.codec_name)
+        return os.path.join(self.movies_folder, f'{filename}.{subtitle_stream.stream_index}{subtitle_extension}')
+
+    def __get_extract_subtitle_command__(
+            self, video_file: str, subtitle_streams: List[stream.Stream], keep_subtitles: bool
+    ) -> Tuple[List[str], Optional[str]]:
+        # one demux per file: every subtitle stream and the subtitle-free video are outputs of the same ffmpeg
+        vid_path_source = os.path.join(self.movies_folder, video_file)
+
+        cmd_exec = [self.ffmpeg_path, '-i', vid_path_source]
+        for subtitle_stream in subtitle_streams:
+            sub_path_target = self.__get_subtitle_target__(video_file, subtitle_stream)
+            LOG.debug('sub_path_target = %r', sub_path_target)
+            cmd_exec.extend([
+                '-map', f'0:{subtitle_stream.stream_index}',
+                '-c:s', subtitle_stream.codec_name,
+                sub_path_target
+            ])
+
+        if keep_subtitles:
+            return cmd_exec, None
+
+        vid_path_target = self.__get_temp_path__(video_file, '.no_subs')
+        LOG.debug('vid_path_target = %r', vid_path_target)
+
+        exclude_subtitle_streams = []
+        for subtitle_stream in subtitle_streams:
+            exclude_subtitle_streams.extend(['-map', f'-0:{subtitle_stream.stream_index}'])
+        LOG.debug('exclude_subtitle_streams = %r', exclude_subtitle_streams)
+
+        cmd_exec.extend([
+            '-map', '0',
+            *exclude_subtitle_streams,
+            '-c', 'copy',
+            vid_path_target
+        ])
+        return cmd_exec, vid_path_target
+
+    @tracing.traced
+    def extract_subtitle(
+            self,
+            keep_subtitles=False,
+            streams_index: Optional[List[int]] = None,
+            video_files: Optional[List[str]] = None,
+    ):
         LOG.debug(
             constants.LOG_FUNCTION_START.format(
                 name = (f'EXTRACT {constants.STREAM_TYPE_SUBTITLE} FROM {constants.STREAM_TYPE_VIDEO}')
             )
         )
-        LOG.debug(f'{streams_index = }')
+        LOG.debug('streams_index = %r', streams_index)
+        if streams_index is None:
+            # every subtitle stream of the probed file
+            streams_index = [s.stream_index for s in self.streams.of_type(constants.STREAM_TYPE_SUBTITLE)]
 
         subtitle_streams = []
         for stream_index in streams_index:
             subtitle_stream = self.__find_subtitle_stream_by_index__(stream_index)
             if subtitle_stream:
                 subtitle_streams.append(subtitle_stream)
-        LOG.debug(f'{subtitle_streams = }')
+        LOG.debug('subtitle_streams = %r', subtitle_streams)
+        if not subtitle_streams:
+            LOG.warning('There is no selected subtitle streams')
+            return
 
-        for f in self.__get_video_files__():
-            filename, file_extension = os.path.splitext(f)
+        if video_files is None:
+            video_files = self.__get_video_files__()
+        job_args = [keep_subtitles, [subtitle_stream.stream_index for subtitle_stream in subtitle_streams]]
+        done = job_queue.JOB_QUEUE.count_done([
+            (os.path.join(self.movies_folder, f), constants.JOB_OPERATION_EXTRACT_SUBTITLE, job_args)
+            for f in video_files
+        ])
+        if done:
+            LOG.info('resuming batch: %s/%s files already done', done, len(video_files))
 
+        for f in video_files:
+            LOG.info('%s', f)
             vid_path_source = os.path.join(self.movies_folder, f)
-            LOG.info(f'{f}')
-
-            for subtitle_stream in subtitle_streams:
-                subtitle_extension = self.__get_subtitle_extension__(subtitle_stream.codec_name)
-                sub_path_target = os.path.join(
-                    self.movies_folder,
-                    f'{filename}.{subtitle_stream.index}{subtitle_extension}'
-                )
-                LOG.debug(f'{sub_path_target = }')
-
-                cmd_exec = [
-                    self.ffmpeg_path,
-                    '-i', vid_path_source,
-                    '-map', f'0:{subtitle_stream.index}',
-                    '-c:s', subtitle_stream.codec_name,
-                    sub_path_target
-                ]
-                command.execute(cmd_exec)
-
-            if not keep_subtitles:
-                vid_path_target = os.path.join(
-                    self.movies_folder, f'{self._filename_prefix}.no_subs{file_extension}')
-                LOG.debug(f'{vid_path_target = }')
-
-                exclude_subtitle_streams = []
-                for subtitle_stream in subtitle_streams:
-                    exclude_subtitle_streams.extend(['-map', f'-0:{subtitle_stream.index}'])
-                LOG.debug(f'{exclude_subtitle_streams = }')
-
-                cmd_exec = [
-                    self.ffmpeg_path,
-                    '-i', vid_path_source,
-                    '-map', '0', 
-                    *exclude_subtitle_streams,
-                    '-c', 'copy',
-                    vid_path_target
-                ]
-                command.execute(cmd_exec)
-                files.restoring_target_filename_to_source(vid_path_target, vid_path_source)
-
-    def __get_file_encoding__(self, file: str) -> Optional[str]:
-        with open(file, 'rb') as f:
-            result = chardet.detect(f.read())
-        f.close()
-        return result['encoding']
-
-    def __get_resized_preview_image__(self, image: str):
-        f_name, f_ext = os.path.splitext(image)
-
-        img_path = os.path.join(self.movies_folder, image)
-        img = Image.open(img_path)
-
-        original_width, original_height = img.size
-        LOG.debug(f'source: {original_height}x{original_width}')
-
-        target_width = 380
-        target_heigth = int(original_height * (target_width / original_width))
-        LOG.debug(f'target: {target_heigth}x{target_width}')
-
-        resized_img = img.resize((target_width, target_heigth))
-        img_resized_filename = f'{f_name}.resized{f_ext}'
-
-        img_resized_path = os.path.join(self.movies_folder, img_resized_filename)
-        resized_img.save(img_resized_path)
-
-        img.close()
-
-        files.remove(img_path)
-
-        return img_resized_filename
-
-    def __get_background_image__(self):
-        img_bg = Image.new('RGB', (400, 600), color=(16, 16, 16))
-        img_bg_filename = 'bg.jpg'
-        img_bg_file_source = os.path.join(self.movies_folder, img_bg_filename)
-        img_bg.save(img_bg_file_source)
-        return img_bg_filename
-
-    def __get_preview_with_background__(self, preview_image, background_image):
-        preview_image_path = os.path.join(self.movies_folder, preview_image)
-        img_preview = Image.open(preview_image_path)
-
-        bg_image_path = os.path.join(self.movies_folder, background_image)
-        img_bg = Image.open(bg_image_path)
-
-        result = self.__create_combined_image__(img_preview, img_bg)
-        img_preview_filename = self.__save_combined_image__(preview_image, result)
-
-        img_preview.close()
-        img_bg.close()
-
-        files.remove(preview_image_path)
-        files.remove(bg_image_path)
-
-        return img_preview_filename
-
-    def __create_combined_image__(self, img_preview, img_bg):
-        preview_width, preview_height = img_preview.size
-        bg_width, bg_height = img_bg.size
-
-        center_x = bg_width // 2 - preview_width // 2
-        center_y = bg_height // 2 - preview_height // 2
-
-        result = Image.new('RGB', (bg_width, bg_height), color=(0, 0, 0))
-        result.paste(img_bg, (0, 0))
-        result.paste(img_preview, (center_x, center_y))
-
-        return result
-
-    def __save_combined_image__(self, preview_image, result):
-        f_name, f_ext = os.path.splitext(preview_image)
-        img_preview_filename = f'{f_name}.preview{f_ext}'
-        img_preview_path = os.path.join(self.movies_folder, img_preview_filename)
-        result.save(img_preview_path)
-
-        return img_preview_filename
-
-    def __copy_preview_image__(self, image):
-        f_name, f_ext = os.path.splitext(image)
-
-        img_path = os.path.join(self.movies_folder, image)
-        image = Image.open(img_path)
-
-        for i in range(1, self.__is_series__()+1):
-            template = f_name + '.copy.{idx:02d}' + f_ext
-            copy_filename = template.format(idx=i)
-            LOG.debug(f'{copy_filename = }')
-            copy_path = os.path.join(self.movies_folder, copy_filename)
-            image.save(copy_path)
-        image.close()
-
-        files.remove(img_path)
-
-    def __write_number__(self, image, number):
-        f_name, f_ext = os.path.splitext(image)
+            if job_queue.JOB_QUEUE.is_done(vid_path_source, constants.JOB_OPERATION_EXTRACT_SUBTITLE, job_args):
+                LOG.info('%s: already done, skipped', f)
+                continue
+
+            cmd_exec, vid_path_target = self.__get_extract_subtitle_command__(f, subtitle_streams, keep_subtitles)
+            LOG.debug('cmd_exec = %r', cmd_exec)
+            # the job stays done while the video and every subtitle it wrote are unchanged
+            output_paths = [vid_path_source, *(self.__get_subtitle_target__(f, s) for s in subtitle_streams)]
+            with job_queue.JOB_QUEUE.track(vid_path_source, constants.JOB_OPERATION_EXTRACT_SUBTITLE, job_args,
+                                           vid_path_target, output_paths):
+                with scheduler.SCHEDULER.slot(vid_path_source):
+                    command.execute(cmd_exec)
+                if vid_path_target is not None:
+                    files.restoring_target_filename_to_source(vid_path_target, vid_path_source)
+
+            if vid_path_target is not None:
+                probe_cache.PROBE_CACHE.invalidate(vid_path_source)
+        folder_index.invalidate(self.movies_folder)
+
+    def __get_preview_targets__(self, image_files: List[str], numbered: bool) -> dict:
+        # same file names and numbering as the former copy-then-number passes over the folder
+        copies_count = self.__is_series__()
+        copies = {}
+        for f in image_files:
+            f_name, f_ext = os.path.splitext(f)
+            copies[f] = [f'{f_name}.resized.preview.copy.{i:02d}{f_ext}' for i in range(1, copies_count + 1)]
 
+        if copies_count == 1 or not numbered:
+            # for one video (film) there is no need to indicate the number
+            return {f: [(copy_filename, None) for copy_filename in copy_filenames]
+                    for f, copy_filenames in copies.items()}
+
+        return self.__number_preview_copies__(copies)
+
+    def __number_preview_copies__(self, copies: dict) -> dict:
+        all_copies = sorted(
+            (copy_filename for copy_filenames in copies.values() for copy_filename in copy_filenames),
+            key=folder_index.natural_sort_key)
+        numbers = {copy_filename: idx for idx, copy_filename in enumerate(all_copies, start=1)}
+
+        targets = {}
+        for f, copy_filenames in copies.items():
+            targets[f] = []
+            for copy_filename in copy_filenames:
+                c_name, c_ext = os.path.splitext(copy_filename)
+                number = numbers[copy_filename]
+                targets[f].append((f'{c_name}-{number}{c_ext}', number))
+        return targets
+
+    def __render_preview__(self, image: str, targets: List[Tuple[str, Optional[int]]]) -> None:
         img_path = os.path.join(self.movies_folder, image)
-        img = Image.open(img_path)
-        draw = ImageDraw.Draw(img)
-        font = ImageFont.truetype('impact.ttf', size=50)
-        draw.text((0, 0), str(number), fill='yellow', font=font)
+        img_base = preview.compose(preview.load_resized(img_path))
 
-        img_target_filename = f'{f_name}-{number}{f_ext}'
-        img_target_path = os.path.join(self.movies_folder, img_target_filename)
-        img.save(img_target_path)
-
-        img.close()
+        if all(number is None for _, number in targets):
+            # identical copies: one encode, the bytes fan out to every target
+            _, f_ext = os.path.splitext(image)
+            target_paths = [os.path.join(self.movies_folder, target_filename) for target_filename, _ in targets]
+            files.fan_out(preview.encode(img_base, f_ext), target_paths, preview.use_hardlinks())
+        else:
+            for target_filename, number in targets:
+                LOG.debug('target_filename = %r', target_filename)
+                preview.render(img_base, number).save(os.path.join(self.movies_folder, target_filename))
 
         files.remove(img_path)
 
-    def preview_generate(self):
+    @tracing.traced
+    def preview_generate(self, numbered: bool = True) -> List[jobs.JobResult]:
         LOG.debug(constants.LOG_FUNCTION_START.format(name = 'PREVIEW GENERATE'))
-        for f in self.__get_image_files__():
-            LOG.debug(f'{f = }')
-            img_file_resized = self.__get_resized_preview_image__(f)
-            LOG.debug(f'{img_file_resized = }')
-            img_bg_file = self.__get_background_image__()
-            LOG.debug(f'{img_bg_file = }')
-            img_preview = self.__get_preview_with_background__(img_file_resized, img_bg_file)
-            LOG.debug(f'{img_preview = }')
-            self.__copy_preview_image__(img_preview)
-
-        if self.__is_series__() == 1:
-            # for one video (film) there is no need to indicate the number
-            return
+        image_files = self.__get_image_files__()
+        targets = self.__get_preview_targets__(image_files, numbered)
 
-        preview_idx = 1
-        for f in self.__get_image_files__():
-            LOG.debug(f'{f = }')
-            LOG.debug(f'{preview_idx = }')
-            self.__write_number__(f, preview_idx)
-            preview_idx += 1
+        # every image stays in memory from decode to its final encode
+        preview_jobs = [(f, (f, targets[f])) for f in image_files]
+        results = jobs.run(self.__render_preview__, preview_jobs, self.workers)
+        LOG.debug(constants.LOG_FUNCTION_END.format(name = 'PREVIEW GENERATE'))
+        return results
 
     def __subtitle_purification__(self, sub_path_source: str, sub_path_target: str, style_occurrences: dict):
-        with codecs.open(
-            sub_path_source, mode='r', encoding=self.__get_file_encoding__(sub_path_source)
-        ) as sub_file_source:
-            doc = ass.parse(sub_file_source)
-
-            play_res_x = doc.info.get('PlayResX', '640')
-            play_res_y = doc.info.get('PlayResY', '360')
-            script_info_dict = {
-                'WrapStyle': '0',
-                'ScaledBorderAndShadow': 'yes',
-                'Collisions': 'Normal',
-                'ScriptType': 'v4.00+',
-                'PlayResX': play_res_x,
-                'PlayResY': play_res_y,
-            }
-            doc.info = ass.ScriptInfoSection('Script Info', collections.OrderedDict(script_info_dict))
-            LOG.debug(f'{doc.info = }')
-
-            main_subtitle = ass.line.Style(
-                name='Main',
-                fontname='Arial',
-                fontsize=18.0,
-                primary_color=ass.data.Color(a=0x00, r=0xff, g=0xff, b=0xff),
-                secondary_color=ass.data.Color(a=0x00, r=0x00, g=0x00, b=0x00),
-                outline_color=ass.data.Color(a=0x00, r=0x00, g=0x00, b=0x00),
-                back_color=ass.data.Color(a=0x00, r=0x00, g=0x00, b=0x00),
-                bold=True,
-                italic=False,
-                underline=False,
-                strike_out=False,
-                scale_x=100.0,
-                scale_y=100.0,
-                spacing=0.0,
-                angle=0.0,
-                border_style=1,
-                outline=1.0,
-                shadow=0.0,
-                alignment=2,
-                margin_l=0,
-                margin_r=0,
-                margin_v=10,
-                encoding=0
-            )
-            new_styles = [main_subtitle]
-            for style in doc.styles:
-                style.fontname = 'Arial'
-                style.fontsize = 18.0
-                new_styles.append(style)
+        doc = subtitles.SUBTITLE_CACHE.take(sub_path_source).doc
+
+        play_res_x = doc.info.get('PlayResX', '640')
+        play_res_y = doc.info.get('PlayResY', '360')
+        script_info_dict = {
+            'WrapStyle': '0',
+            'ScaledBorderAndShadow': 'yes',
+            'Collisions': 'Normal',
+            'ScriptType': 'v4.00+',
+            'PlayResX': play_res_x,
+            'PlayResY': play_res_y,
+        }
+        doc.info = ass.ScriptInfoSection('Script Info', collections.OrderedDict(script_info_dict))
+        LOG.debug('doc.info = %r', doc.info)
+
+        main_subtitle = ass.line.Style(
+            name='Main',
+            fontname='Arial',
+            fontsize=18.0,
+            primary_color=ass.data.Color(a=0x00, r=0xff, g=0xff, b=0xff),
+            secondary_color=ass.data.Color(a=0x00, r=0x00, g=0x00, b=0x00),
+            outline_color=ass.data.Color(a=0x00, r=0x00, g=0x00, b=0x00),
+            back_color=ass.data.Color(a=0x00, r=0x00, g=0x00, b=0x00),
+            bold=True,
+            italic=False,
+            underline=False,
+            strike_out=False,
+            scale_x=100.0,
+            scale_y=100.0,
+            spacing=0.0,
+            angle=0.0,
+            border_style=1,
+            outline=1.0,
+            shadow=0.0,
+            alignment=2,
+            margin_l=0,
+            margin_r=0,
+            margin_v=10,
+            encoding=0
+        )
+        new_styles = [main_subtitle]
+        for style in doc.styles:
+            style.fontname = 'Arial'
+            style.fontsize = 18.0
+            new_styles.append(style)
 
-            doc.styles = ass.section.StylesSection('V4+ Styles', new_styles)
-            LOG.debug(f'{doc.styles = }')
+        doc.styles = ass.section.StylesSection('V4+ Styles', new_styles)
+        LOG.debug('doc.styles = %r', doc.styles)
 
-            frequent_style = str(next(iter(style_occurrences)))
-            LOG.debug(f'{frequent_style = }')
+        frequent_style = str(next(iter(style_occurrences)))
+        LOG.debug('frequent_style = %r', frequent_style)
 
-            for event in doc.events:
-                if event.style == frequent_style:
-                    event.style = 'Main'
+        for event in doc.events:
+            if event.style == frequent_style:
+                event.style = 'Main'
 
-            with open(sub_path_target, 'w', encoding='utf_8_sig') as sub_file_target:
-                doc.dump_file(sub_file_target)
-            sub_file_target.close()
-        sub_file_source.close()
+        with open(sub_path_target, 'w', encoding='utf_8_sig') as sub_file_target:
+            doc.dump_file(sub_file_target)
 
         files.remove(sub_path_source)
 
-    def ass_subtitle_purification(self):
+    def purify_subtitle_file(self, file: str) -> None:
+        # the purified copy is written next to `file` as .PURE
+        f_name, f_ext = os.path.splitext(file)
+        sub_path_source = os.path.join(self.movies_folder, file)
+        sub_path_target = os.path.join(self.movies_folder, f'{f_name}.PURE{f_ext}')
+        LOG.debug('sub_path_source = %r', sub_path_source)
+        LOG.debug('sub_path_target = %r', sub_path_target)
+        styles_occurrences = self.__get_styles__(file)
+        self.__subtitle_purification__(sub_path_source, sub_path_target, styles_occurrences)
+
+    @tracing.traced
+    def ass_subtitle_purification(self) -> List[jobs.JobResult]:
         LOG.debug(constants.LOG_FUNCTION_START.format(name = f'{constants.STREAM_TYPE_SUBTITLE} PURIFACATION'))
-        for f in self.__get_ass_subtitle_files__():
-            f_name, f_ext = os.path.splitext(f)
-            sub_path_source = os.path.join(self.movies_folder, f)
-            sub_path_target = os.path.join(self.movies_folder, f'{f_name}.PURE{f_ext}')
-            LOG.debug(f'{sub_path_source = }')
-            LOG.debug(f'{sub_path_target = }')
-            styles_occurrences = self.__get_styles__(f)
-            self.__subtitle_purification__(sub_path_source, sub_path_target, styles_occurrences)
+        ass_sub_files = self.__get_ass_subtitle_files__()
+        results = jobs.run_processes(self.purify_subtitle_file, [(f, (f,)) for f in ass_sub_files])
+        for f in ass_sub_files:
+            # workers parsed these files in their own processes
+            subtitles.SUBTITLE_CACHE.invalidate(os.path.join(self.movies_folder, f))
+        folder_index.invalidate(self.movies_folder)
         LOG.debug(constants.LOG_FUNCTION_END.format(name = f'{constants.STREAM_TYPE_SUBTITLE} PURIFACATION'))
+        return results
+
+    def __get_subtitle_lines__(self, sub_path_source: str) -> Tuple[List[str], subtitles.SubtitleDocument]:
+        # the parsed document goes back with the lines and on to the job that writes the translation:
+        # the file is parsed once, sending it between processes costs a fraction of that
+        document = subtitles.SUBTITLE_CACHE.take(sub_path_source)
+        return translation.get_event_lines(document.doc.events), document
+
+    def __subtitle_translation__(self, document: subtitles.SubtitleDocument, sub_path_source, sub_path_target,
+                                 translations: dict):
+        doc = document.doc
+        translation.apply_translations(doc.events, translations)
 
-    def __subtitle_translation__(self, sub_path_source, sub_path_target):
-        with codecs.open(
-            sub_path_source, mode='r', encoding=self.__get_file_encoding__(sub_path_source)
-        ) as sub_file_source:
-            doc = ass.parse(sub_file_source)
-            for event in doc.events:
-                clear_text = re.sub(r'{[^}]*}', '', event.text).strip()
-                clear_text = clear_text.replace('\\N', ' \\N ')
-                clear_text = deep_translator.GoogleTranslator(target='ru').translate(clear_text)
-
-            with open(sub_path_target, 'w', encoding='utf_8_sig') as sub_file_target:
-                doc.dump_file(sub_file_target)
-            sub_file_target.close()
-        sub_file_source.close()
+        with open(sub_path_target, 'w', encoding='utf_8_sig') as sub_file_target:
+            doc.dump_file(sub_file_target)
 
         files.remove(sub_path_source)
 
-    def ass_subtitle_translation(self):
+    def __get_translation_jobs__(self, lines_results: List[jobs.JobResult], sub_paths: dict) -> Tuple[list, dict]:
+        # the jobs that write the translations and the number of lines left untranslated in every file
+        translations = translation.translate_texts(line for result in lines_results for line in result.value[0])
+        translation_jobs = []
+        untranslated = {}
+        for result in lines_results:
+            lines, document = result.value
+            file_translations = {line: translations[line] for line in lines if line in translations}
+            translation_jobs.append((result.name, (document, *sub_paths[result.name], file_translations)))
+            untranslated[result.name] = len(set(lines) - set(file_translations))
+        return translation_jobs, untranslated
+
+    @tracing.traced
+    def ass_subtitle_translation(self) -> List[jobs.JobResult]:
         LOG.debug(constants.LOG_FUNCTION_START.format(name = f'{constants.STREAM_TYPE_SUBTITLE} TRANSLATION'))
+        sub_paths = {}
         for f in self.__get_ass_subtitle_files__():
             f_name, f_ext = os.path.splitext(f)
-            if f_ext == constants.ASS:
-                sub_path_source = os.path.join(self.movies_folder, f)
-                sub_path_target = os.path.join(self.movies_folder, f'{f_name}.translation-out{f_ext}')
-                LOG.debug(f'{sub_path_source = }')
-                LOG.debug(f'{sub_path_target = }')
-                self.__subtitle_translation__(sub_path_source, sub_path_target)
+            sub_path_source = os.path.join(self.movies_folder, f)
+            sub_path_target = os.path.join(self.movies_folder, f'{f_name}.translation-out{f_ext}')
+            LOG.debug('sub_path_source = %r', sub_path_source)
+            LOG.debug('sub_path_target = %r', sub_path_target)
+            sub_paths[f] = (sub_path_source, sub_path_target)
+
+        # lines of all episodes are collected first, so repeated lines are translated once
+        lines_results = jobs.run_processes(
+            self.__get_subtitle_lines__, [(f, (sub_path_source,)) for f, (sub_path_source, _) in sub_paths.items()])
+        translation_jobs, untranslated = self.__get_translation_jobs__(
+            [result for result in lines_results if result.succeeded], sub_paths)
+        results = jobs.run_processes(self.__subtitle_translation__, translation_jobs)
+        # the file is written with the lines that were translated, the others are left as they are
+        for i, result in enumerate(results):
+            if result.succeeded and untranslated[result.name]:
+                LOG.warning('%s: %d lines were not translated', result.name, untranslated[result.name])
+                results[i] = jobs.JobResult(result.name, f'{untranslated[result.name]} lines were not translated')
+        for sub_path_source, _ in sub_paths.values():
+            subtitles.SUBTITLE_CACHE.invalidate(sub_path_source)
+        folder_index.invalidate(self.movies_folder)
         LOG.debug(constants.LOG_FUNCTION_END.format(name = f'{constants.STREAM_TYPE_SUBTITLE} TRANSLATION'))
+        return results
+
+    def __retime_file__(self, file: str, spec: str) -> None:
+        sub_path_source = os.path.join(self.movies_folder, file)
+        sub_path_target = self.__get_temp_path__(file)
+        LOG.debug('sub_path_source = %r', sub_path_source)
+        retiming.retime_file(sub_path_source, sub_path_target, retiming.parse(spec))
+        files.restoring_target_filename_to_source(sub_path_target, sub_path_source)
+
+    @tracing.traced
+    def subtitle_retiming(self, spec: str) -> List[jobs.JobResult]:
+        LOG.debug(constants.LOG_FUNCTION_START.format(name = f'{constants.STREAM_TYPE_SUBTITLE} RETIMING'))
+        LOG.debug('spec = %r', spec)
+        # a wrong spec fails here once, not in every worker
+        retiming.parse(spec)
+        sub_files = self.__get_subtitle_files__()
+        results = jobs.run_processes(self.__retime_file__, [(f, (f, spec)) for f in sub_files])
+        for f in sub_files:
+            subtitles.SUBTITLE_CACHE.invalidate(os.path.join(self.movies_folder, f))
+        folder_index.invalidate(self.movies_folder)
+        LOG.debug(constants.LOG_FUNCTION_END.format(name = f'{constants.STREAM_TYPE_SUBTITLE} RETIMING'))
+        return results
 
     def func_in_progress(self) -> None:
         LOG.info('in progress')
@@ -16,7 +16,7 @@ def validation(input_str: str) -> bool:
 
 def recognition(input_str: str) -> List[int]:
     LOG.debug(constants.LOG_FUNCTION_START.format(name = 'notation recognition'))
-    LOG.debug(f'{input_str = }')
+    LOG.debug('input_str = %r', input_str)
 
     numbers = []
     try:
@@ -28,7 +28,7 @@ def recognition(input_str: str) -> List[int]:
             else:
                 numbers.append(int(num))
         for num in numbers:
-            LOG.debug(f'{num = }')
+            LOG.debug('num = %r', num)
     except Exception:
         LOG.exception('Error while running program')
     LOG.debug(constants.LOG_FUNCTION_END.format(name = 'notation recognition'))
@@ -0,0 +1,84 @@
+import functools
+import io
+import threading
+from typing import Optional
+
+from PIL import Image, ImageDraw, ImageFont
+
+from movie.utils.logging_config import LOG
+
+
+PREVIEW_WIDTH = 380
+BACKGROUND_SIZE = (400, 600)
+BACKGROUND_COLOR = (16, 16, 16)
+NUMBER_FONT = 'impact.ttf'
+NUMBER_FONT_SIZE = 50
+NUMBER_COLOR = 'yellow'
+RESIZE_REDUCING_GAP = 3.0
+
+# FreeType faces are not safe to render from several threads at once
+_FONT_LOCK = threading.Lock()
+
+_SETTINGS = {'hardlinks': False}
+
+
+def configure(hardlinks: bool) -> None:
+    LOG.debug('hardlinks = %r', hardlinks)
+    _SETTINGS['hardlinks'] = hardlinks
+
+
+def use_hardlinks() -> bool:
+    return _SETTINGS['hardlinks']
+
+
+@functools.lru_cache(maxsize=None)
+def get_background() -> Image.Image:
+    return Image.new('RGB', BACKGROUND_SIZE, color=BACKGROUND_COLOR)
+
+
+@functools.lru_cache(maxsize=None)
+def get_font() -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype(NUMBER_FONT, size=NUMBER_FONT_SIZE)
+
+
+def load_resized(img_path: str, target_width: int = PREVIEW_WIDTH) -> Image.Image:
+    with Image.open(img_path) as img:
+        original_width, original_height = img.size
+        LOG.debug('source: %sx%s', original_height, original_width)
+
+        target_height = int(original_height * (target_width / original_width))
+        LOG.debug('target: %sx%s', target_height, target_width)
+
+        # JPEGs are decoded straight at the smallest DCT scale that is still larger than the target
+        img.draft('RGB', (target_width, target_height))
+        return img.resize((target_width, target_height), reducing_gap=RESIZE_REDUCING_GAP)
+
+
+def compose(img_preview: Image.Image) -> Image.Image:
+    img_bg = get_background()
+    preview_width, preview_height = img_preview.size
+    bg_width, bg_height = img_bg.size
+
+    center_x = bg_width // 2 - preview_width // 2
+    center_y = bg_height // 2 - preview_height // 2
+
+    result = img_bg.copy()
+    result.paste(img_preview, (center_x, center_y))
+    return result
+
+
+def encode(img: Image.Image, extension: str) -> bytes:
+    buffer = io.BytesIO()
+    img.save(buffer, format=Image.registered_extensions()[extension.lower()])
+    return buffer.getvalue()
+
+
+def render(img_base: Image.Image, number: Optional[int]) -> Image.Image:
+    if number is None:
+        return img_base
+
+    img = img_base.copy()
+    draw = ImageDraw.Draw(img)
+    with _FONT_LOCK:
+        draw.text((0, 0), str(number), fill=NUMBER_COLOR, font=get_font())
+    return img
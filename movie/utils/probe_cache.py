@@ -0,0 +1,73 @@
+import os
+from typing import Optional
+from typing import Tuple
+
+from movie.utils import constants
+from movie.utils.logging_config import LOG
+from movie.utils import sqlite_store
+
+
+class ProbeCache(sqlite_store.SqliteStore):
+    # ffprobe output keyed by (absolute path, size, mtime_ns), kept in memory and in sqlite
+    def __init__(self, db_path: str) -> None:
+        super().__init__(db_path, (
+            'probes', 'path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, output TEXT',
+            constants.PROBE_CACHE_VERSION))
+        self._memory = {}
+
+    @staticmethod
+    def _key(path: str) -> Optional[Tuple[str, int, int]]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+    def get(self, path: str) -> Optional[str]:
+        key = self._key(path)
+        if key is None:
+            return None
+
+        with self._lock:
+            if key in self._memory:
+                return self._memory[key]
+
+            connection = self._connect()
+            if connection is None:
+                return None
+            row = connection.execute(
+                'SELECT output FROM probes WHERE path = ? AND size = ? AND mtime_ns = ?', key).fetchone()
+            if row is None:
+                return None
+            self._memory[key] = row[0]
+            return row[0]
+
+    def put(self, path: str, output: str) -> None:
+        key = self._key(path)
+        if key is None:
+            return
+
+        with self._lock:
+            self._forget(key[0])
+            self._memory[key] = output
+            connection = self._connect()
+            if connection is not None:
+                connection.execute('INSERT OR REPLACE INTO probes VALUES (?, ?, ?, ?)', (*key, output))
+                connection.commit()
+
+    def invalidate(self, path: str) -> None:
+        LOG.debug('probe cache invalidate: %s', path)
+        abs_path = os.path.abspath(path)
+        with self._lock:
+            self._forget(abs_path)
+            connection = self._connect()
+            if connection is not None:
+                connection.execute('DELETE FROM probes WHERE path = ?', (abs_path,))
+                connection.commit()
+
+    def _forget(self, abs_path: str) -> None:
+        for key in [key for key in self._memory if key[0] == abs_path]:
+            del self._memory[key]
+
+
+PROBE_CACHE = ProbeCache(constants.PROBE_CACHE_FILE)
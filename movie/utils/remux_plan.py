@@ -0,0 +1,220 @@
+import os
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Set
+
+from movie.utils import constants
+from movie.utils import jobs
+from movie.utils.logging_config import LOG
+from movie.utils import matroska
+from movie.utils.movie import Movie
+from movie.utils import stream
+
+
+EDIT_SELECT = 'select streams'
+EDIT_LANGUAGE = 'stream languages'
+EDIT_EXTRACT = 'extract subtitles'
+EDIT_NON_DEFAULT = 'remove default'
+
+
+class FilePlan:
+    # every queued edit of one file, in terms of its input streams; compiled into one remux
+    def __init__(self, streams: stream.Streams) -> None:
+        self.streams = streams
+        # input streams in output order, None: all of them, as `-map 0`
+        self.selected: Optional[List[int]] = None
+        # subtitle streams written to their own files by the same ffmpeg run -> whether the video keeps them
+        self.extracted: Dict[int, bool] = {}
+        self.languages: Dict[int, str] = {}
+        # first selected stream of each type becomes the default, the others not
+        self.auto_default = False
+        # stream types whose first output stream is not default
+        self.non_default: Set[str] = set()
+        self.edits: List[str] = []
+
+    def select(self, selected_streams: List[int]) -> None:
+        # like process_streams_to_video_files, streams the file does not have are left out
+        self.selected = [i for i in selected_streams if i in self.streams]
+        self.auto_default = True
+        self.edits.append(EDIT_SELECT)
+
+    def set_languages(self, streams_languages: Dict[int, str]) -> None:
+        self.selected = [i for i in streams_languages if i in self.streams]
+        self.languages.update(streams_languages)
+        self.auto_default = True
+        self.edits.append(EDIT_LANGUAGE)
+
+    def extract_subtitles(self, streams_index: List[int], keep_subtitles: bool = False) -> None:
+        # like extract_subtitle: the subtitle files and the video, with or without them, in one pass; a stream
+        # extracted once without keeping it leaves the video
+        for i in streams_index:
+            if self.streams.get(i, constants.STREAM_TYPE_SUBTITLE) is not None:
+                self.extracted[i] = self.extracted.get(i, True) and keep_subtitles
+        self.edits.append(EDIT_EXTRACT)
+
+    def __get_removed__(self) -> List[int]:
+        return sorted(i for i, kept in self.extracted.items() if not kept)
+
+    def remove_default(self, stream_type: str) -> None:
+        self.non_default.add(stream_type)
+        self.edits.append(EDIT_NON_DEFAULT)
+
+    def get_outputs(self) -> Dict[int, int]:
+        # input stream -> output stream index
+        removed = self.__get_removed__()
+        if self.selected is not None:
+            kept = [i for i in self.selected if i not in removed]
+            return {i: position for position, i in enumerate(kept)}
+        # `-map 0` keeps attachments too, every excluded stream before a stream moves it one place up
+        return {s.stream_index: s.stream_index - sum(1 for e in removed if e < s.stream_index)
+                for s in self.streams if s.stream_index not in removed}
+
+    def __get_dispositions__(self, outputs: Dict[int, int]) -> Dict[int, str]:
+        dispositions = {}
+        first_of_type = {}
+        for i in sorted(outputs, key=outputs.get):
+            stream_type = self.streams.get(i).stream_type
+            if stream_type not in first_of_type:
+                first_of_type[stream_type] = i
+            if self.auto_default:
+                dispositions[i] = 'default' if first_of_type[stream_type] == i else '0'
+        for stream_type in self.non_default:
+            if stream_type in first_of_type:
+                dispositions[first_of_type[stream_type]] = '0'
+        return dispositions
+
+    def get_arguments(self, subtitle_paths: Optional[Dict[int, str]] = None) -> List[str]:
+        # the arguments exec_command_for_file puts between `-c copy` and the output; the subtitle outputs
+        # come first, `subtitle_paths` maps each extracted stream to its file
+        arguments = []
+        for i in self.extracted:
+            arguments.extend(['-map', f'0:{i}', '-c:s', self.streams.get(i).codec_name, subtitle_paths[i]])
+        if self.extracted:
+            # output options apply to the next output only
+            arguments.extend(['-c', 'copy'])
+
+        outputs = self.get_outputs()
+        if self.selected is None:
+            arguments.extend(['-map', '0'])
+            for i in self.__get_removed__():
+                arguments.extend(['-map', f'-0:{i}'])
+        else:
+            for i in outputs:
+                arguments.extend(['-map', f'0:{i}'])
+
+        for i, disposition in self.__get_dispositions__(outputs).items():
+            arguments.extend([f'-disposition:{outputs[i]}', disposition])
+        for i, language in self.languages.items():
+            if i in outputs:
+                arguments.extend([f'-metadata:s:{outputs[i]}', f'language={language}'])
+        return arguments
+
+    def get_track_edits(self) -> Dict[int, matroska.TrackEdit]:
+        # the same edits as header changes, when every stream keeps its place and no subtitle is extracted
+        outputs = self.get_outputs()
+        if self.extracted or any(i != o for i, o in outputs.items()) or len(outputs) != len(self.streams):
+            return {}
+        track_edits = {}
+        for i, disposition in self.__get_dispositions__(outputs).items():
+            track_edits[i] = matroska.TrackEdit(
+                self.streams.get(i).stream_type, default=disposition == 'default', forced=False)
+        for i, language in self.languages.items():
+            if i in outputs:
+                track_edits[i] = track_edits.get(i, matroska.TrackEdit(self.streams.get(i).stream_type))._replace(
+                    language=language)
+        return track_edits
+
+
+class RemuxPlan:
+    # queued edits of the files of one folder; running the plan rewrites each file once
+    def __init__(self) -> None:
+        self.folder: Optional[str] = None
+        self._plans: Dict[str, FilePlan] = {}
+
+    def __len__(self) -> int:
+        return len(self._plans)
+
+    def get(self, movie_obj: Movie, multimedia_file: str) -> FilePlan:
+        if self.folder != movie_obj.movies_folder:
+            if self._plans:
+                LOG.warning('movies folder changed, discarding the plan for %s', self.folder)
+            self.discard()
+            self.folder = movie_obj.movies_folder
+        if multimedia_file not in self._plans:
+            movie_obj.analyze_video_file(multimedia_file)
+            self._plans[multimedia_file] = FilePlan(movie_obj.streams)
+        return self._plans[multimedia_file]
+
+    def discard(self) -> None:
+        self._plans = {}
+
+    def get_commands(self, movie_obj: Movie) -> Dict[str, List[str]]:
+        return {f: file_plan.get_arguments({i: movie_obj.__get_subtitle_target__(f, file_plan.streams.get(i))
+                                            for i in file_plan.extracted})
+                for f, file_plan in self._plans.items() if movie_obj.movies_folder == self.folder}
+
+    def get_report(self, movie_obj: Movie) -> List[dict]:
+        # a rewrite reads and writes the whole file: every edit beyond the first one is two file sizes saved
+        report = []
+        for f, arguments in self.get_commands(movie_obj).items():
+            path = os.path.join(self.folder, f)
+            size = os.path.getsize(path) if os.path.isfile(path) else 0
+            edits = self._plans[f].edits
+            report.append({
+                'file': f,
+                'edits': list(edits),
+                'command': [movie_obj.ffmpeg_path, '-i', path, '-c', 'copy', *arguments,
+                            movie_obj.__get_temp_path__(f)],
+                'bytes_saved': 2 * size * (len(edits) - 1),
+            })
+        return report
+
+    def log_dry_run(self, movie_obj: Movie) -> List[dict]:
+        report = self.get_report(movie_obj)
+        for entry in report:
+            LOG.info('%s: %s', entry['file'], ', '.join(entry['edits']))
+            LOG.info('    %s', ' '.join(entry['command']))
+        bytes_saved = sum(entry['bytes_saved'] for entry in report)
+        edits_count = sum(len(entry['edits']) for entry in report)
+        LOG.info('%d edits in %d remuxes: %.2f GiB less read and written than one rewrite per edit',
+                 edits_count, len(report), bytes_saved / 1024 ** 3)
+        return report
+
+    def run(self, movie_obj: Movie) -> List[jobs.JobResult]:
+        LOG.debug(constants.LOG_FUNCTION_START.format(name = 'RUN REMUX PLAN'))
+        remux_jobs = [(f, (f, arguments)) for f, arguments in self.get_commands(movie_obj).items()]
+        track_edits = {f: self._plans[f].get_track_edits() for f, _ in remux_jobs}
+        extracted = any(file_plan.extracted for file_plan in self._plans.values())
+        results = movie_obj.__run_remux_jobs__(remux_jobs, track_edits)
+        # the stream numbers of the rewritten files changed, new edits need a new probe; the edits of a file
+        # that failed stay planned for the next run
+        for result in results:
+            if result.succeeded:
+                self._plans.pop(result.name, None)
+        if extracted:
+            results.extend(movie_obj.subs_convert_srt_to_ass())
+        LOG.debug(constants.LOG_FUNCTION_END.format(name = 'RUN REMUX PLAN'))
+        return results
+
+
+PLAN = RemuxPlan()
+
+
+def queue_external_audio_non_default(movie_obj: Movie) -> None:
+    for audio_file in movie_obj.__get_audio_files__():
+        PLAN.get(movie_obj, audio_file).remove_default(constants.STREAM_TYPE_AUDIO)
+    LOG.info('%d files in the plan', len(PLAN))
+
+
+def dry_run(movie_obj: Movie) -> List[dict]:
+    return PLAN.log_dry_run(movie_obj)
+
+
+def run(movie_obj: Movie) -> List[jobs.JobResult]:
+    return PLAN.run(movie_obj)
+
+
+def discard(_: Movie) -> None:
+    PLAN.discard()
+    LOG.info('plan discarded')
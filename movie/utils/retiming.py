@@ -0,0 +1,136 @@
+import re
+from typing import Callable
+from typing import List
+from typing import Tuple
+
+import numpy
+import pysubs2
+
+from movie.utils import encoding
+from movie.utils.logging_config import LOG
+
+
+# a spec is operations separated by spaces, applied in order to every start and end time:
+#   +1.5, -0:00:02.300       shift
+#   *1.001                   stretch from 0
+#   23.976>25                frame rate conversion of subtitles timed for 23.976 fps to a 25 fps video
+#   0:10=0:11,20:00=20:03    piecewise linear map, source=target points, extended by the outer segments
+SPEC_EXAMPLES = ['+1.5', '-0:00:02.300', '*1.001', '23.976>25', '0:10=0:11,20:00=20:03']
+
+TIME_REGEX = r'(?:(?:\d+:)?\d+:)?\d+(?:\.\d+)?'
+SHIFT_REGEX = rf'^([+-])({TIME_REGEX})$'
+STRETCH_REGEX = r'^\*(\d+(?:\.\d+)?)$'
+FRAME_RATE_REGEX = r'^(\d+(?:\.\d+)?)>(\d+(?:\.\d+)?)$'
+POINT_REGEX = rf'^({TIME_REGEX})=({TIME_REGEX})$'
+
+Operation = Callable[[numpy.ndarray], numpy.ndarray]
+
+
+def parse_time(text: str) -> float:
+    # [[h:]m:]s[.fff] -> milliseconds
+    seconds = 0.0
+    for part in text.split(':'):
+        seconds = seconds * 60 + float(part)
+    return seconds * 1000
+
+
+def _shift(offset: float) -> Operation:
+    return lambda times: times + offset
+
+
+def _stretch(factor: float) -> Operation:
+    return lambda times: times * factor
+
+
+def _piecewise(source: numpy.ndarray, target: numpy.ndarray) -> Operation:
+    # numpy.interp holds the end values outside the points: the first and last segments are extended instead
+    if len(source) > 1:
+        first_slope = (target[1] - target[0]) / (source[1] - source[0])
+        last_slope = (target[-1] - target[-2]) / (source[-1] - source[-2])
+    else:
+        first_slope = last_slope = 1.0
+
+    def apply(times: numpy.ndarray) -> numpy.ndarray:
+        mapped = numpy.interp(times, source, target)
+        mapped = numpy.where(times < source[0], target[0] + (times - source[0]) * first_slope, mapped)
+        return numpy.where(times > source[-1], target[-1] + (times - source[-1]) * last_slope, mapped)
+    return apply
+
+
+def _parse_piecewise(token: str) -> Operation:
+    points = [re.match(POINT_REGEX, point) for point in token.split(',')]
+    if not all(points):
+        raise ValueError(f'wrong retiming "{token}", expected one of {SPEC_EXAMPLES}')
+    source = numpy.array([parse_time(point.group(1)) for point in points])
+    target = numpy.array([parse_time(point.group(2)) for point in points])
+    if numpy.any(numpy.diff(source) <= 0):
+        raise ValueError(f'wrong retiming "{token}": source times must increase')
+    return _piecewise(source, target)
+
+
+def _parse_operation(token: str) -> Operation:
+    shift = re.match(SHIFT_REGEX, token)
+    if shift:
+        return _shift(parse_time(shift.group(2)) * (-1 if shift.group(1) == '-' else 1))
+    stretch = re.match(STRETCH_REGEX, token)
+    if stretch and float(stretch.group(1)) > 0:
+        return _stretch(float(stretch.group(1)))
+    frame_rate = re.match(FRAME_RATE_REGEX, token)
+    if frame_rate and float(frame_rate.group(1)) > 0 and float(frame_rate.group(2)) > 0:
+        # the same frames shown faster: every time shrinks by the ratio of the rates
+        return _stretch(float(frame_rate.group(1)) / float(frame_rate.group(2)))
+    return _parse_piecewise(token)
+
+
+def parse(spec: str) -> List[Operation]:
+    operations = [_parse_operation(token) for token in spec.split()]
+    if not operations:
+        raise ValueError('empty retiming')
+    return operations
+
+
+def is_valid(spec: str) -> bool:
+    try:
+        parse(spec)
+    except ValueError:
+        return False
+    return True
+
+
+def clamp(starts: numpy.ndarray, ends: numpy.ndarray, original_starts: numpy.ndarray,
+          original_ends: numpy.ndarray) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    # no negative times or durations; an event that ended before the next one started still does,
+    # overlaps the file already had (signs over dialogue) are kept
+    starts = numpy.maximum(starts, 0)
+    ends = numpy.maximum(ends, starts)
+    order = numpy.argsort(original_starts, kind='stable')
+    separate = original_ends[order][:-1] <= original_starts[order][1:]
+    next_starts = starts[order][1:]
+    overlapping = separate & (ends[order][:-1] > next_starts)
+    ends[order[:-1][overlapping]] = numpy.maximum(next_starts[overlapping], starts[order[:-1][overlapping]])
+    return starts, ends
+
+
+def retime(starts: numpy.ndarray, ends: numpy.ndarray, operations: List[Operation]
+           ) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    # milliseconds in, milliseconds out; every operation runs once over all the events
+    new_starts = starts.astype(numpy.float64)
+    new_ends = ends.astype(numpy.float64)
+    for operation in operations:
+        new_starts = operation(new_starts)
+        new_ends = operation(new_ends)
+    return clamp(numpy.rint(new_starts).astype(numpy.int64), numpy.rint(new_ends).astype(numpy.int64), starts, ends)
+
+
+def retime_file(path_source: str, path_target: str, operations: List[Operation]) -> None:
+    # .ass and .srt, the format follows the extension of the target
+    text, text_encoding = encoding.read_text(path_source)
+    subs = pysubs2.SSAFile.from_string(text)
+    starts = numpy.fromiter((event.start for event in subs.events), dtype=numpy.int64, count=len(subs.events))
+    ends = numpy.fromiter((event.end for event in subs.events), dtype=numpy.int64, count=len(subs.events))
+    new_starts, new_ends = retime(starts, ends, operations)
+    for event, start, end in zip(subs.events, new_starts.tolist(), new_ends.tolist()):
+        event.start = start
+        event.end = end
+    LOG.debug('%s: %d events retimed', path_source, len(subs.events))
+    subs.save(path_target, encoding=text_encoding)
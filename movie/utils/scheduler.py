@@ -0,0 +1,135 @@
+import contextlib
+import os
+import threading
+import time
+from typing import Dict
+
+from movie.utils import constants
+from movie.utils.logging_config import LOG
+
+
+_SETTINGS = {
+    'default_limit': constants.DEVICE_DEFAULT_LIMIT,
+    'cpu_limit': os.cpu_count() or 1,
+    'limits': {},
+}
+
+
+def get_mount_point(path: str) -> str:
+    path = os.path.abspath(path)
+    while not os.path.ismount(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def get_device(path: str) -> int:
+    # files that do not exist yet (outputs) live on the device of their folder
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return os.stat(path).st_dev
+
+
+def get_cpu_limit() -> int:
+    return _SETTINGS['cpu_limit']
+
+
+def configure(default_limit: int, cpu_limit: int, limits: Dict[str, int]) -> None:
+    # `limits` maps any path on a device (usually its mount point) to the number of jobs it takes at once
+    device_limits = {}
+    for path, limit in limits.items():
+        if not os.path.exists(path):
+            LOG.warning('device limit for a missing path is ignored: %s', path)
+            continue
+        device_limits[get_device(path)] = limit
+        LOG.debug('device limit: %s = %s', get_mount_point(path), limit)
+    _SETTINGS.update(default_limit=default_limit, cpu_limit=cpu_limit, limits=device_limits)
+    SCHEDULER.reset()
+
+
+class CpuBudget:
+    # a semaphore that gives a job all of its permits at once or none, so jobs never hold part of the budget
+    # while waiting for the rest
+    def __init__(self, permits: int) -> None:
+        self.permits = permits
+        self._free = permits
+        self._condition = threading.Condition()
+
+    def acquire(self, count: int) -> None:
+        with self._condition:
+            self._condition.wait_for(lambda: self._free >= count)
+            self._free -= count
+
+    def release(self, count: int) -> None:
+        with self._condition:
+            self._free += count
+            self._condition.notify_all()
+
+
+class DeviceScheduler:
+    # jobs on one device (st_dev) share that device's slots, transcodes also take a CPU permit per thread
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._device_slots = {}
+        self._cpu_budget = None
+        # st_dev -> [mount point, bytes, seconds, jobs]
+        self._stats = {}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._device_slots = {}
+            self._cpu_budget = None
+
+    def __get_slots__(self, device: int):
+        with self._lock:
+            if device not in self._device_slots:
+                self._device_slots[device] = threading.Semaphore(
+                    _SETTINGS['limits'].get(device, _SETTINGS['default_limit']))
+            if self._cpu_budget is None:
+                self._cpu_budget = CpuBudget(_SETTINGS['cpu_limit'])
+            return self._device_slots[device], self._cpu_budget
+
+    @contextlib.contextmanager
+    def slot(self, path: str, threads: int = 0):
+        # `threads` is what the job passes to ffmpeg as -threads, 0 for a copy; a job never takes more than
+        # the whole budget. The device slot is taken first and held while waiting for the CPU, so a device
+        # never oversubscribes
+        device = get_device(path)
+        device_slots, cpu_budget = self.__get_slots__(device)
+        threads = min(threads, cpu_budget.permits)
+        with device_slots:
+            cpu_budget.acquire(threads)
+            size = os.path.getsize(path) if os.path.isfile(path) else 0
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                cpu_budget.release(threads)
+                # a failed job kept the device busy too
+                self.__record__(device, path, size, time.perf_counter() - start)
+
+    def __record__(self, device: int, path: str, size: int, seconds: float) -> None:
+        with self._lock:
+            if device not in self._stats:
+                self._stats[device] = [get_mount_point(path), 0, 0.0, 0]
+            stats = self._stats[device]
+            stats[1] += size
+            stats[2] += seconds
+            stats[3] += 1
+
+    def log_throughput(self) -> None:
+        # the totals since the last report, usually the batch that just ended; they start again from zero
+        with self._lock:
+            stats, self._stats = list(self._stats.values()), {}
+        for mount_point, size, seconds, jobs_count in stats:
+            throughput = size / seconds / 1024 ** 2 if seconds else 0.0
+            LOG.info('%s: %d jobs, %.1f MiB in %.1fs of job time, %.1f MiB/s per job',
+                     mount_point, jobs_count, size / 1024 ** 2, seconds, throughput)
+
+
+SCHEDULER = DeviceScheduler()
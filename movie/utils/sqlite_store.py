@@ -0,0 +1,51 @@
+import contextlib
+import sqlite3
+import threading
+from typing import Optional
+from typing import Tuple
+
+from movie.utils.logging_config import LOG
+
+
+def connect_versioned(db_path: str, table: str, columns: str, version: int) -> sqlite3.Connection:
+    # a table written by another schema version is dropped, its rows are only a record of earlier work
+    connection = sqlite3.connect(db_path, check_same_thread=False)
+    if connection.execute('PRAGMA user_version').fetchone()[0] != version:
+        connection.execute(f'DROP TABLE IF EXISTS {table}')
+        connection.execute(f'PRAGMA user_version = {version}')
+    connection.execute(f'CREATE TABLE IF NOT EXISTS {table} ({columns})')
+    connection.commit()
+    return connection
+
+
+class SqliteStore:
+    # one lazily opened connection shared between threads, (table, columns, version) in `schema`
+    def __init__(self, db_path: str, schema: Tuple[str, str, int]) -> None:
+        self._db_path = db_path
+        self._schema = schema
+        self._lock = threading.Lock()
+        self._connection = None
+        self._disabled = False
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._connection is not None or self._disabled:
+            return self._connection
+        table, columns, version = self._schema
+        try:
+            self._connection = connect_versioned(self._db_path, table, columns, version)
+        except sqlite3.Error:
+            LOG.exception('%s is not available, %s are kept in memory only', self._db_path, table)
+            self._disabled = True
+        return self._connection
+
+    @contextlib.contextmanager
+    def locked(self):
+        # the connection, None when sqlite is not available, used under the store's lock
+        with self._lock:
+            yield self._connect()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -1,49 +1,138 @@
-import re
+import json
+from typing import Dict
+from typing import Iterator
 from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
 
 from movie.utils import constants
 
-class Stream:
-    def __init__(self, stream_data):
-        self.index = None
-        self._codec_type = None
-        self.tags = {}
-        self.codec_name = None
-
-        for line in stream_data.strip().split('\n'):
-            if '=' in line:
-                key, value = line.split('=', 1)
-                key = key.strip()
-                value = value.strip()
-
-                if key == 'index':
-                    self.index = int(value)
-                elif key == 'codec_type':
-                    self._codec_type = str(value)
-                elif key.startswith('TAG:'):
-                    tag_key = key[4:]
-                    self.tags[tag_key] = value
-                elif key == 'codec_name':
-                    self.codec_name = value
+
+def _to_int(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_frame_rate(value) -> Optional[float]:
+    # ffprobe reports rates as fractions, '24000/1001'; '0/0' for streams without frames
+    if value in (None, '0/0'):
+        return None
+    numerator, _, denominator = str(value).partition('/')
+    numerator, denominator = _to_float(numerator), _to_float(denominator or 1)
+    if not numerator or not denominator:
+        return None
+    return numerator / denominator
+
+
+class Stream(NamedTuple):
+    # a tuple: slotted, immutable and hashable, one per media stream of a probe. Tags and disposition flags are
+    # sorted (name, value) pairs, not dicts; `stream_index` is ffprobe's index, a field named `index` would
+    # hide tuple.index
+    stream_index: Optional[int]
+    codec_type: Optional[str]
+    codec_name: Optional[str]
+    tags: Tuple[Tuple[str, str], ...]
+    disposition: Tuple[Tuple[str, int], ...]
+    duration: Optional[float]
+    bit_rate: Optional[int]
+    channels: Optional[int]
+    frame_rate: Optional[float]
+
+    @classmethod
+    def from_ffprobe(cls, stream_data: dict) -> 'Stream':
+        return cls(
+            stream_index=_to_int(stream_data.get('index')),
+            codec_type=stream_data.get('codec_type'),
+            codec_name=stream_data.get('codec_name'),
+            tags=tuple(sorted(stream_data.get('tags', {}).items())),
+            disposition=tuple(sorted((flag, _to_int(value) or 0)
+                                     for flag, value in stream_data.get('disposition', {}).items())),
+            duration=_to_float(stream_data.get('duration')),
+            bit_rate=_to_int(stream_data.get('bit_rate')),
+            channels=_to_int(stream_data.get('channels')),
+            frame_rate=(_to_frame_rate(stream_data.get('avg_frame_rate'))
+                        or _to_frame_rate(stream_data.get('r_frame_rate'))),
+        )
 
     def __repr__(self):
-        title = self.tags.get('title', f'Track {self.index}')
-        return f'{self.index}: ({self.tags.get("language")}) {title}'
+        title = self.get_tag('title') or f'Track {self.stream_index}'
+        return f'{self.stream_index}: ({self.get_tag("language")}) {title}'
+
+    def get_tag(self, name: str) -> Optional[str]:
+        return next((value for tag, value in self.tags if tag == name), None)
+
+    def has_disposition(self, flag: str) -> bool:
+        # the flags ffprobe reports: default, forced, hearing_impaired, attached_pic...
+        return any(value for name, value in self.disposition if name == flag)
+
+    @property
+    def is_default(self) -> bool:
+        return self.has_disposition('default')
+
+    @property
+    def is_forced(self) -> bool:
+        return self.has_disposition('forced')
 
     @property
     def stream_type(self):
-        return self._codec_type
+        return self.codec_type
+
 
+class Streams:
+    # media streams of one file: lookup by index and per-type lists are built once per probe
+    def __init__(self, streams: List[Stream]) -> None:
+        self._streams = streams
+        self._by_index: Dict[int, Stream] = {s.stream_index: s for s in streams}
+        self._by_type: Dict[str, List[Stream]] = {stream_type: [] for stream_type in constants.STREAM_TYPES}
+        for s in streams:
+            self._by_type[s.stream_type].append(s)
 
-def parse_ffprobe_output(output: str) -> List[Stream]:
-    stream_blocks = re.findall(constants.STREAM, output, re.DOTALL)
+    def __iter__(self) -> Iterator[Stream]:
+        return iter(self._streams)
 
-    streams = []
-    for block in stream_blocks:
-        streams.append(Stream(block))
+    def __len__(self) -> int:
+        return len(self._streams)
+
+    def __contains__(self, index: int) -> bool:
+        return index in self._by_index
+
+    def __repr__(self):
+        return repr(self._streams)
 
-    return streams
+    def get(self, index: int, stream_type: Optional[str] = None) -> Optional[Stream]:
+        found = self._by_index.get(index)
+        if found is None or (stream_type is not None and found.stream_type != stream_type):
+            return None
+        return found
+
+    def of_type(self, stream_type: str) -> List[Stream]:
+        return self._by_type.get(stream_type, [])
+
+
+def parse_ffprobe_json(output: str) -> Streams:
+    streams = [Stream.from_ffprobe(stream_data) for stream_data in json.loads(output or '{}').get('streams', [])]
+    return Streams(filter_media_streams(streams))
 
 
 def filter_media_streams(streams: List[Stream]) -> List[Stream]:
-    return [stream for stream in streams if stream.stream_type in ['video', 'audio', 'subtitle']]
+    return [stream for stream in streams if stream.stream_type in constants.STREAM_TYPES]
+
+
+def get_probe_command(ffprobe_path: str, video_path: str) -> List[str]:
+    # only the fields Stream keeps, as JSON: a fraction of the default -show_streams output
+    return [
+        ffprobe_path, '-v', 'error',
+        '-of', 'json',
+        '-show_entries', constants.FFPROBE_STREAM_ENTRIES,
+        video_path,
+    ]
@@ -0,0 +1,76 @@
+import collections
+import os
+import threading
+from typing import Optional
+
+import ass
+
+from movie.utils import constants
+from movie.utils import encoding
+from movie.utils.logging_config import LOG
+
+
+class SubtitleDocument:
+    def __init__(self, text_encoding: str, doc: ass.Document) -> None:
+        self.encoding = text_encoding
+        self.doc = doc
+        self._styles = None
+
+    @property
+    def styles(self) -> dict:
+        # style name -> number of events, most used first
+        if self._styles is None:
+            style_occurrences = collections.Counter(event.style for event in self.doc.events)
+            self._styles = dict(style_occurrences.most_common())
+        return self._styles
+
+    @property
+    def frequent_style(self) -> Optional[str]:
+        return next(iter(self.styles), None)
+
+
+class SubtitleCache:
+    # parsed .ass documents keyed by (absolute path, mtime_ns), so each file is decoded and parsed once
+    def __init__(self, max_size: int) -> None:
+        self._max_size = max_size
+        self._documents = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(path: str):
+        return os.path.abspath(path), os.stat(path).st_mtime_ns
+
+    @staticmethod
+    def _load(path: str) -> SubtitleDocument:
+        LOG.debug('parsing subtitle: %s', path)
+        text, text_encoding = encoding.read_text(path)
+        return SubtitleDocument(text_encoding, ass.parse_string(text))
+
+    def get(self, path: str) -> SubtitleDocument:
+        key = self._key(path)
+        with self._lock:
+            if key in self._documents:
+                self._documents.move_to_end(key)
+                return self._documents[key]
+
+        document = self._load(path)
+        with self._lock:
+            self._documents[key] = document
+            while len(self._documents) > self._max_size:
+                self._documents.popitem(last=False)
+        return document
+
+    def take(self, path: str) -> SubtitleDocument:
+        # for callers that modify the document: it leaves the cache, so later readers parse the file again
+        document = self.get(path)
+        self.invalidate(path)
+        return document
+
+    def invalidate(self, path: str) -> None:
+        abs_path = os.path.abspath(path)
+        with self._lock:
+            for key in [key for key in self._documents if key[0] == abs_path]:
+                del self._documents[key]
+
+
+SUBTITLE_CACHE = SubtitleCache(constants.SUBTITLE_CACHE_SIZE)
@@ -0,0 +1,214 @@
+import atexit
+import collections
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from movie.utils.logging_config import LOG
+
+
+CATEGORY_OPERATION = 'operation'
+CATEGORY_FILE = 'file'
+CATEGORY_COMMAND = 'command'
+
+_SETTINGS = {'enabled': False, 'trace_file': ''}
+
+# the innermost open span; thread pools that should nest their spans run the jobs in a copy of the context
+_CURRENT: contextvars.ContextVar = contextvars.ContextVar('span', default=None)
+
+
+def _get_thread_io() -> Tuple[int, int]:
+    # bytes the calling thread passed through read/write calls (Linux only, zeros elsewhere)
+    try:
+        with open('/proc/thread-self/io', encoding='ascii') as io_file:
+            counters = dict(line.split(': ') for line in io_file.read().splitlines())
+    except (OSError, ValueError):
+        return 0, 0
+    return int(counters.get('rchar', 0)), int(counters.get('wchar', 0))
+
+
+def _get_children_cpu() -> float:
+    # CPU time of finished subprocesses, process-wide: exact while one job runs at a time
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _get_counters() -> Tuple[float, float, float, int, int]:
+    return (time.perf_counter(), time.thread_time(), _get_children_cpu(), *_get_thread_io())
+
+
+class SpanRecord(NamedTuple):
+    name: str
+    category: str
+    thread: int
+    start: float
+    wall: float
+    cpu: float
+    children_cpu: float
+    bytes_read: int
+    bytes_written: int
+
+
+class Span:
+    # an open span; what it measures on its own thread comes from counter deltas, what ran
+    # elsewhere (child spans on other threads, subprocess files) is collected into `_extra`
+    def __init__(self, name: str, category: str, parent: Optional['Span']) -> None:
+        self.name = name
+        self.category = category
+        self.parent = parent
+        self.thread = threading.get_ident()
+        self._start = _get_counters()
+        # cpu, bytes read, bytes written
+        self._extra = [0.0, 0, 0]
+
+    def add(self, cpu: float = 0.0, bytes_read: int = 0, bytes_written: int = 0) -> None:
+        with TRACER.lock:
+            self._extra[0] += cpu
+            self._extra[1] += bytes_read
+            self._extra[2] += bytes_written
+
+    def finish(self) -> SpanRecord:
+        end = _get_counters()
+        wall, cpu, children_cpu, bytes_read, bytes_written = (e - s for s, e in zip(self._start, end))
+        with TRACER.lock:
+            extra_cpu, extra_read, extra_written = self._extra
+        record = SpanRecord(self.name, self.category, self.thread, self._start[0], wall, cpu + extra_cpu,
+                            children_cpu, bytes_read + extra_read, bytes_written + extra_written)
+
+        if self.parent is not None:
+            if self.parent.thread == self.thread:
+                # the parent's own counters already saw this thread's work
+                self.parent.add(extra_cpu, extra_read, extra_written)
+            else:
+                self.parent.add(record.cpu, record.bytes_read, record.bytes_written)
+        return record
+
+
+class Tracer:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self._records: List[SpanRecord] = []
+        self._origin = time.perf_counter()
+
+    def reset(self) -> None:
+        with self.lock:
+            self._records = []
+            self._origin = time.perf_counter()
+
+    def add_record(self, record: SpanRecord) -> None:
+        with self.lock:
+            self._records.append(record)
+
+    def get_records(self) -> List[SpanRecord]:
+        with self.lock:
+            return list(self._records)
+
+    def get_chrome_trace(self) -> dict:
+        # complete ("X") events in microseconds, one row per thread in chrome://tracing and Perfetto
+        pid = os.getpid()
+        records = self.get_records()
+        events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': thread, 'args': {'name': f'thread {i}'}}
+                  for i, thread in enumerate(dict.fromkeys(r.thread for r in records))]
+        for r in records:
+            events.append({
+                'name': r.name, 'cat': r.category, 'ph': 'X', 'pid': pid, 'tid': r.thread,
+                'ts': round((r.start - self._origin) * 1e6, 1), 'dur': round(r.wall * 1e6, 1),
+                'args': {'cpu_ms': round(r.cpu * 1e3, 3), 'children_cpu_ms': round(r.children_cpu * 1e3, 3),
+                         'bytes_read': r.bytes_read, 'bytes_written': r.bytes_written},
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_chrome_trace(self, trace_path: str) -> None:
+        with open(trace_path, 'w', encoding='utf-8') as trace_file:
+            json.dump(self.get_chrome_trace(), trace_file)
+        LOG.info('trace written: %s', trace_path)
+
+    def get_summary(self) -> List[dict]:
+        # one row per (category, name), the slowest first
+        rows: Dict[Tuple[str, str], dict] = collections.OrderedDict()
+        for r in self.get_records():
+            row = rows.setdefault((r.category, r.name), {
+                'category': r.category, 'name': r.name, 'count': 0, 'wall': 0.0, 'cpu': 0.0,
+                'children_cpu': 0.0, 'bytes_read': 0, 'bytes_written': 0})
+            row['count'] += 1
+            for field in ('wall', 'cpu', 'children_cpu', 'bytes_read', 'bytes_written'):
+                row[field] += getattr(r, field)
+        return sorted(rows.values(), key=lambda row: row['wall'], reverse=True)
+
+    def log_summary(self) -> None:
+        LOG.info('%-48s %6s %9s %9s %9s %9s %9s',
+                 'span', 'count', 'wall s', 'cpu s', 'child s', 'read MiB', 'write MiB')
+        for row in self.get_summary():
+            LOG.info('%-48s %6d %9.2f %9.2f %9.2f %9.1f %9.1f', row['category'] + ': ' + row['name'], row['count'],
+                     row['wall'], row['cpu'], row['children_cpu'], row['bytes_read'] / 1024 ** 2,
+                     row['bytes_written'] / 1024 ** 2)
+
+
+TRACER = Tracer()
+
+
+def is_enabled() -> bool:
+    return _SETTINGS['enabled']
+
+
+def _write_session() -> None:
+    if _SETTINGS['enabled'] and _SETTINGS['trace_file'] and TRACER.get_records():
+        TRACER.log_summary()
+        TRACER.write_chrome_trace(_SETTINGS['trace_file'])
+
+
+def configure(trace_file: str) -> None:
+    # an empty trace file turns tracing off; the session is written when the program exits
+    LOG.debug('trace_file = %r', trace_file)
+    if trace_file and not _SETTINGS['trace_file']:
+        atexit.register(_write_session)
+    _SETTINGS.update(enabled=bool(trace_file), trace_file=trace_file)
+
+
+@contextlib.contextmanager
+def span(name: str, category: str = CATEGORY_OPERATION):
+    if not _SETTINGS['enabled']:
+        yield None
+        return
+    current = Span(name, category, _CURRENT.get())
+    token = _CURRENT.set(current)
+    try:
+        yield current
+    finally:
+        _CURRENT.reset(token)
+        TRACER.add_record(current.finish())
+
+
+def traced(function: Callable) -> Callable:
+    # a span named after the method for every call
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not _SETTINGS['enabled']:
+            return function(*args, **kwargs)
+        with span(function.__name__):
+            return function(*args, **kwargs)
+    return wrapper
+
+
+def add_io(bytes_read: int, bytes_written: int) -> None:
+    # files a subprocess read and wrote: invisible to the counters of this process
+    current = _CURRENT.get()
+    if current is not None:
+        current.add(bytes_read=bytes_read, bytes_written=bytes_written)
@@ -0,0 +1,207 @@
+import concurrent.futures
+import re
+import threading
+import time
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Tuple
+
+import deep_translator
+
+from movie.utils import constants
+from movie.utils.logging_config import LOG
+from movie.utils import sqlite_store
+
+
+_SETTINGS = {
+    'backend': constants.TRANSLATION_BACKEND_GOOGLE,
+    'target': constants.TRANSLATION_TARGET_LANGUAGE,
+    'batch_chars': constants.TRANSLATION_BATCH_CHARS,
+    'workers': constants.TRANSLATION_WORKERS,
+    'requests_per_second': constants.TRANSLATION_REQUESTS_PER_SECOND,
+}
+
+LEADING_TAGS_REGEX = r'^(?:{[^}]*})*'
+DRAWING_REGEX = r'{[^}]*\\p[1-9][^}]*}'
+INLINE_TAGS_SPLIT_REGEX = f'({constants.SUBTITLE_TAGS_REGEX})'
+
+
+def configure(**settings) -> None:
+    LOG.debug('settings = %r', settings)
+    _SETTINGS.update(settings)
+
+
+def google_backend(texts: List[str], target: str, wait: Callable[[], None]) -> List[str]:
+    # every request waits for the rate limiter, the line by line retry too
+    translator = deep_translator.GoogleTranslator(source='auto', target=target)
+    wait()
+    translated = translator.translate('\n'.join(texts)).split('\n')
+    if len(translated) == len(texts):
+        return [line.strip() for line in translated]
+
+    # the service merged or split lines, the batch can not be mapped back line by line
+    LOG.debug('batch of %d lines came back as %d, translating one by one', len(texts), len(translated))
+    lines = []
+    for text in texts:
+        wait()
+        lines.append(translator.translate(text))
+    return lines
+
+
+def local_backend(texts: List[str], target: str, wait: Callable[[], None]) -> List[str]:
+    # offline stand-in for testing and benchmarks
+    wait()
+    time.sleep(constants.TRANSLATION_LOCAL_BACKEND_LATENCY)
+    return [f'[{target}] {text}' for text in texts]
+
+
+BACKENDS: Dict[str, Callable[[List[str], str, Callable[[], None]], List[str]]] = {
+    constants.TRANSLATION_BACKEND_GOOGLE: google_backend,
+    constants.TRANSLATION_BACKEND_LOCAL: local_backend,
+}
+
+
+class TranslationMemory(sqlite_store.SqliteStore):
+    # translations keyed by (source text, target language), kept in memory and in sqlite
+    def __init__(self, db_path: str) -> None:
+        super().__init__(db_path, (
+            'memory', 'source TEXT, target TEXT, translation TEXT, PRIMARY KEY (source, target)',
+            constants.TRANSLATION_MEMORY_VERSION))
+        self._memory: Dict[Tuple[str, str], str] = {}
+
+    def get_many(self, texts: Iterable[str], target: str) -> Dict[str, str]:
+        found = {}
+        with self.locked() as connection:
+            for text in texts:
+                if (text, target) not in self._memory and connection is not None:
+                    row = connection.execute(
+                        'SELECT translation FROM memory WHERE source = ? AND target = ?', (text, target)).fetchone()
+                    if row is not None:
+                        self._memory[(text, target)] = row[0]
+                if (text, target) in self._memory:
+                    found[text] = self._memory[(text, target)]
+        return found
+
+    def put_many(self, translations: Dict[str, str], target: str) -> None:
+        with self.locked() as connection:
+            self._memory.update(((source, target), translation) for source, translation in translations.items())
+            if connection is not None:
+                connection.executemany(
+                    'INSERT OR REPLACE INTO memory VALUES (?, ?, ?)',
+                    [(source, target, translation) for source, translation in translations.items()])
+                connection.commit()
+
+
+MEMORY = TranslationMemory(constants.TRANSLATION_MEMORY_FILE)
+
+
+def _get_rate_limiter(requests_per_second: float) -> Callable[[], None]:
+    interval = 1 / requests_per_second if requests_per_second > 0 else 0
+    lock = threading.Lock()
+    next_start = [time.monotonic()]
+
+    def wait() -> None:
+        with lock:
+            now = time.monotonic()
+            delay = next_start[0] - now
+            next_start[0] = max(now, next_start[0]) + interval
+        if delay > 0:
+            time.sleep(delay)
+    return wait
+
+
+def _get_batches(texts: List[str], batch_chars: int) -> List[List[str]]:
+    batches = []
+    batch = []
+    batch_size = 0
+    for text in texts:
+        if batch and batch_size + len(text) + 1 > batch_chars:
+            batches.append(batch)
+            batch = []
+            batch_size = 0
+        batch.append(text)
+        batch_size += len(text) + 1
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def translate_texts(texts: Iterable[str]) -> Dict[str, str]:
+    # the lines of a failed batch are missing from the result, the other batches are kept
+    target = _SETTINGS['target']
+    backend = BACKENDS[_SETTINGS['backend']]
+
+    unique_texts = list(dict.fromkeys(texts))
+    translations = MEMORY.get_many(unique_texts, target)
+    missing = [text for text in unique_texts if text not in translations]
+    LOG.info('lines: %d unique, %d from memory, %d to translate', len(unique_texts), len(translations), len(missing))
+
+    batches = _get_batches(missing, _SETTINGS['batch_chars'])
+    wait = _get_rate_limiter(_SETTINGS['requests_per_second'])
+
+    def translate_batch(batch: List[str]) -> Dict[str, str]:
+        try:
+            return dict(zip(batch, backend(batch, target, wait)))
+        except Exception:
+            LOG.exception('batch of %d lines was not translated', len(batch))
+            return {}
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, _SETTINGS['workers'])) as executor:
+        for translated in executor.map(translate_batch, batches):
+            MEMORY.put_many(translated, target)
+            translations.update(translated)
+
+    failed = len(unique_texts) - len(translations)
+    if failed:
+        LOG.error('%d of %d lines were not translated', failed, len(unique_texts))
+    return translations
+
+
+def split_event_text(text: str) -> Tuple[str, List[str]]:
+    # leading override tags are kept as they are, the rest is split into lines
+    prefix = re.match(LEADING_TAGS_REGEX, text).group(0)
+    return prefix, text[len(prefix):].split('\\N')
+
+
+def split_line(line: str) -> List[str]:
+    # text and inline override tags alternating, text first: only the text pieces are translated
+    return re.split(INLINE_TAGS_SPLIT_REGEX, line)
+
+
+def _translate_piece(piece: str, translations: Dict[str, str]) -> str:
+    # the spaces around the text stay next to the tags they separate
+    text = piece.strip()
+    if not text:
+        return piece
+    leading = piece[:len(piece) - len(piece.lstrip())]
+    trailing = piece[len(piece.rstrip()):]
+    return leading + translations.get(text, text) + trailing
+
+
+def get_translatable_events(events) -> list:
+    return [
+        event for event in events
+        if event.TYPE == 'Dialogue' and not re.search(DRAWING_REGEX, event.text)
+    ]
+
+
+def get_event_lines(events) -> List[str]:
+    lines = []
+    for event in get_translatable_events(events):
+        _, event_lines = split_event_text(event.text)
+        for line in event_lines:
+            lines.extend(piece.strip() for piece in split_line(line)[::2] if piece.strip())
+    return lines
+
+
+def apply_translations(events, translations: Dict[str, str]) -> None:
+    for event in get_translatable_events(events):
+        prefix, event_lines = split_event_text(event.text)
+        translated_lines = []
+        for line in event_lines:
+            pieces = split_line(line)
+            pieces[::2] = [_translate_piece(piece, translations) for piece in pieces[::2]]
+            translated_lines.append(''.join(pieces))
+        event.text = prefix + '\\N'.join(translated_lines)
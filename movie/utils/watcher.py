@@ -0,0 +1,148 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+from movie.utils import constants
+from movie.utils.logging_config import LOG
+
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+# struct inotify_event: int wd; uint32_t mask, cookie, len; char name[len]
+_EVENT_HEADER = struct.Struct('iIII')
+_READ_SIZE = 64 * 1024
+
+
+def _scan(folders: List[str]) -> Dict[str, Tuple[int, int]]:
+    snapshot = {}
+    for folder in folders:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    stat = entry.stat()
+                    snapshot[entry.path] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+class InotifyWatcher:
+    # Linux only: the kernel reports created, moved-in and closed-after-write files
+    def __init__(self, folders: List[str]) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+        self._folders = {}
+        for folder in folders:
+            watch = libc.inotify_add_watch(self._fd, os.fsencode(folder), WATCH_MASK)
+            if watch < 0:
+                os.close(self._fd)
+                raise OSError(ctypes.get_errno(), f'inotify_add_watch failed: {folder}')
+            self._folders[watch] = folder
+        self._rescan = False
+
+    def poll(self, timeout: float) -> List[str]:
+        if self._rescan:
+            # events were dropped by the kernel: every file is a candidate again
+            self._rescan = False
+            return list(_scan(list(self._folders.values())))
+
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self._fd, _READ_SIZE)
+        except BlockingIOError:
+            return []
+
+        paths = []
+        offset = 0
+        while offset < len(data):
+            watch, mask, _, name_size = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + name_size].rstrip(b'\0')
+            offset += name_size
+            if mask & IN_Q_OVERFLOW:
+                LOG.warning('inotify queue overflow, rescanning folders')
+                self._rescan = True
+            elif name and not mask & IN_ISDIR and watch in self._folders:
+                paths.append(os.path.join(self._folders[watch], os.fsdecode(name)))
+        return paths
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    # portable fallback: compares (size, mtime_ns) snapshots of the folders
+    def __init__(self, folders: List[str]) -> None:
+        self._folders = folders
+        self._snapshot = _scan(folders)
+
+    def poll(self, timeout: float) -> List[str]:
+        time.sleep(timeout)
+        snapshot = _scan(self._folders)
+        paths = [path for path, state in snapshot.items() if self._snapshot.get(path) != state]
+        self._snapshot = snapshot
+        return paths
+
+    def close(self) -> None:
+        self._snapshot = {}
+
+
+def create_watcher(folders: List[str], kind: str = constants.DAEMON_WATCHER_AUTO):
+    if kind == constants.DAEMON_WATCHER_POLLING:
+        return PollingWatcher(folders)
+    if kind == constants.DAEMON_WATCHER_AUTO and not sys.platform.startswith('linux'):
+        return PollingWatcher(folders)
+
+    try:
+        return InotifyWatcher(folders)
+    except (OSError, AttributeError) as exc:
+        if kind == constants.DAEMON_WATCHER_INOTIFY:
+            raise
+        LOG.warning('inotify is not available (%s), polling folders instead', exc)
+        return PollingWatcher(folders)
+
+
+class SettleTracker:
+    # a file is ready once its size has not changed for `settle_seconds`
+    def __init__(self, settle_seconds: float, clock=time.monotonic) -> None:
+        self._settle_seconds = settle_seconds
+        self._clock = clock
+        self._pending = {}
+
+    def track(self, path: str) -> None:
+        self._pending.setdefault(path, (None, self._clock()))
+
+    def pop_settled(self) -> List[str]:
+        settled = []
+        now = self._clock()
+        for path, (last_size, since) in list(self._pending.items()):
+            try:
+                size = os.stat(path).st_size
+            except OSError:
+                # removed or renamed away while being written
+                del self._pending[path]
+                continue
+
+            if size != last_size:
+                self._pending[path] = (size, now)
+            elif now - since >= self._settle_seconds:
+                del self._pending[path]
+                settled.append(path)
+        return settled
@@ -0,0 +1,101 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from movie.utils import job_queue
+from movie.utils import probe_cache
+
+
+# ffprobe prints the same streams for every file: video 0, audio 1, an ass subtitle 2
+STREAMS = [
+    {'index': 0, 'codec_name': 'h264', 'codec_type': 'video', 'disposition': {'default': 1}},
+    {'index': 1, 'codec_name': 'aac', 'codec_type': 'audio', 'tags': {'language': 'jpn'}},
+    {'index': 2, 'codec_name': 'ass', 'codec_type': 'subtitle', 'tags': {'language': 'eng', 'title': 'Full'}},
+]
+
+FFPROBE = '''
+import json
+import sys
+
+print(json.dumps({{'streams': {streams!r}}}))
+'''
+
+# every call is appended to `calls` as JSON: the arguments and the size of the input when ffmpeg read it
+FFMPEG = '''
+import json
+import os
+import shutil
+import sys
+
+args = sys.argv[1:]
+source = args[args.index('-i') + 1]
+with open({calls!r}, 'a', encoding='utf-8') as calls_file:
+    calls_file.write(json.dumps({{'args': args, 'input_size': os.path.getsize(source)}}) + '\\n')
+if {fail!r}:
+    sys.exit(1)
+for output in args[1:]:
+    if output.endswith('.ass'):
+        with open(output, 'w', encoding='utf-8') as subtitle_file:
+            subtitle_file.write({ass!r})
+if args[-1] != source and not args[-1].endswith('.ass'):
+    shutil.copyfile(source, args[-1])
+'''
+
+ASS = '''[Script Info]
+ScriptType: v4.00+
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, \
+Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, \
+MarginV, Encoding
+Style: Default,Arial,20,&H00FFFFFF,&H000000FF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,2,2,2,10,10,10,1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+Dialogue: 0,0:00:01.00,0:00:02.00,Default,,0,0,0,,Hello
+'''
+
+
+def _write_script(path: str, source: str) -> str:
+    with open(path, 'w', encoding='utf-8') as script_file:
+        script_file.write(f'#!{sys.executable}\n{source}')
+    os.chmod(path, 0o755)
+    return path
+
+
+def write_tools(folder: str, fail: bool = False) -> tuple:
+    # (ffmpeg path, ffprobe path, calls path); a failing ffmpeg records the call and exits with 1
+    calls = os.path.join(folder, 'ffmpeg_calls.jsonl')
+    ffmpeg = _write_script(os.path.join(folder, 'ffmpeg'), FFMPEG.format(calls=calls, fail=fail, ass=ASS))
+    ffprobe = _write_script(os.path.join(folder, 'ffprobe'), FFPROBE.format(streams=STREAMS))
+    return ffmpeg, ffprobe, calls
+
+
+def read_calls(calls: str) -> list:
+    if not os.path.exists(calls):
+        return []
+    with open(calls, encoding='utf-8') as calls_file:
+        return [json.loads(line) for line in calls_file]
+
+
+@unittest.skipIf(os.name == 'nt', 'the stub tools are scripts with a shebang')
+class StubToolsTestCase(unittest.TestCase):
+    # `folder` is an empty movies folder; the tools, the job queue and the probe cache of the test live next to it
+    def setUp(self) -> None:
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.folder = os.path.join(tmp_dir, 'library')
+        os.makedirs(self.folder)
+        self.ffmpeg, self.ffprobe, self.calls = write_tools(tmp_dir)
+
+        for module, name, store in [
+                (job_queue, 'JOB_QUEUE', job_queue.JobQueue(os.path.join(tmp_dir, 'jobs.sqlite'))),
+                (probe_cache, 'PROBE_CACHE', probe_cache.ProbeCache(os.path.join(tmp_dir, 'probes.sqlite')))]:
+            patcher = mock.patch.object(module, name, store)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+            self.addCleanup(store.close)
@@ -0,0 +1,128 @@
+import concurrent.futures
+import os
+import unittest
+
+from movie.utils import constants
+from movie.utils import daemon
+from movie.utils import watcher
+from movie.utils.movie import Movie
+from tests import stub_tools
+
+
+SETTLE_SECONDS = 5
+
+
+class FakeWatcher:
+    # reports the paths the test announces, one batch per poll
+    def __init__(self) -> None:
+        self.events = []
+        self.closed = False
+
+    def announce(self, *paths: str) -> None:
+        self.events.extend(paths)
+
+    def poll(self, _: float) -> list:
+        events, self.events = self.events, []
+        return events
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class DaemonTest(stub_tools.StubToolsTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+
+        # the settle time passes only when a step moves the clock
+        self.now = 0.0
+        self.watcher = FakeWatcher()
+        self.movie = Movie(self.ffmpeg, self.ffprobe, self.folder, '')
+        self.daemon = daemon.Daemon(
+            [self.movie],
+            [constants.DAEMON_OPERATION_EXTRACT_SUBTITLE],
+            self.watcher,
+            watcher.SettleTracker(SETTLE_SECONDS, clock=lambda: self.now),
+        )
+        self.addCleanup(self.__stop_daemon__)
+
+    def __stop_daemon__(self) -> None:
+        self.daemon.stop()
+        self.daemon.serve_forever()
+
+    def __write__(self, file: str, data: bytes, mode: str = 'wb') -> str:
+        path = os.path.join(self.folder, file)
+        with open(path, mode) as media_file:
+            media_file.write(data)
+        return path
+
+    def __step__(self, seconds: float = 0) -> int:
+        # the clock moves first, the jobs the step submitted are waited for; returns their number
+        self.now += seconds
+        futures = self.daemon.step(0)
+        for future in concurrent.futures.as_completed(futures):
+            future.result()
+        return len(futures)
+
+    def test_processes_a_settled_file_once(self):
+        path = self.__write__('episode.mkv', b'video')
+        self.watcher.announce(path)
+
+        self.assertEqual(self.__step__(), 0)
+        self.assertEqual(self.__step__(SETTLE_SECONDS - 1), 0)
+        self.assertEqual(self.__step__(1), 1)
+
+        self.assertEqual(len(stub_tools.read_calls(self.calls)), 1)
+        self.assertTrue(os.path.isfile(os.path.join(self.folder, 'episode.2.ass')))
+
+    def test_waits_for_a_file_being_copied_in(self):
+        path = self.__write__('episode.mkv', b'x' * 1000)
+        self.watcher.announce(path)
+        self.assertEqual(self.__step__(), 0)
+
+        # the copy goes on while the daemon runs: every new size restarts the settle time
+        for _ in range(3):
+            self.__write__('episode.mkv', b'x' * 1000, 'ab')
+            self.watcher.announce(path)
+            self.assertEqual(self.__step__(SETTLE_SECONDS), 0)
+        self.assertEqual(stub_tools.read_calls(self.calls), [])
+
+        self.assertEqual(self.__step__(SETTLE_SECONDS), 1)
+        calls = stub_tools.read_calls(self.calls)
+        self.assertEqual([call['input_size'] for call in calls], [4000])
+
+    def test_own_outputs_are_not_processed_again(self):
+        path = self.__write__('episode.mkv', b'video')
+        self.watcher.announce(path)
+        self.__step__()
+        self.assertEqual(self.__step__(SETTLE_SECONDS), 1)
+
+        # the subtitle it wrote is ignored, the unchanged video is tracked but not processed again
+        self.watcher.announce(path, os.path.join(self.folder, 'episode.2.ass'))
+        self.__step__()
+        self.assertEqual(self.__step__(SETTLE_SECONDS), 1)
+        self.assertEqual(len(stub_tools.read_calls(self.calls)), 1)
+
+    def test_a_file_removed_before_it_settles_is_dropped(self):
+        path = self.__write__('episode.mkv', b'video')
+        self.watcher.announce(path)
+        self.__step__()
+        os.remove(path)
+
+        self.assertEqual(self.__step__(SETTLE_SECONDS), 0)
+        self.assertEqual(stub_tools.read_calls(self.calls), [])
+
+    def test_temp_files_are_ignored(self):
+        path = self.movie.__get_temp_path__('episode.mkv')
+        self.__write__(os.path.basename(path), b'video')
+        self.watcher.announce(path)
+
+        self.assertEqual(self.__step__(), 0)
+        self.assertEqual(self.__step__(SETTLE_SECONDS), 0)
+
+    def test_stop_closes_the_watcher(self):
+        self.__stop_daemon__()
+        self.assertTrue(self.watcher.closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
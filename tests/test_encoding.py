@@ -0,0 +1,58 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from movie.utils import constants
+from movie.utils import encoding
+
+
+def _get_detector(encoding_name: str, fed: list) -> type:
+    # a chardet that is sure after the first chunk
+    class Detector:
+        done = False
+        result = {'encoding': encoding_name}
+
+        def feed(self, chunk: bytes) -> None:
+            fed.append(len(chunk))
+            self.done = True
+
+        def close(self) -> None:
+            pass
+    return Detector
+
+
+class ReadTextTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+
+    def __write__(self, data: bytes) -> str:
+        path = os.path.join(self.folder, f'episode {len(os.listdir(self.folder)):02d}.srt')
+        with open(path, 'wb') as sub_file:
+            sub_file.write(data)
+        return path
+
+    def test_bom_and_utf8(self):
+        text = 'Привет\r\n' * 20000
+        self.assertEqual(encoding.read_text(self.__write__(text.encode('utf-16'))), (text, 'utf-16'))
+        self.assertEqual(encoding.read_text(self.__write__(text.encode('utf-8'))), (text, 'utf-8'))
+
+    def test_detection_stops_when_chardet_is_sure(self):
+        text = 'Съешь же ещё этих мягких французских булок, да выпей чаю.\n' * 5000
+        path = self.__write__(text.encode('cp1251'))
+        fed = []
+        with mock.patch.object(encoding, 'UniversalDetector', _get_detector('windows-1251', fed)):
+            self.assertEqual(encoding.read_text(path), (text, 'windows-1251'))
+        self.assertEqual(fed, [constants.ENCODING_DETECTION_CHUNK])
+
+    def test_encoding_without_a_codec_falls_back(self):
+        text = 'Привет\n' * 10
+        path = self.__write__(text.encode('cp1251'))
+        with mock.patch.object(encoding, 'UniversalDetector', _get_detector('EUC-TW', [])):
+            self.assertEqual(encoding.read_text(path), (text, constants.ENCODING_FALLBACK))
+
+
+if __name__ == '__main__':
+    unittest.main()
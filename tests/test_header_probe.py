@@ -0,0 +1,134 @@
+import json
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+from typing import List
+
+from movie.utils import header_probe
+from movie.utils import matroska
+from movie.utils import stream
+
+
+def _box(box_type: bytes, *children: bytes) -> bytes:
+    data = b''.join(children)
+    return struct.pack('>I4s', 8 + len(data), box_type) + data
+
+
+def _full_box(box_type: bytes, *children: bytes) -> bytes:
+    # version 0, no flags
+    return _box(box_type, bytes(4), *children)
+
+
+def _esds(flags: int, optional: bytes, object_type: int) -> bytes:
+    decoder_config = bytes([0x04, 13, object_type]) + bytes(12)
+    es_descriptor = b'\x00\x01' + bytes([flags]) + optional + decoder_config
+    return _full_box(b'esds', bytes([0x03, len(es_descriptor)]), es_descriptor)
+
+
+def _mp4a(esds: bytes) -> bytes:
+    # reserved and data reference index, then version, vendor, 2 channels and the rest of the audio fields
+    return _box(b'mp4a', bytes(6), b'\x00\x01', bytes(8), b'\x00\x02', bytes(10), esds)
+
+
+def _trak(handler: bytes, timescale: int, stsd: bytes, stts: bytes = b'') -> bytes:
+    tkhd = _box(b'tkhd', b'\x00\x00\x00\x01', bytes(80))
+    mdhd = _full_box(b'mdhd', bytes(8), struct.pack('>IIHH', timescale, timescale * 10, 0x15C7, 0))
+    hdlr = _full_box(b'hdlr', bytes(4), handler, bytes(12), b'Handler\x00')
+    stbl = _box(b'stbl', stsd, stts)
+    return _box(b'trak', tkhd, _box(b'mdia', mdhd, hdlr, _box(b'minf', stbl)))
+
+
+def _stsd(*entries: bytes) -> bytes:
+    return _full_box(b'stsd', struct.pack('>I', len(entries)), *entries)
+
+
+def _stts(*entries: tuple) -> bytes:
+    return _full_box(b'stts', struct.pack('>I', len(entries)), *(struct.pack('>II', *e) for e in entries))
+
+
+class IsoMediaProbeTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+
+    def __probe__(self, *traks: bytes) -> List[dict]:
+        path = os.path.join(self.folder, 'episode.mp4')
+        with open(path, 'wb') as media_file:
+            media_file.write(_box(b'ftyp', b'isom', bytes(4)) + _box(b'moov', *traks))
+        return json.loads(header_probe.probe(path))['streams']
+
+    def test_url_after_depends_on_es_id(self):
+        # streamDependenceFlag and URL_Flag: the URL length follows the 2 bytes of dependsOn_ES_ID
+        esds = _esds(0xC0, b'\x00\x07' + b'\x02ab', 0x6B)
+        streams = self.__probe__(_trak(b'soun', 48000, _stsd(_mp4a(esds))))
+        self.assertEqual(streams[0]['codec_name'], 'mp3')
+        self.assertEqual(streams[0]['channels'], 2)
+        self.assertEqual(streams[0]['tags']['language'], 'eng')
+
+    def test_aac_without_optional_fields(self):
+        streams = self.__probe__(_trak(b'soun', 48000, _stsd(_mp4a(_esds(0, b'', 0x40)))))
+        self.assertEqual(streams[0]['codec_name'], 'aac')
+
+    def test_missing_stsd_is_left_to_ffprobe(self):
+        trak = _trak(b'vide', 24000, b'')
+        with self.assertRaises(ValueError):
+            self.__probe__(trak)
+        with self.assertRaises(ValueError):
+            self.__probe__(_trak(b'vide', 24000, _stsd()))
+
+    def test_frame_rate_is_the_exact_fraction(self):
+        # 24000/1001 in a timescale of 90000: every frame is 3753.75 ticks, rounded to 3753 and 3754
+        avc1 = _box(b'avc1', bytes(78))
+        stts = _stts((1000, 3753), (1000, 3754))
+        streams = self.__probe__(_trak(b'vide', 90000, _stsd(avc1), stts))
+        self.assertEqual(streams[0]['avg_frame_rate'], '180000/7507')
+
+
+def _matroska(*track_children: bytes) -> bytes:
+    entry = matroska.encode_element(matroska.ID_TRACK_ENTRY, b''.join(track_children))
+    header = matroska.encode_element(matroska.ID_EBML, matroska.encode_element(matroska.ID_DOC_TYPE, b'matroska'))
+    return header + matroska.encode_element(matroska.ID_SEGMENT, matroska.encode_element(matroska.ID_TRACKS, entry))
+
+
+class MatroskaProbeTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+
+    def __probe__(self, *track_children: bytes) -> str:
+        path = os.path.join(self.folder, 'episode.mkv')
+        with open(path, 'wb') as media_file:
+            media_file.write(_matroska(*track_children))
+        return header_probe.probe(path)
+
+    def __frame_rate__(self, default_duration: int) -> str:
+        stream_data = json.loads(self.__probe__(
+            matroska.encode_element(matroska.ID_TRACK_TYPE, b'\x01'),
+            matroska.encode_element(matroska.ID_CODEC_ID, b'V_MPEG4/ISO/AVC'),
+            matroska.encode_element(matroska.ID_DEFAULT_DURATION, default_duration.to_bytes(4, 'big'))))['streams'][0]
+        self.assertEqual(stream_data['avg_frame_rate'], stream_data['r_frame_rate'])
+        return stream_data['avg_frame_rate']
+
+    def test_frame_rate_within_ffmpegs_limit(self):
+        # the nanoseconds of DefaultDuration are rounded: av_reduce with terms up to 30000, as matroskadec
+        self.assertEqual(self.__frame_rate__(41708333), '24000/1001')
+        self.assertEqual(self.__frame_rate__(41666667), '24/1')
+        self.assertEqual(self.__frame_rate__(16683333), '19001/317')
+        self.assertEqual(self.__frame_rate__(40000000), '25/1')
+
+    def test_forced_subtitles_keep_their_flag(self):
+        output = self.__probe__(
+            matroska.encode_element(matroska.ID_TRACK_TYPE, b'\x11'),
+            matroska.encode_element(matroska.ID_CODEC_ID, b'S_TEXT/ASS'),
+            matroska.encode_element(matroska.ID_FLAG_DEFAULT, b'\x00'),
+            matroska.encode_element(matroska.ID_FLAG_FORCED, b'\x01'))
+        subtitle_stream = next(iter(stream.parse_ffprobe_json(output)))
+        self.assertEqual(subtitle_stream.disposition, (('default', 0), ('forced', 1)))
+        self.assertFalse(subtitle_stream.is_default)
+        self.assertTrue(subtitle_stream.is_forced)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from movie.utils import constants
+from movie.utils import job_queue
+
+
+OPERATION = constants.JOB_OPERATION_EXTRACT_SUBTITLE
+ARGS = [True, [2]]
+
+
+class JobQueueTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        self.queue = job_queue.JobQueue(os.path.join(self.folder, 'jobs.sqlite'))
+        self.addCleanup(self.queue.close)
+        self.video = self.__write__('episode.mkv', b'video')
+        self.subtitle = os.path.join(self.folder, 'episode.2.ass')
+
+    def __write__(self, file: str, data: bytes) -> str:
+        path = os.path.join(self.folder, file)
+        with open(path, 'wb') as media_file:
+            media_file.write(data)
+        return path
+
+    def test_done_while_every_output_is_unchanged(self):
+        with self.queue.track(self.video, OPERATION, ARGS, output_paths=[self.video, self.subtitle]):
+            self.__write__('episode.2.ass', b'subtitle')
+        self.assertTrue(self.queue.is_done(self.video, OPERATION, ARGS))
+        self.assertEqual(self.queue.count_done([(self.video, OPERATION, ARGS)]), 1)
+
+        os.remove(self.subtitle)
+        self.assertFalse(self.queue.is_done(self.video, OPERATION, ARGS))
+        self.assertEqual(self.queue.count_done([(self.video, OPERATION, ARGS)]), 0)
+
+    def test_a_changed_source_is_not_done(self):
+        with self.queue.track(self.video, OPERATION, ARGS):
+            pass
+        self.assertTrue(self.queue.is_done(self.video, OPERATION, ARGS))
+
+        self.__write__('episode.mkv', b'another video')
+        self.assertFalse(self.queue.is_done(self.video, OPERATION, ARGS))
+
+    def test_a_failed_job_removes_its_temp_file(self):
+        temp_path = self.__write__('temp.mkv', b'partial')
+        with self.assertRaises(RuntimeError), self.queue.track(self.video, OPERATION, ARGS, temp_path):
+            raise RuntimeError('ffmpeg failed')
+        self.assertFalse(os.path.exists(temp_path))
+        self.assertFalse(self.queue.is_done(self.video, OPERATION, ARGS))
+
+    def test_recover_removes_the_temp_file_of_a_dead_process(self):
+        temp_path = self.__write__('temp.mkv', b'partial')
+        self.queue.start(self.video, OPERATION, ARGS, temp_path)
+        with mock.patch.object(job_queue, '_is_running', return_value=False), \
+                mock.patch.object(job_queue.os, 'name', 'posix'):
+            self.queue.recover(self.folder)
+        self.assertFalse(os.path.exists(temp_path))
+        self.assertTrue(os.path.exists(self.video))
+
+    def test_recover_is_skipped_on_windows(self):
+        temp_path = self.__write__('temp.mkv', b'partial')
+        self.queue.start(self.video, OPERATION, ARGS, temp_path)
+        with mock.patch.object(job_queue, '_is_running', return_value=False), \
+                mock.patch.object(job_queue.os, 'name', 'nt'):
+            self.queue.recover(self.folder)
+        self.assertTrue(os.path.exists(temp_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+import os
+import shutil
+import tempfile
+import unittest
+import zlib
+from typing import List
+from typing import Optional
+
+from movie.utils import constants
+from movie.utils import matroska
+from movie.utils.movie import Movie
+from tests import stub_tools
+
+
+CLUSTER = matroska.encode_element(matroska.ID_CLUSTER, b'\x00' * 64)
+
+
+def _uint(element_id: int, value: int) -> bytes:
+    return matroska.encode_element(element_id, bytes([value]))
+
+
+def _track_entry(track_type: int, language: str, forced: Optional[int] = None) -> bytes:
+    children = [_uint(matroska.ID_TRACK_TYPE, track_type), _uint(matroska.ID_FLAG_DEFAULT, 1),
+                matroska.encode_element(matroska.ID_LANGUAGE, language.encode('ascii'))]
+    if forced is not None:
+        children.append(_uint(matroska.ID_FLAG_FORCED, forced))
+    return matroska.encode_element(matroska.ID_TRACK_ENTRY, b''.join(children))
+
+
+def _tracks(entries: List[bytes], crc: bool = False) -> bytes:
+    data = b''.join(entries)
+    if crc:
+        data = matroska.encode_element(matroska.ID_CRC32, zlib.crc32(data).to_bytes(4, 'little')) + data
+    return matroska.encode_element(matroska.ID_TRACKS, data)
+
+
+def _matroska(tracks: bytes, padding: int) -> bytes:
+    # EBML header, then a segment: Tracks, `padding` bytes of Void and a cluster
+    header = matroska.encode_element(
+        matroska.ID_EBML, matroska.encode_element(matroska.ID_DOC_TYPE, b'matroska'))
+    segment_data = tracks + (matroska.encode_void(padding) if padding else b'') + CLUSTER
+    return header + matroska.encode_element(matroska.ID_SEGMENT, segment_data)
+
+
+def _read_tracks(path: str) -> tuple:
+    # (Tracks element, the children of every TrackEntry by id, the file's bytes)
+    with open(path, 'rb') as media_file:
+        buffer = media_file.read()
+    tracks = matroska.find_tracks(buffer)
+    entries = [{child.id: bytes(buffer[child.data_start:child.end])
+                for child in matroska.iter_elements(buffer, entry.data_start, entry.end)}
+               for entry in matroska.iter_elements(buffer, tracks.data_start, tracks.end)
+               if entry.id == matroska.ID_TRACK_ENTRY]
+    return tracks, entries, buffer
+
+
+class MatroskaEditTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+
+    def __write__(self, data: bytes, file: str = 'episode.mkv') -> str:
+        path = os.path.join(self.folder, file)
+        with open(path, 'wb') as media_file:
+            media_file.write(data)
+        return path
+
+    def __read__(self, path: str) -> bytes:
+        with open(path, 'rb') as media_file:
+            return media_file.read()
+
+    def test_edit_reuses_the_void_padding(self):
+        data = _matroska(_tracks([_track_entry(1, 'und'), _track_entry(2, 'jpn')]), 64)
+        path = self.__write__(data)
+
+        edits = {1: matroska.TrackEdit(constants.STREAM_TYPE_AUDIO, language='eng', default=False)}
+        self.assertTrue(matroska.edit_tracks(path, edits))
+
+        tracks, entries, buffer = _read_tracks(path)
+        self.assertEqual(len(buffer), len(data))
+        self.assertTrue(buffer.endswith(CLUSTER))
+        self.assertEqual(entries[1][matroska.ID_LANGUAGE], b'eng')
+        self.assertEqual(entries[1][matroska.ID_FLAG_DEFAULT], b'\x00')
+        self.assertEqual(entries[0][matroska.ID_LANGUAGE], b'und')
+        void = matroska.read_element(buffer, tracks.end, len(buffer))
+        self.assertEqual(void.id, matroska.ID_VOID)
+
+    def test_crc32_is_recomputed(self):
+        path = self.__write__(_matroska(_tracks([_track_entry(1, 'und'), _track_entry(2, 'jpn')], crc=True), 32))
+
+        self.assertTrue(matroska.edit_tracks(path, {1: matroska.TrackEdit(language='eng')}))
+
+        tracks, _, buffer = _read_tracks(path)
+        crc = matroska.read_element(buffer, tracks.data_start, tracks.end)
+        self.assertEqual(crc.id, matroska.ID_CRC32)
+        self.assertEqual(bytes(buffer[crc.data_start:crc.end]),
+                         zlib.crc32(buffer[crc.end:tracks.end]).to_bytes(4, 'little'))
+
+    def test_one_byte_left_widens_the_tracks_size(self):
+        # 'jpn' -> 'japanese' grows the entry by 5 bytes; 6 bytes of Void leave exactly one byte over
+        path = self.__write__(_matroska(_tracks([_track_entry(2, 'jpn')]), 6))
+        size = len(self.__read__(path))
+
+        self.assertTrue(matroska.edit_tracks(path, {0: matroska.TrackEdit(language='japanese')}))
+
+        tracks, entries, buffer = _read_tracks(path)
+        self.assertEqual(len(buffer), size)
+        self.assertEqual(entries[0][matroska.ID_LANGUAGE], b'japanese')
+        _, size_length = matroska.read_vint(buffer, tracks.start + len(matroska.encode_id(matroska.ID_TRACKS)))
+        self.assertEqual(size_length, 2)
+        self.assertEqual(matroska.read_element(buffer, tracks.end, len(buffer)).id, matroska.ID_CLUSTER)
+
+    def test_no_room_leaves_the_file_unchanged(self):
+        data = _matroska(_tracks([_track_entry(2, 'jpn')]), 0)
+        path = self.__write__(data)
+
+        self.assertFalse(matroska.edit_tracks(path, {0: matroska.TrackEdit(name='a name that does not fit')}))
+        self.assertEqual(self.__read__(path), data)
+
+    def test_cleared_forced_flag_is_only_written_when_present(self):
+        path = self.__write__(_matroska(_tracks([_track_entry(2, 'jpn'), _track_entry(2, 'eng', forced=1)]), 32))
+
+        edits = {i: matroska.TrackEdit(constants.STREAM_TYPE_AUDIO, default=False, forced=False) for i in (0, 1)}
+        self.assertTrue(matroska.edit_tracks(path, edits))
+
+        _, entries, _ = _read_tracks(path)
+        self.assertNotIn(matroska.ID_FLAG_FORCED, entries[0])
+        self.assertEqual(entries[1][matroska.ID_FLAG_FORCED], b'\x00')
+
+    def test_wrong_track_type_is_refused(self):
+        data = _matroska(_tracks([_track_entry(1, 'und')]), 32)
+        path = self.__write__(data)
+
+        with self.assertRaises(ValueError):
+            matroska.edit_tracks(path, {0: matroska.TrackEdit(constants.STREAM_TYPE_AUDIO, default=False)})
+        self.assertEqual(self.__read__(path), data)
+
+    def test_get_track_types(self):
+        path = self.__write__(_matroska(_tracks([_track_entry(1, 'und'), _track_entry(2, 'jpn'),
+                                                 _track_entry(17, 'eng')]), 0))
+        self.assertEqual(matroska.get_track_types(path), [
+            constants.STREAM_TYPE_VIDEO, constants.STREAM_TYPE_AUDIO, constants.STREAM_TYPE_SUBTITLE])
+
+
+class RemuxFallbackTest(stub_tools.StubToolsTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.movie = Movie(self.ffmpeg, self.ffprobe, self.folder, '')
+
+    def __run__(self, padding: int) -> list:
+        with open(os.path.join(self.folder, 'episode.mkv'), 'wb') as media_file:
+            media_file.write(_matroska(_tracks([_track_entry(1, 'und'), _track_entry(2, 'jpn')]), padding))
+        remux_jobs = [('episode.mkv', ('episode.mkv', ['-map', '0', '-disposition:1', '0']))]
+        edits = {'episode.mkv': {1: matroska.TrackEdit(constants.STREAM_TYPE_AUDIO, name='Japanese, commentary')}}
+        results = self.movie.__run_remux_jobs__(remux_jobs, edits)
+        self.assertTrue(all(result.succeeded for result in results))
+        return stub_tools.read_calls(self.calls)
+
+    def test_edited_in_place_without_ffmpeg(self):
+        self.assertEqual(self.__run__(64), [])
+        _, entries, _ = _read_tracks(os.path.join(self.folder, 'episode.mkv'))
+        self.assertEqual(entries[1][matroska.ID_NAME], b'Japanese, commentary')
+
+    def test_remuxed_when_the_headers_do_not_fit(self):
+        calls = self.__run__(0)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0]['args'][-3:-1], ['-disposition:1', '0'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import unittest
+from unittest import mock
+
+from movie.utils import command
+from movie.utils import constants
+from movie.utils import remux_plan
+from movie.utils.movie import Movie
+from tests import stub_tools
+
+
+class RemuxPlanTest(stub_tools.StubToolsTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.movie = Movie(self.ffmpeg, self.ffprobe, self.folder, '')
+        self.plan = remux_plan.RemuxPlan()
+        for video_file in ['episode 01.mp4', 'episode 02.mp4']:
+            with open(os.path.join(self.folder, video_file), 'wb') as media_file:
+                media_file.write(b'video')
+
+    def test_kept_subtitles_stay_in_the_video(self):
+        file_plan = self.plan.get(self.movie, 'episode 01.mp4')
+        file_plan.extract_subtitles([2], keep_subtitles=True)
+        arguments = file_plan.get_arguments({2: 'episode 01.2.ass'})
+        self.assertEqual(arguments, ['-map', '0:2', '-c:s', 'ass', 'episode 01.2.ass', '-c', 'copy', '-map', '0'])
+        # the subtitle file is written by the remux, never by a header edit
+        self.assertEqual(file_plan.get_track_edits(), {})
+
+        # extracted once without keeping it, the stream leaves the video
+        file_plan.extract_subtitles([2])
+        self.assertEqual(file_plan.get_arguments({2: 'episode 01.2.ass'})[-4:], ['-map', '0', '-map', '-0:2'])
+
+    def test_failed_files_stay_planned(self):
+        for video_file in ['episode 01.mp4', 'episode 02.mp4']:
+            self.plan.get(self.movie, video_file).remove_default(constants.STREAM_TYPE_AUDIO)
+
+        execute = command.execute
+
+        def fail_second(cmd_exec):
+            if 'episode 02' in cmd_exec[cmd_exec.index('-i') + 1]:
+                raise RuntimeError('disk full')
+            execute(cmd_exec)
+
+        with mock.patch.object(command, 'execute', fail_second):
+            results = self.plan.run(self.movie)
+        self.assertEqual([result.succeeded for result in results], [True, False])
+        self.assertEqual(list(self.plan.get_commands(self.movie)), ['episode 02.mp4'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from movie.utils import scheduler
+
+
+class CpuBudgetTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        patcher = mock.patch.dict('movie.utils.scheduler._SETTINGS', {'default_limit': 8, 'cpu_limit': 4})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.scheduler = scheduler.DeviceScheduler()
+
+    def __run__(self, threads_per_job: list) -> int:
+        # the most threads that ran at once
+        lock = threading.Lock()
+        running = [0, 0]
+        barrier = threading.Barrier(len(threads_per_job), timeout=0.2)
+
+        def job(threads: int) -> None:
+            with self.scheduler.slot(self.folder, threads=threads):
+                with lock:
+                    running[0] += threads
+                    running[1] = max(running)
+                try:
+                    # every job would run together if the budget let it
+                    barrier.wait()
+                except threading.BrokenBarrierError:
+                    pass
+                with lock:
+                    running[0] -= threads
+
+        workers = [threading.Thread(target=job, args=(threads,)) for threads in threads_per_job]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return running[1]
+
+    def test_threads_stay_within_the_cpu_limit(self):
+        # two folders each splitting the same budget between two files
+        self.assertLessEqual(self.__run__([2, 2, 2, 2]), 4)
+
+    def test_copies_take_no_cpu_permits(self):
+        self.assertEqual(self.__run__([0, 0, 4]), 4)
+
+    def test_a_job_asking_for_more_than_the_budget_still_runs(self):
+        self.assertEqual(self.__run__([16]), 16)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from movie.utils import constants
+from movie.utils import translation
+
+
+def _backend(texts: list, target: str, wait) -> list:
+    # a quota error for every batch with a line that mentions it
+    wait()
+    if any('quota' in text for text in texts):
+        raise RuntimeError('429 Too Many Requests')
+    return [f'[{target}] {text}' for text in texts]
+
+
+class TranslateTextsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        memory = translation.TranslationMemory(os.path.join(tmp_dir, 'memory.sqlite'))
+        self.addCleanup(memory.close)
+        for patcher in [mock.patch.object(translation, 'MEMORY', memory),
+                        mock.patch.dict(translation.BACKENDS, {constants.TRANSLATION_BACKEND_LOCAL: _backend}),
+                        mock.patch.dict('movie.utils.translation._SETTINGS', {
+                            'backend': constants.TRANSLATION_BACKEND_LOCAL, 'target': 'ru',
+                            'batch_chars': 10, 'workers': 2, 'requests_per_second': 0})]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_a_failed_batch_keeps_the_others(self):
+        translations = translation.translate_texts(['first', 'quota', 'second', 'third'])
+        self.assertEqual(translations, {'first': '[ru] first', 'second': '[ru] second', 'third': '[ru] third'})
+
+        # only the translated lines are remembered, the failed one is asked for again
+        self.assertEqual(translation.MEMORY.get_many(['first', 'quota'], 'ru'), {'first': '[ru] first'})
+
+
+if __name__ == '__main__':
+    unittest.main()